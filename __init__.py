@@ -12,9 +12,13 @@ if _src_dir.is_dir():
 from voxta.voxta_output_folder import VoxtaOutputFolder
 from voxta.voxta_export_character import VoxtaExportCharacter
 from voxta.voxta_filter_existing import VoxtaFilterExistingCombinations
+from voxta.server_setup import setup_routes
 
 WEB_DIRECTORY = "js"
 
+# Web endpoints are registered explicitly (and only once, even if nodes.py is loaded too)
+setup_routes()
+
 # Build mappings
 NODE_CLASS_MAPPINGS = {
     "VoxtaOutputFolder": VoxtaOutputFolder,
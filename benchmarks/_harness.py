@@ -0,0 +1,134 @@
+"""Shared helpers for the standalone benchmark scripts.
+
+Every script records results through ``BenchmarkRun`` and writes one JSON
+document, so runs from different releases can be diffed with ``--compare``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def project_version() -> str:
+    try:
+        with open(os.path.join(ROOT_DIR, "pyproject.toml"), encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("version"):
+                    return line.split("=", 1)[1].strip().strip('"')
+    except OSError:
+        pass
+    return "unknown"
+
+
+def populate_directory(path: str, count: int, ext: str = ".webp") -> list[str]:
+    """Create ``count`` empty enumerated files (10 per stem) and return the stems."""
+    os.makedirs(path, exist_ok=True)
+    stems = [f"Expr{i // 10}_Pose{i % 10}" for i in range(max(1, count // 10))]
+    made = 0
+    for stem in stems:
+        for idx in range(1, 11):
+            if made >= count:
+                break
+            open(os.path.join(path, f"{stem}_{idx:02d}{ext}"), "wb").close()
+            made += 1
+    # Age the directory so cached listings are trusted, as they would be between queue runs.
+    past = time.time() - 3600
+    os.utime(path, (past, past))
+    return stems
+
+
+class BenchmarkRun:
+    def __init__(self, suite: str, repeat: int):
+        self.suite = suite
+        self.repeat = repeat
+        self.results: list[dict[str, Any]] = []
+
+    def measure(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        params: dict[str, Any] | None = None,
+        setup: Callable[[], Any] | None = None,
+        repeat: int | None = None,
+        **extra: Any,
+    ) -> dict[str, Any]:
+        timings = []
+        for _ in range(repeat or self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        result = {
+            "name": name,
+            "params": params or {},
+            "repeat": len(timings),
+            "min_s": min(timings),
+            "median_s": statistics.median(timings),
+            "mean_s": statistics.fmean(timings),
+            **extra,
+        }
+        self.results.append(result)
+        print(f"{name:<40} {json.dumps(params or {}):<45} median {result['median_s'] * 1000:10.3f} ms")
+        return result
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "suite": self.suite,
+            "version": project_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "results": self.results,
+        }
+
+
+def result_key(result: dict[str, Any]) -> str:
+    return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Return descriptions of results whose median regressed by more than ``threshold``."""
+    previous = {result_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in current["results"]:
+        old = previous.get(result_key(r))
+        if not old or old["median_s"] <= 0:
+            continue
+        ratio = r["median_s"] / old["median_s"]
+        if ratio > 1.0 + threshold:
+            regressions.append(f"{r['name']} {json.dumps(r['params'])}: {ratio:.2f}x slower")
+    return regressions
+
+
+def add_common_arguments(parser: argparse.ArgumentParser, default_repeat: int = 5) -> None:
+    parser.add_argument("--repeat", type=int, default=default_repeat, help="timed runs per case")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON file to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing --compare")
+
+
+def finish(run: BenchmarkRun, args: argparse.Namespace) -> int:
+    data = run.to_json()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(data, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
@@ -0,0 +1,94 @@
+"""Existence checks of the filter node: per-combination set lookups vs the stem bitmap.
+
+Usage::
+
+    python benchmarks/bench_existence.py --files 10000 --combinations 50000 --output existence.json
+
+Both variants return the positions of new combinations. "sets" is the
+original loop (three parallel lists, one ``has_index`` / ``has_stem`` call
+per combination). "bitmap" streams the resolved combinations into
+``ExistenceBitmap.lookup``; "bitmap cold"
+includes rebuilding the bitmap after the folder changed. Peak allocations of
+one run are reported as ``peak_kib``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import tracemalloc
+
+from _harness import BenchmarkRun, add_common_arguments, finish, populate_directory
+
+from voxta.existence import missing_positions
+from voxta.stem_index import clear_stem_indexes, get_stem_index
+from voxta.stems import resolve_stem
+
+
+def legacy_new_indices(stem_index, combination_ids):
+    exists_flags, stems, indices = [], [], []
+    for cid in combination_ids:
+        base_stem, base_idx = resolve_stem(cid)
+        stems.append(base_stem)
+        indices.append(base_idx)
+        if base_idx is not None:
+            exists_flags.append(stem_index.has_index(base_stem, base_idx))
+        else:
+            exists_flags.append(stem_index.has_stem(base_stem))
+    return [i for i, exists in enumerate(exists_flags) if not exists]
+
+
+def bitmap_new_indices(stem_index, combination_ids):
+    exists = stem_index.existence_bitmap().lookup(resolve_stem(cid) for cid in combination_ids)
+    return missing_positions(exists)
+
+
+def peak_kib(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10000, help="enumerated files in the output folder")
+    parser.add_argument("--combinations", type=int, default=50000, help="combinations checked per run")
+    add_common_arguments(parser)
+    args = parser.parse_args(argv)
+
+    run = BenchmarkRun("existence", args.repeat)
+    with tempfile.TemporaryDirectory() as tmp:
+        stems = populate_directory(tmp, args.files)
+        clear_stem_indexes()
+        index = get_stem_index(tmp)
+        # Mix of existing and new stems, with and without an explicit enumeration
+        combos = []
+        for i in range(args.combinations):
+            parts = stems[i % len(stems)].split("_") if i % 2 else [f"New{i % 997}", "Pose"]
+            combos.append(parts + [f"Talking{i % 12}"] if i % 3 == 0 else parts)
+        assert legacy_new_indices(index, combos) == bitmap_new_indices(index, combos)
+
+        def invalidate():
+            index.generation += 1
+
+        params = {"files": args.files, "combinations": args.combinations}
+        cases = {
+            "sets": (lambda: legacy_new_indices(index, combos), None),
+            "bitmap": (lambda: bitmap_new_indices(index, combos), None),
+            "bitmap cold": (lambda: bitmap_new_indices(index, combos), invalidate),
+        }
+        for name, (fn, setup) in cases.items():
+            if setup is not None:
+                setup()
+            peak = peak_kib(fn)
+            result = run.measure(f"existence {name}", fn, params, setup=setup, peak_kib=peak)
+            print(f"  peak {result['peak_kib']:.0f} KiB")
+    return finish(run, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
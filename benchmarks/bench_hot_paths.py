@@ -0,0 +1,114 @@
+"""Benchmark naming, filter and export hot paths against synthetic output folders.
+
+Usage::
+
+    python benchmarks/bench_hot_paths.py --sizes 10 1000 100000 --output results.json
+    python benchmarks/bench_hot_paths.py --compare results.json   # non-zero exit on regression
+
+Each case runs against a directory pre-populated with ``size`` enumerated
+files. "cold" cases drop the cached stem index before every run so they
+include the directory scan; "warm" cases reuse it like consecutive queue runs.
+Export cases encode synthetic avatars in every output format, against the
+largest folder only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+from _harness import BenchmarkRun, add_common_arguments, finish, populate_directory
+from bench_presets import make_avatar
+
+from voxta.helpers import ImageExporter
+from voxta.naming import determine_filename
+from voxta.stem_index import clear_stem_indexes
+from voxta.voxta_export_character import VoxtaExportCharacter
+from voxta.voxta_filter_existing import VoxtaFilterExistingCombinations
+
+
+def bench_naming(run: BenchmarkRun, save_dir: str, size: int, stems: list[str]) -> None:
+    ids = stems[len(stems) // 2].split("_")
+    params = {"files": size}
+    run.measure("determine_filename cold", lambda: determine_filename(ids, ".webp", save_dir), params, setup=clear_stem_indexes)
+    run.measure("determine_filename warm", lambda: determine_filename(ids, ".webp", save_dir), params)
+
+
+def bench_filter(run: BenchmarkRun, root: str, sub: str, size: int, stems: list[str], combos: int) -> None:
+    node = VoxtaFilterExistingCombinations()
+    # Half of the combinations hit existing stems, half are new
+    combination_ids = [stems[i % len(stems)].split("_") if i % 2 else [f"New{i}", "Pose"] for i in range(combos)]
+
+    def call(recursive=False):
+        node.execute(
+            combination_ids=combination_ids,
+            prompts=["prompt"],
+            output_path=[root],
+            subfolder=[sub],
+            behavior=["new only"],
+            recursive=[recursive],
+        )
+
+    params = {"files": size, "combinations": combos}
+    run.measure("filter_existing cold", call, params, setup=clear_stem_indexes)
+    run.measure("filter_existing warm", call, params)
+    # The output folder has one small pack subfolder per 1k files
+    run.measure("filter_existing recursive cold", lambda: call(True), params, setup=clear_stem_indexes)
+    run.measure("filter_existing recursive warm", lambda: call(True), params)
+
+
+def bench_export(run: BenchmarkRun, root: str, sub: str, size: int, images: int, resolution: int, repeat: int) -> None:
+    node = VoxtaExportCharacter()
+    # Avatar-like frames; random noise would make the slow WebP methods dominate the run
+    batch = [make_avatar(resolution, seed).astype(np.float32) / 255.0 for seed in range(images)]
+    combination_ids = [[f"Bench{i}", "Export"] for i in range(images)]
+    for option in ImageExporter.FORMAT_MAP:
+
+        def call(option=option):
+            node.execute(
+                output_format=[option],
+                images=batch,
+                prompts=["prompt"],
+                combination_ids=combination_ids,
+                output_path=[root],
+                subfolder=[sub],
+                on_exists=["overwrite"],
+            )
+
+        params = {"files": size, "format": option, "images": images, "resolution": resolution}
+        run.measure("export_character", call, params, repeat=repeat)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000], help="files per synthetic directory")
+    parser.add_argument("--combinations", type=int, default=1000, help="combinations per filter run")
+    parser.add_argument("--images", type=int, default=4, help="images per export run")
+    parser.add_argument("--resolution", type=int, default=256, help="export image edge length")
+    parser.add_argument("--export-repeat", type=int, default=2, help="timed runs per export format")
+    parser.add_argument("--skip-export", action="store_true", help="only run naming and filter cases")
+    add_common_arguments(parser)
+    args = parser.parse_args(argv)
+
+    run = BenchmarkRun("hot_paths", args.repeat)
+    with tempfile.TemporaryDirectory(prefix="voxta-bench-") as tmp:
+        for size in args.sizes:
+            root = os.path.join(tmp, f"files_{size}")
+            sub = "Avatars"
+            save_dir = os.path.join(root, sub)
+            for pack in range(max(1, size // 1000)):
+                populate_directory(os.path.join(save_dir, f"Pack{pack}"), 10)
+            stems = populate_directory(save_dir, size)
+            bench_naming(run, save_dir, size, stems)
+            bench_filter(run, root, sub, size, stems, args.combinations)
+            # Encoding dominates the export cases, so they run against the largest folder only
+            if not args.skip_export and size == max(args.sizes):
+                bench_export(run, root, sub, size, args.images, args.resolution, args.export_repeat)
+    return finish(run, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Measure how long importing the Voxta nodes takes, as ComfyUI does at startup.
+
+Usage::
+
+    python benchmarks/bench_import.py --repeat 10 --output import.json
+
+Every case runs in a fresh interpreter. "nodes" imports the three node modules
+and the route setup (without a ComfyUI server, so no routes are registered);
+"nodes + eager deps" additionally imports aiohttp.web, PIL.Image and numpy,
+which is what importing the nodes cost before those imports were deferred.
+"interpreter" is the bare ``python -c pass`` baseline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+
+from _harness import SRC_DIR, BenchmarkRun, add_common_arguments, finish
+
+NODES = "import voxta.voxta_output_folder, voxta.voxta_export_character, voxta.voxta_filter_existing, voxta.server_setup"
+CASES = {
+    "interpreter": "pass",
+    "nodes": NODES,
+    "nodes + eager deps": NODES + "; import aiohttp.web, PIL.Image, numpy",
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser, default_repeat=10)
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, "PYTHONPATH": SRC_DIR}
+    run = BenchmarkRun("import", args.repeat)
+    for name, code in CASES.items():
+        run.measure(f"import {name}", lambda code=code: subprocess.run([sys.executable, "-c", code], env=env, check=True))
+    loaded = subprocess.run(
+        [sys.executable, "-c", NODES + "; import sys; print(sorted(m for m in ('aiohttp', 'PIL', 'numpy') if m in sys.modules))"],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    print(f"heavy modules loaded by importing the nodes: {loaded.stdout.strip()}")
+    return finish(run, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
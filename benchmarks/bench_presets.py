@@ -0,0 +1,82 @@
+"""Encode cost of each export preset and auto effort level.
+
+Usage::
+
+    python benchmarks/bench_presets.py --size 1024 --images 3 --output presets.json
+
+Encodes synthetic avatars (soft gradient background, shaded figure with an
+anti-aliased alpha edge and sensor-like noise) to memory with every
+``ImageExporter.FORMAT_MAP`` preset and every level of the ``auto`` effort
+ladders, and reports milliseconds and bytes per image. The ladder costs in
+``voxta.presets`` are seeded from this script's output.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import sys
+
+import numpy as np
+from _harness import BenchmarkRun, add_common_arguments, finish
+from PIL import Image
+
+from voxta.helpers import ImageExporter
+from voxta.presets import EFFORT_LADDERS
+
+
+def make_avatar(size: int, seed: int) -> np.ndarray:
+    """An RGBA uint8 avatar-like frame: smooth background, round figure, soft alpha edge."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    rgb = np.stack([0.3 + 0.4 * x, 0.2 + 0.5 * y, 0.6 - 0.3 * x * y], axis=-1)
+    cx, cy, r = 0.5 + rng.uniform(-0.05, 0.05), 0.55, 0.3
+    dist = np.sqrt((x - cx) ** 2 + (y - cy) ** 2)
+    figure = dist < r
+    shade = (1.0 - dist / r)[..., None] * np.array(rng.uniform(0.4, 1.0, 3), dtype=np.float32)
+    rgb = np.where(figure[..., None], shade, rgb)
+    rgb += rng.normal(0, 0.02, rgb.shape).astype(np.float32)
+    alpha = np.clip((r + 0.1 - dist) / 0.02, 0, 1)[..., None]
+    return (np.concatenate([rgb, alpha], axis=-1).clip(0, 1) * 255).astype(np.uint8)
+
+
+def encode_size(frames: list[np.ndarray], params: dict) -> int:
+    total = 0
+    for frame in frames:
+        buf = io.BytesIO()
+        Image.fromarray(frame).save(buf, **params)
+        total += buf.tell()
+    return total
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1024, help="avatar width and height in pixels")
+    parser.add_argument("--images", type=int, default=3, help="distinct avatars encoded per run")
+    add_common_arguments(parser, default_repeat=3)
+    args = parser.parse_args(argv)
+
+    run = BenchmarkRun("presets", args.repeat)
+    frames = [make_avatar(args.size, seed) for seed in range(args.images)]
+    cases = {f"preset {option}": fmt["params"] for option, fmt in ImageExporter.FORMAT_MAP.items()}
+    base = {
+        "webp": ImageExporter.FORMAT_MAP[".webp lossy 90"]["params"],
+        "webp lossless": ImageExporter.FORMAT_MAP[".webp lossless"]["params"],
+        "png": ImageExporter.FORMAT_MAP[".png lossless"]["params"],
+    }
+    for family, ladder in EFFORT_LADDERS.items():
+        for level, (overrides, _) in enumerate(ladder):
+            cases[f"auto {family} level {level}"] = {**base[family], **overrides}
+
+    megapixels = args.size * args.size / 1_000_000
+    for name, params in cases.items():
+        size = encode_size(frames, params)
+        result = run.measure(name, lambda: encode_size(frames, params), {"size": args.size, "images": args.images})
+        ms = result["median_s"] * 1000 / args.images
+        result.update(ms_per_image=ms, bytes_per_image=size // args.images, s_per_megapixel=ms / 1000 / megapixels)
+        print(f"  {ms:8.1f} ms/image {size // args.images:>10} bytes/image")
+    return finish(run, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Microbenchmark for stem resolution (sanitize + trailing-number split).
+
+Usage::
+
+    python benchmarks/bench_stems.py --ids 100000 --unique 1000 --output stems.json
+
+Compares the original per-call implementation (uncompiled ``re.sub`` /
+``re.match``) with the precompiled, memoized ``voxta.stems.resolve_stem``, both
+on a repeating id space (as produced by queue reruns of the same combinator)
+and with every id unique (cache misses only).
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+
+from _harness import BenchmarkRun, add_common_arguments, finish
+
+from voxta.stems import clear_stem_caches, resolve_stem
+
+
+def legacy_resolve(id_list):
+    id_list = [i for i in id_list if "_no_id_" not in i]
+    raw = "_".join(id_list)
+    raw = raw.replace(" ", "_")
+    raw = re.sub(r"[^A-Za-z0-9_.]", "_", raw)
+    raw = re.sub(r"_+", "_", raw)
+    raw = raw.strip("_.") or "image"
+    m = re.match(r"^(.*?)(\d+)$", raw)
+    if not m:
+        return raw, None
+    base = m.group(1).rstrip("._")
+    if not base:
+        return raw, None
+    val = int(m.group(2))
+    if val < 1 or val > 99:
+        return raw, None
+    return base, val
+
+
+def make_ids(count: int, unique: int) -> list[list[str]]:
+    """``count`` id lists cycling through ``unique`` distinct combinations."""
+    return [[f"Expr {n // 84}", f"Pose:{n // 12 % 7}", f"Talking{n % 12}"] for n in (i % unique for i in range(count))]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", type=int, default=100000, help="combinations resolved per run")
+    parser.add_argument("--unique", type=int, default=1000, help="distinct combinations in the repeating case")
+    add_common_arguments(parser)
+    args = parser.parse_args(argv)
+
+    run = BenchmarkRun("stems", args.repeat)
+    cases = {"repeating": make_ids(args.ids, args.unique), "unique": make_ids(args.ids, args.ids)}
+    for case, ids in cases.items():
+        params = {"ids": args.ids, "case": case}
+        legacy = run.measure("resolve legacy", lambda: [legacy_resolve(c) for c in ids], params)
+        for cid in ids:
+            assert resolve_stem(cid) == legacy_resolve(cid)
+        # Cold runs start from empty caches; warm runs see the ids of the previous run again
+        cold = run.measure("resolve_stem cold", lambda: [resolve_stem(c) for c in ids], params, setup=clear_stem_caches)
+        warm = run.measure("resolve_stem warm", lambda: [resolve_stem(c) for c in ids], params)
+        print(f"  speedup vs legacy: cold {legacy['median_s'] / cold['median_s']:.1f}x, warm {legacy['median_s'] / warm['median_s']:.1f}x")
+    return finish(run, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
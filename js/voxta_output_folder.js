@@ -1,5 +1,116 @@
 ﻿import { app } from "/scripts/app.js";
 
+// Thumbnail lookups are shared by every Output Folder node on the page:
+// - results are memoized per base path for a short time,
+// - typing in the path widgets is debounced and stale requests are aborted,
+// - lookups issued close together (e.g. when a workflow with several nodes is
+//   loaded) are sent as one batched request.
+const LOOKUP_DEBOUNCE_MS = 300;
+const BATCH_WINDOW_MS = 50;
+const MEMO_TTL_MS = 30000;
+const MEMO_MAX_ENTRIES = 200;
+
+const lookupMemo = new Map(); // basePath -> { result, time }
+let pendingBatch = null; // { waiters: Map<basePath, [{ resolve, reject, signal }]>, timer }
+let batchEndpointAvailable = true;
+
+function memoGet(basePath) {
+  const entry = lookupMemo.get(basePath);
+  if (!entry) return null;
+  if (Date.now() - entry.time > MEMO_TTL_MS) {
+    lookupMemo.delete(basePath);
+    return null;
+  }
+  return entry.result;
+}
+
+function memoSet(basePath, result) {
+  lookupMemo.delete(basePath);
+  lookupMemo.set(basePath, { result, time: Date.now() });
+  if (lookupMemo.size > MEMO_MAX_ENTRIES) {
+    lookupMemo.delete(lookupMemo.keys().next().value);
+  }
+}
+
+function abortError() {
+  return new DOMException("Thumbnail lookup aborted", "AbortError");
+}
+
+async function fetchSingle(basePath, signal) {
+  const response = await fetch('/voxta/check_thumbnail', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ path: basePath }),
+    signal,
+  });
+  return response.json();
+}
+
+async function fetchBatch(paths) {
+  if (batchEndpointAvailable) {
+    const response = await fetch('/voxta/check_thumbnails', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ paths }),
+    });
+    if (response.status !== 404) {
+      const data = await response.json();
+      return data.results || [];
+    }
+    // Older backend without the batch endpoint
+    batchEndpointAvailable = false;
+  }
+  return Promise.all(paths.map(async (path) => ({ path, ...(await fetchSingle(path)) })));
+}
+
+async function flushBatch() {
+  const batch = pendingBatch;
+  pendingBatch = null;
+  const paths = [...batch.waiters.keys()];
+  const settle = (path, fn) => {
+    for (const waiter of batch.waiters.get(path) || []) {
+      if (waiter.signal?.aborted) waiter.reject(abortError());
+      else fn(waiter);
+    }
+  };
+  try {
+    const results = await fetchBatch(paths);
+    results.forEach((result, i) => {
+      const path = result.path ?? paths[i];
+      memoSet(path, result);
+      settle(path, (w) => w.resolve(result));
+    });
+    for (const path of paths) {
+      if (!lookupMemo.has(path)) settle(path, (w) => w.reject(new Error("Missing thumbnail result")));
+    }
+  } catch (error) {
+    for (const path of paths) settle(path, (w) => w.reject(error));
+  }
+}
+
+// Resolve the thumbnail for basePath, batching with other lookups issued in the same window.
+function lookupThumbnail(basePath, signal) {
+  const cached = memoGet(basePath);
+  if (cached) return Promise.resolve(cached);
+  return new Promise((resolve, reject) => {
+    if (!pendingBatch) {
+      pendingBatch = { waiters: new Map(), timer: setTimeout(flushBatch, BATCH_WINDOW_MS) };
+    }
+    const waiters = pendingBatch.waiters.get(basePath) || [];
+    waiters.push({ resolve, reject, signal });
+    pendingBatch.waiters.set(basePath, waiters);
+  });
+}
+
+// Resolve a single path right away; the caller's AbortController cancels the request.
+async function lookupThumbnailNow(basePath, signal) {
+  const cached = memoGet(basePath);
+  if (cached) return cached;
+  const result = await fetchSingle(basePath, signal);
+  memoSet(basePath, result);
+  return result;
+}
+
 app.registerExtension({
   name: "Voxta.OutputFolder",
   async beforeRegisterNodeDef(nodeType, nodeData, app) {
@@ -58,10 +169,16 @@ app.registerExtension({
 
         this.addCustomWidget(widget);
 
-        // Function to update the thumbnail
-        const updateThumbnail = () => {
+        let debounceTimer = null;
+        let inflight = null; // AbortController of the current lookup
+
+        // Function to update the thumbnail. Debounced lookups (typing) are sent as
+        // single requests; immediate ones (node creation / workflow load) are batched.
+        const updateThumbnail = ({ batched = false } = {}) => {
+          inflight?.abort();
+          inflight = null;
+
           const outputPath = this.widgets.find(w => w.name === "output_path")?.value || "";
-          const subfolder = this.widgets.find(w => w.name === "subfolder")?.value || "";
 
           if (!outputPath.trim()) {
             widget.status = "Enter path";
@@ -85,17 +202,20 @@ app.registerExtension({
             }
           }
 
-          fetch('/voxta/check_thumbnail', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ path: basePath })
-          })
-          .then(response => response.json())
+          const controller = new AbortController();
+          inflight = controller;
+          const lookup = batched ? lookupThumbnail(basePath, controller.signal) : lookupThumbnailNow(basePath, controller.signal);
+
+          lookup
           .then(data => {
+            if (inflight !== controller) return; // superseded by a newer lookup
+            inflight = null;
             if (data.found && data.thumbnail_path) {
               widget.status = "Image Found";
               widget.image = new Image();
-              widget.image.src = `/voxta/thumbnail?path=${encodeURIComponent(data.thumbnail_path)}`;
+              // Ask for a preview sized to the widget instead of the full portrait
+              const previewSize = Math.ceil(150 * (window.devicePixelRatio || 1));
+              widget.image.src = `/voxta/thumbnail?path=${encodeURIComponent(data.thumbnail_path)}&size=${previewSize}`;
               widget.image.onload = () => {
                 this.setDirtyCanvas(true, true);
               };
@@ -106,6 +226,8 @@ app.registerExtension({
             }
           })
           .catch(error => {
+            if (error?.name === "AbortError" || inflight !== controller) return;
+            inflight = null;
             widget.status = "Error";
             widget.image = null;
             this.setDirtyCanvas(true, true);
@@ -113,13 +235,18 @@ app.registerExtension({
           });
         };
 
+        const scheduleThumbnailUpdate = () => {
+          clearTimeout(debounceTimer);
+          debounceTimer = setTimeout(updateThumbnail, LOOKUP_DEBOUNCE_MS);
+        };
+
         // Hook into input changes
         const outputPathWidget = this.widgets.find(w => w.name === "output_path");
         if (outputPathWidget) {
           const origCallback = outputPathWidget.callback;
           outputPathWidget.callback = (...args) => {
             origCallback?.apply(this, args);
-            updateThumbnail();
+            scheduleThumbnailUpdate();
           };
         }
 
@@ -128,12 +255,12 @@ app.registerExtension({
           const origCallback = subfolderWidget.callback;
           subfolderWidget.callback = (...args) => {
             origCallback?.apply(this, args);
-            updateThumbnail();
+            scheduleThumbnailUpdate();
           };
         }
 
-        // Initial check
-        setTimeout(updateThumbnail, 100);
+        // Initial check; nodes created together (workflow load) share one batched request
+        setTimeout(() => updateThumbnail({ batched: true }), 100);
       };
     }
   }
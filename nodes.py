@@ -16,6 +16,9 @@ if os.path.isdir(_src) and _src not in sys.path:
 from voxta.voxta_export_character import VoxtaExportCharacter  # type: ignore
 from voxta.voxta_filter_existing import VoxtaFilterExistingCombinations  # type: ignore
 from voxta.voxta_output_folder import VoxtaOutputFolder  # type: ignore
+from voxta.server_setup import setup_routes  # type: ignore
+
+setup_routes()
 
 NODE_CLASS_MAPPINGS = {
     "VoxtaExportCharacter": VoxtaExportCharacter,
@@ -0,0 +1,169 @@
+"""Content-hash deduplication for exported character images.
+
+Rerunning a prompt with the same seed produces pixel-identical images, and
+``on_exists="append"`` would encode and store each of them again. The export
+node can instead hash the uint8 pixel buffer before encoding and look it up in
+a per-folder index of what it has already written. The index is built from the
+``hash`` field of ``saved`` records in the export journal and kept up to date
+by reading only the records appended since the last lookup.
+
+The digest covers the output format as well as the pixels, since the same
+frame encoded as PNG and as lossy WebP are different files.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Callable, ContextManager
+
+from .export_manifest import read_manifest_tail
+from .helpers import ImageExporter
+
+try:  # pragma: no cover
+    import xxhash  # type: ignore
+except Exception:  # pragma: no cover
+    xxhash = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+DEDUP_OPTIONS = ["off", "skip", "hardlink"]
+
+MAX_CACHED_DIRECTORIES = 64
+
+
+def pixel_digest(frame, output_format: str) -> str:
+    """Hash a uint8 HxWxC frame together with its shape and output format.
+
+    Uses xxHash (XXH3-128) when the ``xxhash`` package is installed and falls
+    back to BLAKE2b otherwise; both are far cheaper than encoding the image.
+    """
+    header = f"{output_format}|{frame.shape}|{frame.dtype}".encode("utf-8")
+    data = memoryview(frame if frame.flags.c_contiguous else frame.copy()).cast("B")
+    if xxhash is not None:
+        h = xxhash.xxh3_128(header)
+        h.update(data)
+        return "xxh3:" + h.hexdigest()
+    h = hashlib.blake2b(header, digest_size=16)
+    h.update(data)
+    return "b2:" + h.hexdigest()
+
+
+class DedupIndex:
+    """Digest -> filename map of the images exported to one directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._by_digest: dict[str, str] = {}
+        self._by_file: dict[str, str] = {}
+        self._offset = 0
+        self._file_id: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> "DedupIndex":
+        """Apply journal records appended since the last refresh."""
+        with self._lock:
+            records, offset, file_id = read_manifest_tail(self.directory, self._offset, self._file_id)
+            if file_id != self._file_id or offset < self._offset:
+                # Compacted or replaced: the records are read again from the start
+                self._by_digest.clear()
+                self._by_file.clear()
+            self._offset, self._file_id = offset, file_id
+            for record in records:
+                digest = record.get("hash")
+                if record.get("event") == "saved" and digest:
+                    self._set(digest, record["file"])
+        return self
+
+    def _set(self, digest: str, filename: str) -> None:
+        # A file that is overwritten no longer holds the content of its previous digest
+        previous = self._by_file.get(filename)
+        if previous is not None and self._by_digest.get(previous) == filename:
+            del self._by_digest[previous]
+        self._by_digest[digest] = filename
+        self._by_file[filename] = digest
+
+    def add(self, digest: str, filename: str) -> None:
+        """Record a file the caller has just written (its journal record is picked up idempotently)."""
+        with self._lock:
+            self._set(digest, filename)
+
+    def lookup(self, digest: str) -> str | None:
+        """Return an existing file with this content, dropping entries whose file is gone."""
+        with self._lock:
+            filename = self._by_digest.get(digest)
+            if filename is None:
+                return None
+            if os.path.isfile(os.path.join(self.directory, filename)):
+                return filename
+            del self._by_digest[digest]
+            self._by_file.pop(filename, None)
+            return None
+
+    def __len__(self) -> int:
+        return len(self._by_digest)
+
+
+_indexes: "OrderedDict[str, DedupIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_dedup_index(directory: str) -> DedupIndex:
+    """Return the shared, up-to-date index for ``directory``."""
+    key = os.path.normcase(os.path.abspath(directory))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = DedupIndex(directory)
+            _indexes[key] = index
+            while len(_indexes) > MAX_CACHED_DIRECTORIES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+    return index.refresh()
+
+
+def clear_dedup_indexes() -> None:
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def link_duplicate(
+    source_path: str,
+    final_path: str,
+    overwrite: bool = True,
+    guard: Callable[[], ContextManager] | None = None,
+) -> None:
+    """Make ``final_path`` a hardlink to ``source_path``, replacing any existing file atomically.
+
+    Falls back to a copy where hardlinks are not supported (FAT/exFAT, some
+    network shares). ``overwrite`` and ``guard`` work as in ``ImageExporter.save_frame``.
+    """
+    guard = guard or nullcontext
+    directory, name = os.path.split(final_path)
+    tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        with guard():
+            try:
+                os.link(source_path, tmp_path)
+            except OSError as e:
+                logger.debug("Hardlink %s -> %s failed (%s); copying instead", source_path, final_path, e)
+                shutil.copyfile(source_path, tmp_path)
+        with guard():
+            ImageExporter.move_into_place(tmp_path, final_path, overwrite)
+    except BaseException:
+        try:
+            with guard():
+                os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+__all__ = ["DEDUP_OPTIONS", "DedupIndex", "get_dedup_index", "clear_dedup_indexes", "pixel_digest", "link_duplicate"]
@@ -0,0 +1,58 @@
+"""Single-pass directory listing shared by the stem indexes.
+
+``os.scandir`` returns file type information with the directory entries on
+Windows and on Linux/macOS filesystems that report ``d_type``, so splitting a
+listing into files and subfolders needs no extra ``stat`` per entry. Hidden
+``.part`` files of in-progress atomic writes are reported separately.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import NamedTuple
+
+# Temporary files of in-progress atomic writes: ".<final name>.<token>.part"
+PARTIAL_SUFFIX = ".part"
+
+
+class DirectoryListing(NamedTuple):
+    files: list[str]
+    subdirs: list[str]
+    partials: list[str]
+
+
+EMPTY_LISTING = DirectoryListing([], [], [])
+
+
+def scan_directory(path: str) -> DirectoryListing:
+    """List ``path`` once; a missing directory is empty.
+
+    Hidden subfolders and symlinked folders are not reported, so recursive
+    walks never enter ``.git``-style folders or loop through links.
+    """
+    files: list[str] = []
+    subdirs: list[str] = []
+    partials: list[str] = []
+    try:
+        it = os.scandir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return EMPTY_LISTING
+    with it:
+        for entry in it:
+            name = entry.name
+            if name.startswith("."):
+                if name.endswith(PARTIAL_SUFFIX):
+                    partials.append(name)
+                continue
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                subdirs.append(name)
+            else:
+                files.append(name)
+    return DirectoryListing(files, subdirs, partials)
+
+
+__all__ = ["DirectoryListing", "scan_directory", "PARTIAL_SUFFIX"]
@@ -0,0 +1,111 @@
+"""Concurrent image encoding for the export node.
+
+Pillow releases the GIL inside its PNG and WebP encoders, so a thread pool is
+enough to spread ``Image.save`` calls over several cores without pickling
+frames to worker processes. Conversion to uint8 happens inside the worker as
+well, which keeps at most one converted frame per worker alive at a time.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, ContextManager, Iterator
+
+from .helpers import ImageExporter
+
+# Upper bound for the automatic worker count; encoders are memory hungry at
+# high effort settings and ComfyUI shares the machine with the sampler.
+MAX_AUTO_WORKERS = 8
+
+
+@dataclass
+class EncodeJob:
+    image: Any
+    final_path: str
+    overwrite: bool = True  # False: fail instead of replacing a file that appeared at final_path
+    guard: Callable[[], ContextManager] | None = None  # see ImageExporter.save_frame
+
+
+@dataclass
+class EncodeResult:
+    final_path: str
+    error: Exception | None = None
+    seconds: float = 0.0  # time spent in the encoder, excluding conversion
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def resolve_worker_count(requested: int | None, job_count: int) -> int:
+    """Return the number of workers to use; ``0``/``None`` means automatic."""
+    if not requested or requested <= 0:
+        requested = min(MAX_AUTO_WORKERS, os.cpu_count() or 1)
+    return max(1, min(requested, job_count))
+
+
+# Each worker thread keeps its uint8 output buffer and reuses it for the next
+# frame of the same shape, so converting a batch allocates per worker, not per image.
+_worker_state = threading.local()
+
+
+def encode_job(job: EncodeJob, fmt_params: dict) -> EncodeResult:
+    """Convert and save one job on the calling thread, capturing any error."""
+    try:
+        if job.image is None:
+            raise ValueError("Unsupported image type")
+        frames = ImageExporter.batch_to_uint8(job.image, out=getattr(_worker_state, "frames", None))
+        _worker_state.frames = frames
+        if frames.shape[0] != 1:
+            raise ValueError("Image array must be HxWx3 or HxWx4 after preprocessing")
+        start = time.perf_counter()
+        ImageExporter.save_frame(frames[0], job.final_path, fmt_params, job.overwrite, job.guard)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        return EncodeResult(job.final_path, e)
+    return EncodeResult(job.final_path, seconds=elapsed)
+
+
+def release_buffers() -> None:
+    """Drop the calling thread's reusable frame buffer (call after encoding on a long-lived thread)."""
+    _worker_state.frames = None
+
+
+def iter_encode(jobs: list[EncodeJob], fmt_params: dict, workers: int | None = 0) -> Iterator[EncodeResult]:
+    """Encode and save every job, yielding one result per job in job order.
+
+    Each result is yielded as soon as it and every earlier job are done, so a
+    caller can journal finished files while later ones are still encoding.
+    Errors are captured per file instead of aborting the batch.
+    """
+    if not jobs:
+        return
+    workers = resolve_worker_count(workers, len(jobs))
+    if workers == 1:
+        try:
+            for job in jobs:
+                yield encode_job(job, fmt_params)
+        finally:
+            release_buffers()
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="voxta-encode") as pool:
+        futures = [pool.submit(encode_job, job, fmt_params) for job in jobs]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # Interrupted: do not start encodes nobody will record
+            for future in futures:
+                future.cancel()
+
+
+def encode_all(jobs: list[EncodeJob], fmt_params: dict, workers: int | None = 0) -> list[EncodeResult]:
+    """Encode and save every job, returning one result per job in job order (see ``iter_encode``)."""
+    return list(iter_encode(jobs, fmt_params, workers))
+
+
+__all__ = ["EncodeJob", "EncodeResult", "encode_all", "encode_job", "iter_encode", "release_buffers", "resolve_worker_count"]
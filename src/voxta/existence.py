@@ -0,0 +1,86 @@
+"""Compact, vectorized existence checks for the filter node.
+
+Checking tens of thousands of combinations one ``has_index`` call at a time
+walks a ``stem -> ext -> set`` structure per combination. An
+``ExistenceBitmap`` instead interns every stem of a folder to a small integer
+and keeps one fixed-width bitmask of its enumerations, so a whole batch is
+answered by a single NumPy gather. Enumerations beyond the bitmask (wide
+``index_width`` settings) are rare and checked individually.
+
+NumPy is imported on first use, like in ``helpers``.
+"""
+
+from __future__ import annotations
+
+from itertools import chain
+from typing import Iterable, Iterator
+
+from .helpers import _numpy
+
+# Enumerations 0..127 per stem, in 16 bytes; covers the default 1..99 range
+BITMAP_BYTES = 16
+BITMAP_INDICES = 8 * BITMAP_BYTES
+
+
+class ExistenceBitmap:
+    """Which ``(stem, index)`` pairs exist in a folder (or folder tree), as bitmasks."""
+
+    def __init__(self, entries: Iterable[tuple[str, Iterable[int]]]):
+        np = _numpy()
+        self._ids: dict[str, int] = {}
+        rows: list[bytearray] = []
+        self._overflow: dict[int, set[int]] = {}
+        for stem, indices in entries:
+            sid = self._ids.get(stem)
+            if sid is None:
+                sid = self._ids[stem] = len(rows)
+                rows.append(bytearray(BITMAP_BYTES))
+            mask = rows[sid]
+            for idx in indices:
+                if 0 <= idx < BITMAP_INDICES:
+                    mask[idx >> 3] |= 1 << (idx & 7)
+                else:
+                    self._overflow.setdefault(sid, set()).add(idx)
+        self._bits = np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), BITMAP_BYTES)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def lookup(self, resolved: Iterable[tuple[str, int | None]]):
+        """Boolean array of existence flags for ``(stem, index)`` pairs as returned by ``resolve_stem``.
+
+        ``resolved`` is consumed in a single pass, so it can be a generator. A
+        ``None`` index asks whether any enumeration of the stem exists; every
+        interned stem has at least one.
+        """
+        np = _numpy()
+        ids = self._ids
+        pairs = chain.from_iterable((ids.get(stem, -1), -1 if i is None else i) for stem, i in resolved)
+        flat = np.fromiter(pairs, dtype=np.int32)
+        sid, idx = flat[0::2], flat[1::2]
+        if not ids:
+            return np.zeros(len(sid), dtype=bool)
+        known = sid >= 0
+        whole = idx < 0
+        in_bitmap = ~whole & (idx < BITMAP_INDICES)
+        bit = np.clip(idx, 0, BITMAP_INDICES - 1)
+        hit = (self._bits[np.maximum(sid, 0), bit >> 3] >> (bit & 7).astype(np.uint8)) & 1
+        exists = known & (whole | (in_bitmap & hit.astype(bool)))
+        for pos in np.flatnonzero(known & ~whole & ~in_bitmap):
+            exists[pos] = idx[pos] in self._overflow.get(int(sid[pos]), ())
+        return exists
+
+
+def missing_positions(exists_flags) -> list[int]:
+    """Positions of the false entries of a flag list or array."""
+    np = _numpy()
+    return np.flatnonzero(~np.asarray(exists_flags, dtype=bool)).tolist()
+
+
+def iter_missing_positions(exists_flags) -> Iterator[int]:
+    """Like ``missing_positions``, streamed from a compact integer array instead of a list."""
+    np = _numpy()
+    return map(int, np.flatnonzero(~np.asarray(exists_flags, dtype=bool)))
+
+
+__all__ = ["ExistenceBitmap", "BITMAP_INDICES", "iter_missing_positions", "missing_positions"]
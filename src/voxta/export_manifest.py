@@ -0,0 +1,234 @@
+"""Export journal, stored next to the exported images.
+
+The journal is a JSON-lines file (one object per line) that is appended to
+while resume or dedup is enabled. Each run writes a ``start`` record, one
+record per saved, skipped or failed image as it happens, and a ``finish``
+record with the same summary the node reports in its ``ui`` payload. Images
+are fsynced and renamed into place before their ``saved`` record is written,
+so a run that never reaches ``finish`` was interrupted and its ``saved``
+records list files that made it to disk. ``find_resumable_run`` uses that to
+continue such a run. Records themselves are only fsynced at ``finish``: one
+lost to a crash costs a re-encode on resume, never a missing image.
+
+Once the journal grows past ``MAX_MANIFEST_BYTES``, ``compact_manifest``
+rewrites it with only what resume and dedup still need.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Iterable, Iterator
+
+from .stems import DEFAULT_INDEX_WIDTH
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = ".voxta_export_manifest.jsonl"
+
+# Journal size that triggers a compaction (about 5000 records)
+MAX_MANIFEST_BYTES = 1024 * 1024
+
+# Journal path -> size right after this process last compacted it
+_compacted_sizes: dict[str, int] = {}
+_compacted_lock = threading.Lock()
+
+
+class ExportManifest:
+    """Appends the records of one export run.
+
+    The file is opened per record, so each line reaches the OS as soon as the
+    corresponding image is in place and nothing is held open between node
+    runs. A disabled manifest writes nothing.
+    """
+
+    def __init__(self, save_dir: str, run_id: str | None = None, enabled: bool = True):
+        self.path = os.path.join(save_dir, MANIFEST_FILENAME)
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.enabled = enabled
+
+    def _write(self, event: str, sync: bool = False, **fields: Any) -> None:
+        if not self.enabled:
+            return
+        record = {"run": self.run_id, "event": event, "time": round(time.time(), 3), **fields}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def job_key(ext: str, on_exists: str, combination_ids: Iterable[list[str]], index_width: int = DEFAULT_INDEX_WIDTH) -> str:
+        """Identify an export job by what it writes, so a rerun of the same job can resume it.
+
+        Hashes the JSON form of ``[ext, on_exists, combination_ids, index_width]``
+        one combination at a time, so lazy sequences are never materialized.
+        """
+
+        def dumps(value) -> bytes:
+            return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        h = hashlib.sha1(b"[" + dumps(ext) + b"," + dumps(on_exists) + b",[")
+        for i, cid in enumerate(combination_ids):
+            h.update(dumps(cid) if i == 0 else b"," + dumps(cid))
+        h.update(b"]," + dumps(index_width) + b"]")
+        return h.hexdigest()
+
+    def start(self, **fields: Any) -> None:
+        self._write("start", **fields)
+
+    def saved(self, filename: str, ids: list[str], pos: int, **fields: Any) -> None:
+        self._write("saved", file=filename, ids=ids, pos=pos, **fields)
+
+    def skipped(self, filename: str, ids: list[str], pos: int, **fields: Any) -> None:
+        self._write("skipped", file=filename, ids=ids, pos=pos, **fields)
+
+    def failed(self, filename: str, ids: list[str], pos: int, error: str) -> None:
+        self._write("failed", file=filename, ids=ids, pos=pos, error=error)
+
+    def finish(self, **fields: Any) -> None:
+        self._write("finish", sync=True, **fields)
+
+
+def read_manifest(save_dir: str) -> Iterator[dict[str, Any]]:
+    """Yield manifest records, skipping a torn last line left by a crash."""
+    path = os.path.join(save_dir, MANIFEST_FILENAME)
+    try:
+        f = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.debug("Ignoring unreadable manifest line in %s", path)
+
+
+def read_manifest_tail(
+    save_dir: str, offset: int = 0, file_id: tuple[int, int] | None = None
+) -> tuple[list[dict[str, Any]], int, tuple[int, int] | None]:
+    """Read the complete records appended after byte ``offset`` of the journal ``file_id``.
+
+    Returns the records, the offset and the file id to continue from next
+    time. A trailing line without its newline (still being written, or torn)
+    is left for later. A journal that is a different file than ``file_id``
+    (compacted or replaced) or shorter than ``offset`` is read from the start.
+    """
+    path = os.path.join(save_dir, MANIFEST_FILENAME)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return [], 0, None
+    with f:
+        st = os.fstat(f.fileno())
+        current_id = (st.st_dev, st.st_ino)
+        if current_id != file_id or st.st_size < offset:
+            offset = 0
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    records = []
+    for line in data[:end].splitlines():
+        try:
+            records.append(json.loads(line))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            logger.debug("Ignoring unreadable manifest line in %s", path)
+    return records, offset + end, current_id
+
+
+def compact_manifest(save_dir: str, max_bytes: int = MAX_MANIFEST_BYTES) -> bool:
+    """Rewrite a journal that grew past ``max_bytes`` with only what resume and dedup need.
+
+    Kept are every record of the latest unfinished run of each job (what
+    ``find_resumable_run`` looks for) and the newest hashed ``saved`` record of
+    every file still present (what ``DedupIndex`` reads). The rewrite replaces
+    the journal atomically. A journal that is still large afterwards is only
+    compacted again once it has doubled. Returns whether it was rewritten.
+    """
+    path = os.path.join(save_dir, MANIFEST_FILENAME)
+    key = os.path.normcase(os.path.abspath(path))
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        return False
+    with _compacted_lock:
+        if size <= max(max_bytes, 2 * _compacted_sizes.get(key, 0)):
+            return False
+
+    records = list(read_manifest(save_dir))
+    latest_start: dict[Any, Any] = {}
+    finished = set()
+    newest_hashed: dict[str, int] = {}
+    for i, record in enumerate(records):
+        event = record.get("event")
+        if event == "start":
+            latest_start[record.get("job")] = record.get("run")
+        elif event == "finish":
+            finished.add(record.get("run"))
+        elif event == "saved" and record.get("hash"):
+            newest_hashed[record.get("file")] = i
+    resumable = {run for run in latest_start.values() if run not in finished}
+    hashed = {i for name, i in newest_hashed.items() if isinstance(name, str) and os.path.isfile(os.path.join(save_dir, name))}
+    kept = [record for i, record in enumerate(records) if record.get("run") in resumable or i in hashed]
+
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with open(tmp_path, "x", encoding="utf-8") as f:
+            for record in kept:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            compacted = f.tell()
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    with _compacted_lock:
+        _compacted_sizes[key] = compacted
+    logger.info("Compacted export journal in %s: kept %d of %d records", save_dir, len(kept), len(records))
+    return True
+
+
+def find_resumable_run(save_dir: str, job_key: str) -> tuple[str | None, dict[int, str]]:
+    """Find the latest unfinished run of ``job_key`` in ``save_dir``.
+
+    Returns its run id and the files it saved, keyed by combination position.
+    Saved files that have since been deleted are left out so they get written
+    again. Returns ``(None, {})`` when there is nothing to resume.
+    """
+    run_id: str | None = None
+    saved: dict[int, str] = {}
+    for record in read_manifest(save_dir):
+        event = record.get("event")
+        if event == "start":
+            if record.get("job") == job_key:
+                run_id, saved = record.get("run"), {}
+        elif record.get("run") != run_id or run_id is None:
+            continue
+        elif event == "finish":
+            run_id, saved = None, {}
+        elif event == "saved" and isinstance(record.get("pos"), int):
+            saved[record["pos"]] = record["file"]
+    if run_id is None:
+        return None, {}
+    return run_id, {pos: name for pos, name in saved.items() if os.path.isfile(os.path.join(save_dir, name))}
+
+
+__all__ = [
+    "ExportManifest",
+    "MANIFEST_FILENAME",
+    "MAX_MANIFEST_BYTES",
+    "compact_manifest",
+    "find_resumable_run",
+    "read_manifest",
+    "read_manifest_tail",
+]
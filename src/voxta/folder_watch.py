@@ -0,0 +1,180 @@
+"""Keep cached output folder state current when files change outside ComfyUI.
+
+Voxta and users add and delete avatars while ComfyUI is running. The Output
+Folder node registers its resolved directory with ``folder_watcher``:
+
+- with the optional ``watchdog`` package, native notifications (inotify,
+  FSEvents, ReadDirectoryChangesW) are applied to the folder's ``StemIndex``
+  as they arrive and the index is marked live, so filter and export runs
+  use it without any rescan or even a ``stat``;
+- without it (or if the OS refuses another watch), a background thread
+  polls registered folders every few seconds and rescans the ones whose
+  mtime changed, so node runs find the index already up to date.
+
+Watches are non-recursive and limited to the most recently registered
+folders; anything not watched falls back to the regular mtime check.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from .stem_index import StemIndex, get_stem_index
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 2.0
+MAX_WATCHED_FOLDERS = 16
+
+
+def _load_observer():
+    """watchdog's ``Observer`` class, imported on first watch; ``None`` if not installed."""
+    try:
+        from watchdog.observers import Observer
+    except Exception:
+        return None
+    return Observer
+
+
+class _IndexEventHandler:
+    """Translates watchdog events for one folder into ``StemIndex.apply_change`` calls.
+
+    Implements watchdog's handler protocol (``dispatch``) directly, so this module
+    does not import watchdog until a folder is actually watched.
+    """
+
+    def __init__(self, index: StemIndex):
+        self.index = index
+        self._directory = os.path.normcase(os.path.abspath(index.directory))
+
+    def _apply(self, path, present: bool, is_dir: bool) -> None:
+        path = os.path.normcase(os.path.abspath(os.fsdecode(path)))
+        parent, name = os.path.split(path)
+        if parent == self._directory:
+            self.index.apply_change(name, present, is_dir)
+        elif path == self._directory and not present:
+            # The folder itself went away; fall back to mtime checks until it is watched again
+            self.index.set_live(False)
+
+    def dispatch(self, event) -> None:
+        kind = event.event_type
+        if kind == "created":
+            self._apply(event.src_path, True, event.is_directory)
+        elif kind == "deleted":
+            self._apply(event.src_path, False, event.is_directory)
+        elif kind == "moved":
+            self._apply(event.src_path, False, event.is_directory)
+            self._apply(event.dest_path, True, event.is_directory)
+
+
+class FolderWatcher:
+    """Registry of watched output folders (see module docstring)."""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL, max_folders: int = MAX_WATCHED_FOLDERS, use_watchdog: bool = True):
+        self.poll_interval = poll_interval
+        self.max_folders = max_folders
+        self.use_watchdog = use_watchdog
+        # key -> (index, watchdog watch handle or None when polled)
+        self._watches: "OrderedDict[str, tuple[StemIndex, object | None]]" = OrderedDict()
+        self._observer = None
+        self._poll_thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def watch(self, directory: str) -> StemIndex:
+        """Start watching ``directory`` (idempotent) and return its index."""
+        key = os.path.normcase(os.path.abspath(directory))
+        index = get_stem_index(directory)
+        with self._lock:
+            current = self._watches.get(key)
+            if current is not None and current[0] is index:
+                self._watches.move_to_end(key)
+                return index
+            if current is not None:
+                self._unschedule(key)
+            handle = self._schedule(index) if os.path.isdir(directory) else None
+            self._watches[key] = (index, handle)
+            if handle is None:
+                self._ensure_polling()
+            while len(self._watches) > self.max_folders:
+                self._unschedule(next(iter(self._watches)))
+        return index
+
+    def unwatch(self, directory: str) -> None:
+        with self._lock:
+            self._unschedule(os.path.normcase(os.path.abspath(directory)))
+
+    def watched(self) -> list[str]:
+        with self._lock:
+            return [index.directory for index, _ in self._watches.values()]
+
+    def stop(self) -> None:
+        """Drop every watch and stop the background threads."""
+        with self._lock:
+            for key in list(self._watches):
+                self._unschedule(key)
+            observer, self._observer = self._observer, None
+            self._stop.set()
+            poll_thread, self._poll_thread = self._poll_thread, None
+        if observer is not None:
+            observer.stop()
+            observer.join(timeout=5)
+        if poll_thread is not None:
+            poll_thread.join(timeout=5)
+        self._stop = threading.Event()
+
+    def _schedule(self, index: StemIndex):
+        if not self.use_watchdog:
+            return None
+        try:
+            if self._observer is None:
+                observer_class = _load_observer()
+                if observer_class is None:
+                    self.use_watchdog = False
+                    return None
+                observer = observer_class()
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+            handle = self._observer.schedule(_IndexEventHandler(index), index.directory, recursive=False)
+        except Exception as e:  # inotify watch limits, unsupported network shares, ...
+            logger.warning("Cannot watch %s (%s); polling it instead", index.directory, e)
+            return None
+        index.set_live(True)
+        return handle
+
+    def _unschedule(self, key: str) -> None:
+        entry = self._watches.pop(key, None)
+        if entry is None:
+            return
+        index, handle = entry
+        index.set_live(False)
+        if handle is not None and self._observer is not None:
+            try:
+                self._observer.unschedule(handle)
+            except Exception:  # already gone with its folder
+                pass
+
+    def _ensure_polling(self) -> None:
+        if self._poll_thread is None or not self._poll_thread.is_alive():
+            self._poll_thread = threading.Thread(target=self._poll_loop, args=(self._stop,), name="voxta-folder-poll", daemon=True)
+            self._poll_thread.start()
+
+    def _poll_loop(self, stop: threading.Event) -> None:
+        while not stop.wait(self.poll_interval):
+            with self._lock:
+                polled = [index for index, handle in self._watches.values() if handle is None]
+            for index in polled:
+                try:
+                    index.refresh()
+                except OSError as e:
+                    logger.debug("Polling %s failed: %s", index.directory, e)
+
+
+folder_watcher = FolderWatcher()
+
+
+__all__ = ["FolderWatcher", "folder_watcher", "POLL_INTERVAL", "MAX_WATCHED_FOLDERS"]
@@ -0,0 +1,49 @@
+"""Run blocking filesystem work for aiohttp handlers off ComfyUI's event loop.
+
+The web endpoints share ``PromptServer``'s loop with websocket progress updates,
+so a stat on a slow network share must never run inline. ``run_blocking`` sends
+the call to a small dedicated thread pool, caps how many calls may be queued
+at once per loop, and gives up after a timeout.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+MAX_WORKERS = 8
+# Calls allowed in flight (running or queued on the pool) per event loop.
+MAX_CONCURRENT_CALLS = 32
+DEFAULT_TIMEOUT = 10.0
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="voxta-fs")
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_semaphores_lock = threading.Lock()
+
+
+def _semaphore_for(loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+    with _semaphores_lock:
+        sem = _semaphores.get(loop)
+        if sem is None:
+            sem = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+            _semaphores[loop] = sem
+        return sem
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, timeout: float | None = DEFAULT_TIMEOUT) -> T:
+    """Run ``func(*args)`` on the filesystem pool.
+
+    Raises ``asyncio.TimeoutError`` if the call does not finish within ``timeout``
+    seconds; the worker thread keeps running but the request is released.
+    """
+    loop = asyncio.get_running_loop()
+    async with _semaphore_for(loop):
+        return await asyncio.wait_for(loop.run_in_executor(_executor, func, *args), timeout)
+
+
+__all__ = ["run_blocking", "DEFAULT_TIMEOUT", "MAX_CONCURRENT_CALLS"]
@@ -1,6 +1,17 @@
+import errno
+import logging
 import os
 import re
-from typing import Iterable
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Callable, ContextManager, Iterable
+
+from .stems import sanitize_stem
+
+logger = logging.getLogger(__name__)
 
 try:  # pragma: no cover
     import folder_paths  # type: ignore
@@ -12,47 +23,116 @@ except Exception:  # pragma: no cover
             return os.path.join(os.getcwd(), "output")
 
 
-try:  # pragma: no cover
+# Pillow and NumPy are imported on first use so that loading the nodes at
+# ComfyUI startup does not pay for them; after that the import is a dict lookup.
+def _numpy():
+    import numpy
+
+    return numpy
+
+
+def _pil_image():
     from PIL import Image
-except Exception:  # pragma: no cover
-    Image = None  # type: ignore
 
-try:  # pragma: no cover
-    import numpy as np
-except Exception:  # pragma: no cover
-    np = None  # type: ignore
+    return Image
 
 
 class ComfyHelper:
     @staticmethod
     def comfy_input_to_str(value: list[str] | str, default: str = "") -> str:
-        print(r"[VOXTA DEBUG] Raw folder input:", repr(value))
         if isinstance(value, str):
             v = value.strip()
-            print(r"[VOXTA DEBUG] Interpreted as string:", repr(v))
+            logger.debug("comfy_input_to_str: string %r -> %r", value, v)
             return v or default
         # sequence / list-like
         if len(value):
             v = str(value[0]).strip()
-            print(r"[VOXTA DEBUG] Interpreted as list, first item:", repr(v))
+            logger.debug("comfy_input_to_str: list %r -> first item %r", value, v)
             return v or default
-        print(r"[VOXTA DEBUG] Interpreted as empty list, using default:", repr(default))
+        logger.debug("comfy_input_to_str: empty list, using default %r", default)
         return default
 
 
+VERBOSITY_OPTIONS = ["summary", "verbose", "quiet"]
+
+
+class RunLogger:
+    """Logging front end for one node execution, honoring the node's ``verbosity`` input.
+
+    - ``quiet``: only warnings and errors reach the log.
+    - ``summary`` (default): one INFO line per batch; per-item lines stay at DEBUG.
+    - ``verbose``: per-item lines are promoted to INFO as well.
+
+    Messages use lazy ``%`` formatting, so suppressed lines cost almost nothing.
+    """
+
+    def __init__(self, log: logging.Logger, verbosity: list[str] | str | None = "summary"):
+        self.log = log
+        value = ComfyHelper.comfy_input_to_str(verbosity or "", "summary")
+        self.verbosity = value if value in VERBOSITY_OPTIONS else "summary"
+
+    @property
+    def items_enabled(self) -> bool:
+        """Whether per-item lines would be emitted; lets hot loops skip building arguments."""
+        return self.verbosity == "verbose" or self.log.isEnabledFor(logging.DEBUG)
+
+    def item(self, msg: str, *args) -> None:
+        self.log.log(logging.INFO if self.verbosity == "verbose" else logging.DEBUG, msg, *args)
+
+    def summary(self, msg: str, *args) -> None:
+        self.log.log(logging.DEBUG if self.verbosity == "quiet" else logging.INFO, msg, *args)
+
+    def warning(self, msg: str, *args) -> None:
+        self.log.warning(msg, *args)
+
+    def error(self, msg: str, *args) -> None:
+        self.log.error(msg, *args)
+
+
+@lru_cache(maxsize=256)
+def _resolve_output_directory(root_raw: str, sub_raw: str, base: str) -> str:
+    # base is the cwd (relative roots) or ComfyUI's output directory (empty root), so it is part of the key
+    output_path = FolderHelper.sanitize_full_path(root_raw) if root_raw else base
+    if sub_raw:
+        sub = FolderHelper.sanitize_subfolder(sub_raw)
+        if sub:
+            output_path = os.path.join(output_path, sub)
+    return output_path
+
+
+# Directories this process has already created or seen; makedirs is skipped for them.
+_ensured_directories: set[str] = set()
+
+
 class FolderHelper:
+    @staticmethod
+    def resolve_output_directory(target: list[str] | str, subfolder: list[str] | str) -> str:
+        """Resolve the raw node inputs to an absolute folder path without touching the filesystem.
+
+        Results are cached per raw (target, subfolder) pair, so every node in a
+        workflow resolving the same inputs pays for the expansion only once.
+        """
+        root_raw = ComfyHelper.comfy_input_to_str(target)
+        sub_raw = ComfyHelper.comfy_input_to_str(subfolder, "")
+        base = os.getcwd() if root_raw else folder_paths.get_output_directory()
+        return _resolve_output_directory(root_raw, sub_raw, base)
+
+    @staticmethod
+    def ensure_directory(path: str) -> str:
+        """``os.makedirs(path, exist_ok=True)``, once per directory and process."""
+        if path not in _ensured_directories:
+            os.makedirs(path, exist_ok=True)
+            _ensured_directories.add(path)
+        return path
+
+    @staticmethod
+    def forget_directory(path: str) -> None:
+        """Drop ``path`` from the created-directories memo (e.g. after it was found missing)."""
+        _ensured_directories.discard(path)
+
     @staticmethod
     def get_output_directory(target: list[str] | str, subfolder: list[str] | str) -> str:
-        output_path = ComfyHelper.comfy_input_to_str(target)
-        output_path = FolderHelper.sanitize_full_path(output_path) or folder_paths.get_output_directory()
-        os.makedirs(output_path, exist_ok=True)
-        raw_sub = ComfyHelper.comfy_input_to_str(subfolder, "")
-        if raw_sub:
-            raw_sub = FolderHelper.sanitize_subfolder(raw_sub)
-            if raw_sub:
-                output_path = os.path.join(output_path, raw_sub)
-                os.makedirs(output_path, exist_ok=True)
-        return output_path
+        return FolderHelper.ensure_directory(FolderHelper.resolve_output_directory(target, subfolder))
 
     @staticmethod
     def sanitize_subfolder(sub: str) -> str:
@@ -76,15 +156,8 @@ class IdFilenameBuilder:
 
     @staticmethod
     def sanitize_id_filename(id_list: Iterable[str]) -> str:
-        # Remove entries that contain the substring _no_id_
-        id_list = [i for i in id_list if "_no_id_" not in i]
-        # Join with underscore and aggressively sanitize; collapse repeats.
-        raw = "_".join(id_list)
-        raw = raw.replace(" ", "_")
-        raw = re.sub(r"[^A-Za-z0-9_.]", "_", raw)
-        raw = re.sub(r"_+", "_", raw)  # collapse multiple underscores
-        raw = raw.strip("_.")
-        return raw or "image"
+        # Drop _no_id_ entries, join with underscores and collapse unsafe runs (memoized, see stems)
+        return sanitize_stem(id_list)
 
     @staticmethod
     def ensure_unique(stem: str, ext: str, used: set[str]) -> str:
@@ -106,14 +179,23 @@ class ImageExporter:
         ".webp lossless": {"ext": ".webp", "params": {"format": "WEBP", "lossless": True, "quality": 100, "method": 6}},
         ".webp lossy 80": {"ext": ".webp", "params": {"format": "WEBP", "lossless": False, "quality": 80, "method": 6}},
         ".webp lossy 90": {"ext": ".webp", "params": {"format": "WEBP", "lossless": False, "quality": 90, "method": 6}},
+        # Throughput presets: about 10% larger files than the presets above at a fraction of the encode time
+        ".webp lossy 80 fast": {"ext": ".webp", "params": {"format": "WEBP", "lossless": False, "quality": 80, "method": 2}},
+        ".webp lossy 90 fast": {"ext": ".webp", "params": {"format": "WEBP", "lossless": False, "quality": 90, "method": 2}},
+        ".webp lossless fast": {"ext": ".webp", "params": {"format": "WEBP", "lossless": True, "quality": 50, "method": 4}},
+        ".png fast": {"ext": ".png", "params": {"format": "PNG", "compress_level": 1}},
     }
 
     @staticmethod
     def require_modules():  # pragma: no cover
-        if Image is None:
-            raise RuntimeError("Pillow is required (missing PIL.Image).")
-        if np is None:
-            raise RuntimeError("NumPy is required (missing numpy module).")
+        try:
+            _pil_image()
+        except ImportError:
+            raise RuntimeError("Pillow is required (missing PIL.Image).") from None
+        try:
+            _numpy()
+        except ImportError:
+            raise RuntimeError("NumPy is required (missing numpy module).") from None
 
     @classmethod
     def determine_format(cls, option: str):
@@ -128,17 +210,174 @@ class ImageExporter:
         except Exception:
             return image
 
+    # Per-thread float32 scratch reused across conversions (see batch_to_uint8). It covers
+    # a band of rows rather than a whole frame so it stays small for large images.
+    _scratch = threading.local()
+    SCRATCH_PIXELS = 1 << 18
+
+    @staticmethod
+    def _as_frames(batch):
+        """Return ``batch`` as a host array shaped (B,H,W,C) without copying CPU data."""
+        if hasattr(batch, "detach") and callable(getattr(batch, "detach")):
+            t = batch.detach()
+            if t.dim() == 3:
+                t = t.unsqueeze(0)
+            if t.device.type != "cpu" and t.is_floating_point() and t.dim() == 4:
+                # Quantize on the device so only uint8 data is copied to host memory.
+                scale = (t.amax(dim=(1, 2, 3), keepdim=True) <= 1.5).float() * 254.0 + 1.0
+                t = (t.float() * scale).clamp_(0, 255).byte()
+            return t.cpu().numpy()
+        arr = _numpy().asarray(batch)
+        if arr.ndim == 3:
+            arr = arr[None]
+        return arr
+
+    @classmethod
+    def _scratch_rows(cls, width: int, channels: int):
+        rows = max(1, cls.SCRATCH_PIXELS // max(1, width))
+        buf = getattr(cls._scratch, "rows", None)
+        if buf is None or buf.shape[0] < rows or buf.shape[1:] != (width, channels):
+            np = _numpy()
+            buf = np.empty((rows, width, channels), dtype=np.float32)
+            cls._scratch.rows = buf
+        return buf
+
+    @classmethod
+    def batch_to_uint8(cls, batch, out=None):
+        """Scale and quantize an IMAGE batch to uint8 with vectorized NumPy passes.
+
+        Accepts a torch tensor or NumPy array shaped (B,H,W,C) or (H,W,C). Frames
+        whose maximum is <= 1.5 are treated as [0,1] floats and scaled by 255.
+        Arithmetic stays in float32 inside a small per-thread scratch band, and
+        the result is written to ``out`` when it has the right shape, so repeated
+        calls allocate nothing. Always returns a (B,H,W,C) uint8 array owned by
+        the caller (never a view of ``batch``).
+        """
+        np = _numpy()
+        arr = cls._as_frames(batch)
+        if arr.ndim != 4 or arr.shape[-1] not in (3, 4):
+            raise ValueError("Image array must be HxWx3 or HxWx4 after preprocessing")
+        if out is None or out.shape != arr.shape or out.dtype != np.uint8:
+            out = np.empty(arr.shape, dtype=np.uint8)
+        if arr.dtype == np.uint8:
+            np.copyto(out, arr)
+            return out
+        _, height, width, channels = arr.shape
+        scratch = cls._scratch_rows(width, channels)
+        step = scratch.shape[0]
+        for i, frame in enumerate(arr):
+            scale = np.float32(255.0 if frame.max() <= 1.5 else 1.0)
+            for top in range(0, height, step):
+                band = frame[top : top + step]
+                buf = scratch[: band.shape[0]]
+                np.multiply(band, scale, out=buf)
+                np.clip(buf, 0, 255, out=buf)
+                out[i, top : top + step] = buf  # truncating cast, matching astype("uint8")
+        return out
+
     @staticmethod
-    def save_image(arr, final_path: str, fmt_params):
+    def save_frame(
+        frame,
+        final_path: str,
+        fmt_params,
+        overwrite: bool = True,
+        guard: Callable[[], ContextManager] | None = None,
+    ):
+        """Encode a single HxWxC uint8 frame and move it into place atomically.
+
+        The image is written to a hidden ``.part`` file in the same directory,
+        fsynced and renamed over ``final_path``, so the final name never refers
+        to a truncated image even if the process dies mid-encode. With
+        ``overwrite=False`` an existing ``final_path`` is left alone and
+        ``FileExistsError`` is raised. Every change to the directory's entries
+        runs inside a ``guard()`` context (see ``StemIndex.own_write``).
+        """
+        guard = guard or nullcontext
+        directory, name = os.path.split(final_path)
+        tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            try:
+                with guard():
+                    f = open(tmp_path, "xb")
+            except FileNotFoundError:
+                # The folder was deleted after it was created for this session
+                FolderHelper.forget_directory(directory)
+                FolderHelper.ensure_directory(directory)
+                with guard():
+                    f = open(tmp_path, "xb")
+            with f:
+                _pil_image().fromarray(frame).save(f, **fmt_params)  # type: ignore[arg-type]
+                f.flush()
+                os.fsync(f.fileno())
+            with guard():
+                ImageExporter.move_into_place(tmp_path, final_path, overwrite)
+        except BaseException:
+            try:
+                with guard():
+                    os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        ImageExporter._fsync_directory(directory)
+
+    @staticmethod
+    def move_into_place(tmp_path: str, final_path: str, overwrite: bool = True) -> None:
+        """Rename ``tmp_path`` to ``final_path``; without ``overwrite``, never replace an existing file.
+
+        The no-overwrite move hardlinks the new name, which fails if it exists,
+        then drops the temporary name. Where hardlinks are not supported
+        (FAT/exFAT, some network shares) it falls back to checking first.
+        """
+        if overwrite:
+            os.replace(tmp_path, final_path)
+            return
+        try:
+            os.link(tmp_path, final_path)
+        except FileExistsError:
+            raise
+        except OSError:
+            if os.path.lexists(final_path):
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), final_path) from None
+            os.replace(tmp_path, final_path)
+            return
+        os.unlink(tmp_path)
+
+    @staticmethod
+    def _fsync_directory(directory: str) -> None:
+        """Persist a rename; best effort, not supported on every platform."""
+        try:
+            fd = os.open(directory or ".", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def remove_stale_partials(save_dir: str, names: Iterable[str], max_age: float = 600.0) -> int:
+        """Delete ``.part`` files older than ``max_age`` seconds; younger ones may belong to a running export."""
+        removed = 0
+        cutoff = time.time() - max_age
+        for name in names:
+            path = os.path.join(save_dir, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info("Removed %d stale partial file(s) from %s", removed, save_dir)
+        return removed
+
+    @classmethod
+    def save_image(cls, arr, final_path: str, fmt_params):
         if arr is None:
             raise ValueError("Unsupported image type")
-        if arr.ndim == 4 and arr.shape[0] == 1:
-            arr = arr[0]
-        if arr.max() <= 1.5:
-            arr = arr * 255.0
-        arr = arr.clip(0, 255).astype("uint8")
-        # Let Pillow infer mode; ensure shape is (H,W,3) or (H,W,4)
-        if arr.ndim != 3 or arr.shape[2] not in (3, 4):
+        frames = cls.batch_to_uint8(arr)
+        if frames.shape[0] != 1:
             raise ValueError("Image array must be HxWx3 or HxWx4 after preprocessing")
-        img = Image.fromarray(arr)
-        img.save(final_path, **fmt_params)  # type: ignore[arg-type]
+        cls.save_frame(frames[0], final_path, fmt_params)
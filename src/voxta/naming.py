@@ -6,57 +6,213 @@ so that it can be unit-tested independently from the node class.
 
 from __future__ import annotations
 
-import os
 import logging
-import re
-from typing import List
+import os
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Sequence
 
-from .helpers import IdFilenameBuilder
+from .stem_index import StemIndex, get_stem_index
+from .stems import DEFAULT_INDEX_WIDTH, format_enumerated, max_index_for_width, resolve_stem, sanitize_stem
 
 logger = logging.getLogger(__name__)
 
 
-def determine_filename(ids: List[str], ext: str, save_dir: str) -> str:
+def _check_capacity(idx: int, width: int, stem: str, where: str) -> None:
+    limit = max_index_for_width(width)
+    if idx > limit:
+        raise ValueError(f"Exceeded {limit} variations for stem '{stem}' in {where}; increase index_width")
+
+
+def determine_filename(ids: List[str], ext: str, save_dir: str, width: int = DEFAULT_INDEX_WIDTH) -> str:
     """Return a unique filename for the provided id list.
 
     Strategy:
     1. Sanitize the id list into a stem.
-    2. Find existing files on disk with the same stem.
-    3. Determine the highest existing enumeration and add one.
+    2. Look up the highest existing enumeration for the stem in the directory's stem index (O(1)).
+    3. Add one and zero-pad it to ``width`` digits.
 
     Raises
     ------
     ValueError
-        If more than 99 enumerations are needed (i.e., Neutral_Idle_99 already exists).
+        If the next enumeration does not fit ``width`` digits (i.e., Neutral_Idle_99 already exists at width 2).
     """
-    stem = IdFilenameBuilder.sanitize_id_filename(ids)
-    if not stem:
-        stem = "image"
-
-    # Regex to find stem_XX.ext
-    pattern = re.compile(f"^{re.escape(stem)}_(\\d+){re.escape(ext)}$")
-
-    max_found = 0
-    try:
-        for f in os.listdir(save_dir):
-            match = pattern.match(f)
-            if match:
-                num = int(match.group(1))
-                if num > max_found:
-                    max_found = num
-    except FileNotFoundError:
-        # Directory may not exist yet, which is fine
-        pass
+    stem = sanitize_stem(ids)
 
-    count = max_found + 1
+    max_found = get_stem_index(save_dir).max_index(stem, ext)
 
-    if count > 99:
-        raise ValueError(f"Exceeded 99 variations for stem '{stem}' in {save_dir}")
+    count = max_found + 1
+    _check_capacity(count, width, stem, save_dir)
 
-    final_name = f"{stem}_{count:02d}{ext}"
+    final_name = format_enumerated(stem, count, ext, width)
 
     logger.debug("determine_filename: ids=%s stem=%s assigned=%s", ids, stem, final_name)
     return final_name
 
 
-__all__ = ["determine_filename"]
+class PlannedName(NamedTuple):
+    filename: str
+    exists: bool
+
+
+class ExportFilenamePlanner:
+    """Assigns enumerated filenames for one export batch, before anything is written.
+
+    Enumeration strategy for ``append``:
+      - no trailing digits in the stem -> ``determine_filename`` (next free index on disk);
+      - trailing digits -> treat them as the starting index and enumerate on the base stem.
+    ``overwrite`` / ``skip`` use a predictable order within the batch: the provided base
+    index (if any) for the first occurrence of a stem, incrementing for later ones.
+
+    Names handed out earlier in the batch are tracked in memory, so the planner does
+    not depend on files being written between calls.
+    """
+
+    def __init__(
+        self,
+        save_dir: str,
+        ext: str,
+        on_exists: str,
+        stem_index: StemIndex | None = None,
+        width: int = DEFAULT_INDEX_WIDTH,
+    ):
+        self.save_dir = save_dir
+        self.ext = ext
+        self.on_exists = on_exists
+        self.width = width
+        self.stem_index = stem_index or get_stem_index(save_dir)
+        # Max enumerations handed out per stem in this batch; seeded from the stem index
+        self._cached_max: dict[str, int] = {}
+
+    def plan(self, ids: List[str]) -> PlannedName:
+        ext = self.ext
+        cached_max = self._cached_max
+        width = self.width
+        base_stem, base_idx = resolve_stem(ids, clamp=True, max_index=max_index_for_width(width))
+        raw_stem = sanitize_stem(ids)
+
+        if self.on_exists == "append":
+            if base_idx is None:
+                if raw_stem in cached_max:
+                    next_enum = cached_max[raw_stem] + 1
+                    _check_capacity(next_enum, width, raw_stem, self.save_dir)
+                    final_name = format_enumerated(raw_stem, next_enum, ext, width)
+                else:
+                    # Plan from this planner's index: our own writes since it was created
+                    # are in it already and must not trigger a rescan per image
+                    next_enum = self.stem_index.max_index(raw_stem, ext) + 1
+                    _check_capacity(next_enum, width, raw_stem, self.save_dir)
+                    final_name = format_enumerated(raw_stem, next_enum, ext, width)
+                cached_max[raw_stem] = next_enum
+            else:
+                if base_stem not in cached_max:
+                    cached_max[base_stem] = self.stem_index.max_index(base_stem, ext)
+                max_found = cached_max[base_stem]
+                # If the provided base is ahead, jump to it; else continue the sequence
+                next_enum = max_found + 1 if base_idx <= max_found else base_idx
+                _check_capacity(next_enum, width, base_stem, self.save_dir)
+                final_name = format_enumerated(base_stem, next_enum, ext, width)
+                cached_max[base_stem] = next_enum
+            return PlannedName(final_name, False)
+
+        stem_key = base_stem if base_idx is not None else raw_stem
+        if stem_key not in cached_max:
+            cached_max[stem_key] = (base_idx - 1) if base_idx else 0
+        next_enum = cached_max[stem_key] + 1
+        if base_idx and next_enum < base_idx:
+            next_enum = base_idx
+        _check_capacity(next_enum, width, stem_key, "batch")
+        final_name = format_enumerated(stem_key, next_enum, ext, width)
+        cached_max[stem_key] = next_enum
+        # The index rules out most names without a stat; a hit is confirmed on disk since
+        # it does not tell ``_01`` from ``_001``
+        exists = self.stem_index.contains(final_name) and os.path.exists(os.path.join(self.save_dir, final_name))
+        return PlannedName(final_name, exists)
+
+
+def export_ids(id_list) -> list[str]:
+    """The ids of one combination that take part in its filename.
+
+    Unconnected combinator inputs (``input_*_no_id_*``) are dropped unless
+    nothing else is left.
+    """
+    ids = list(id_list) if isinstance(id_list, (list, tuple)) else [str(id_list)]
+    return [s for s in ids if not (s.startswith("input_") and "_no_id_" in s)] or ids
+
+
+class ExportPlan(NamedTuple):
+    """Filenames the export node assigns to a list of combinations in ``overwrite``/``skip`` mode.
+
+    ``exists`` records which of them were already on disk when the plan was made.
+    The filter node computes a plan before any image is generated and hands the
+    entries of the combinations it keeps to the export node, which then uses the
+    same names instead of planning the (shorter) kept list again.
+    """
+
+    save_dir: str
+    ext: str
+    width: int
+    filenames: list[str]
+    exists: list[bool]
+
+    def matches(self, save_dir: str, ext: str, width: int) -> bool:
+        same_dir = os.path.normcase(os.path.abspath(self.save_dir)) == os.path.normcase(os.path.abspath(save_dir))
+        return same_dir and self.ext == ext and self.width == width
+
+    def select(self, positions: Sequence[int]) -> "ExportPlan":
+        """The plan for a subset of the combinations, in ``positions`` order."""
+        return self._replace(filenames=[self.filenames[i] for i in positions], exists=[self.exists[i] for i in positions])
+
+
+MAX_CACHED_PLANS = 8
+
+# (directory, ext, width, ids) -> (stem index, its generation, plan)
+_plans: "OrderedDict[tuple, tuple[StemIndex, int, ExportPlan]]" = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def plan_export(
+    save_dir: str,
+    ext: str,
+    combination_ids: Sequence,
+    stem_index: StemIndex | None = None,
+    width: int = DEFAULT_INDEX_WIDTH,
+) -> ExportPlan:
+    """Plan ``overwrite``/``skip`` filenames for every combination in one pass.
+
+    Plans are cached until the folder's stem index changes, so rerunning a
+    queue over an unchanged folder does not resolve the combinations again.
+    """
+    stem_index = (stem_index or get_stem_index(save_dir)).refresh()
+    ids = tuple(tuple(export_ids(cid)) for cid in combination_ids)
+    key = (os.path.normcase(os.path.abspath(save_dir)), ext, width, ids)
+    with _plans_lock:
+        cached = _plans.get(key)
+        if cached is not None and cached[0] is stem_index and cached[1] == stem_index.generation:
+            _plans.move_to_end(key)
+            return cached[2]
+    generation = stem_index.generation
+    planner = ExportFilenamePlanner(save_dir, ext, "skip", stem_index, width)
+    planned = [planner.plan(list(i)) for i in ids]
+    plan = ExportPlan(save_dir, ext, width, [p.filename for p in planned], [p.exists for p in planned])
+    with _plans_lock:
+        _plans[key] = (stem_index, generation, plan)
+        while len(_plans) > MAX_CACHED_PLANS:
+            _plans.popitem(last=False)
+    return plan
+
+
+def clear_export_plans() -> None:
+    with _plans_lock:
+        _plans.clear()
+
+
+__all__ = [
+    "determine_filename",
+    "export_ids",
+    "plan_export",
+    "clear_export_plans",
+    "ExportFilenamePlanner",
+    "ExportPlan",
+    "PlannedName",
+]
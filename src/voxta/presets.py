@@ -0,0 +1,124 @@
+"""Encoder effort selection for the export node.
+
+WebP ``method`` and PNG ``compress_level`` trade encode time for file size:
+on a 1024x1024 avatar, WebP method 6 takes roughly 20x as long as method 2
+for a file only about 10% smaller (see ``benchmarks/bench_presets.py``). The fixed presets in
+``ImageExporter.FORMAT_MAP`` pick one point on that curve. ``auto`` effort
+instead picks, per run, the highest effort whose predicted encode time fits
+a seconds-per-image budget.
+
+Predictions start from per-megapixel costs measured on a reference machine
+and are scaled by an observed speed factor per format family, updated after
+every export, so they converge to the actual machine and image content.
+"""
+
+from __future__ import annotations
+
+import threading
+
+EFFORT_OPTIONS = ["preset", "auto"]
+DEFAULT_SECONDS_PER_IMAGE = 0.5
+
+# Effort levels per format family, fastest first: parameter overrides and the
+# reference cost in seconds per megapixel on a single core (bench_presets.py).
+EFFORT_LADDERS: dict[str, list[tuple[dict, float]]] = {
+    "webp": [({"method": 0}, 0.09), ({"method": 2}, 0.24), ({"method": 4}, 0.34), ({"method": 6}, 4.6)],
+    "webp lossless": [({"method": 0, "quality": 0}, 0.035), ({"method": 4, "quality": 50}, 0.48), ({"method": 6, "quality": 100}, 6.0)],
+    "png": [({"compress_level": 1}, 0.23), ({"compress_level": 4}, 0.48), ({"compress_level": 6}, 0.7)],
+}
+
+# Weight of the newest observation in the running speed factor
+_SMOOTHING = 0.3
+
+
+def format_family(fmt_params: dict) -> str | None:
+    fmt = str(fmt_params.get("format", "")).upper()
+    if fmt == "WEBP":
+        return "webp lossless" if fmt_params.get("lossless") else "webp"
+    if fmt == "PNG":
+        return "png"
+    return None
+
+
+def effort_level(fmt_params: dict) -> int | None:
+    """Index of the ladder level matching ``fmt_params``, if any."""
+    family = format_family(fmt_params)
+    if family is None:
+        return None
+    for level, (overrides, _) in enumerate(EFFORT_LADDERS[family]):
+        if all(fmt_params.get(k) == v for k, v in overrides.items()):
+            return level
+    return None
+
+
+class EncodeCostModel:
+    """Predicts encode seconds per image from the reference costs and observed speed."""
+
+    def __init__(self):
+        self._speed: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def predict(self, family: str, level: int, megapixels: float) -> float:
+        with self._lock:
+            factor = self._speed.get(family, 1.0)
+        return EFFORT_LADDERS[family][level][1] * megapixels * factor
+
+    def observe(self, fmt_params: dict, megapixels: float, seconds: list[float]) -> None:
+        """Fold measured encode times for ``fmt_params`` into the family's speed factor."""
+        family = format_family(fmt_params)
+        level = effort_level(fmt_params)
+        if family is None or level is None or megapixels <= 0 or not seconds:
+            return
+        reference = EFFORT_LADDERS[family][level][1] * megapixels
+        observed = sorted(seconds)[len(seconds) // 2] / reference
+        with self._lock:
+            previous = self._speed.get(family)
+            self._speed[family] = observed if previous is None else previous + _SMOOTHING * (observed - previous)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._speed.clear()
+
+
+cost_model = EncodeCostModel()
+
+
+def choose_effort(fmt_params: dict, megapixels: float, batch_size: int, workers: int, seconds_per_image: float) -> dict:
+    """Return ``fmt_params`` with the highest effort that fits the per-image budget.
+
+    Images are encoded ``min(workers, batch_size)`` at a time, so a batch can
+    afford proportionally more CPU time per image than a single image can.
+    Falls back to the fastest level when even that exceeds the budget, and
+    returns ``fmt_params`` unchanged for formats without a ladder.
+    """
+    family = format_family(fmt_params)
+    if family is None:
+        return fmt_params
+    parallel = max(1, min(workers, batch_size))
+    allowed = seconds_per_image * parallel
+    chosen = 0
+    for level in range(len(EFFORT_LADDERS[family])):
+        if cost_model.predict(family, level, megapixels) <= allowed:
+            chosen = level
+    return {**fmt_params, **EFFORT_LADDERS[family][chosen][0]}
+
+
+def image_megapixels(image) -> float:
+    """Megapixels of an IMAGE frame shaped (H,W,C) or (1,H,W,C); 0 if unknown."""
+    shape = getattr(image, "shape", None)
+    if shape is None or len(shape) < 3:
+        return 0.0
+    return shape[-3] * shape[-2] / 1_000_000
+
+
+__all__ = [
+    "EFFORT_OPTIONS",
+    "EFFORT_LADDERS",
+    "DEFAULT_SECONDS_PER_IMAGE",
+    "EncodeCostModel",
+    "cost_model",
+    "choose_effort",
+    "effort_level",
+    "format_family",
+    "image_megapixels",
+]
@@ -0,0 +1,78 @@
+"""Deduplicated storage for the prompts of a combination batch.
+
+Combinator prompts are long and repeat heavily: a single broadcast prompt,
+or the same few hundred prompts across tens of thousands of combinations.
+A ``PromptTable`` stores every distinct prompt once and one 4-byte reference
+per combination, and reads like the plain list of prompts it replaces.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Sequence
+
+
+class PromptTable(Sequence):
+    """Per-combination prompts as references into a list of unique prompts.
+
+    ``refs`` is ``None`` for a broadcast table, where all ``length`` entries
+    are ``unique[0]``.
+    """
+
+    __slots__ = ("unique", "_refs", "_length")
+
+    def __init__(self, unique: list[str], refs: array | None = None, length: int | None = None):
+        if refs is None and len(unique) != 1:
+            raise ValueError("A broadcast prompt table needs exactly one prompt")
+        self.unique = unique
+        self._refs = refs
+        self._length = len(refs) if refs is not None else (length if length is not None else 1)
+
+    @classmethod
+    def from_prompts(cls, prompts: Iterable[str], length: int | None = None) -> "PromptTable":
+        """Intern ``prompts``; a single prompt is broadcast to ``length`` entries."""
+        if isinstance(prompts, PromptTable) and (length is None or len(prompts) == length):
+            return prompts
+        if isinstance(prompts, Sequence) and len(prompts) == 1 and length:
+            return cls([prompts[0]], None, length)
+        ids: dict[str, int] = {}
+        unique: list[str] = []
+        refs = array("I")
+        for prompt in prompts:
+            ref = ids.get(prompt)
+            if ref is None:
+                ref = ids[prompt] = len(unique)
+                unique.append(prompt)
+            refs.append(ref)
+        return cls(unique, refs)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._length))]
+        if self._refs is not None:
+            return self.unique[self._refs[i]]
+        if not -self._length <= i < self._length:
+            raise IndexError("prompt table index out of range")
+        return self.unique[0]
+
+    def __iter__(self):
+        unique = self.unique
+        if self._refs is None:
+            return (unique[0] for _ in range(self._length))
+        return (unique[ref] for ref in self._refs)
+
+    def select(self, positions: Iterable[int]) -> "PromptTable":
+        """The prompts at ``positions``, sharing this table's unique prompts."""
+        if self._refs is None:
+            return PromptTable(self.unique, None, len(positions if isinstance(positions, Sequence) else list(positions)))
+        refs = self._refs
+        return PromptTable(self.unique, array("I", (refs[i] for i in positions)))
+
+    def __repr__(self) -> str:
+        return f"PromptTable({self._length} prompts, {len(self.unique)} unique)"
+
+
+__all__ = ["PromptTable"]
@@ -0,0 +1,158 @@
+"""Web endpoints behind the Output Folder widget's thumbnail preview.
+
+Nothing here runs at import time: ComfyUI calls ``setup_routes`` from the
+package ``__init__`` (and ``nodes.py`` for loaders that only scan that file),
+and it registers the routes once per ``PromptServer``. aiohttp is imported
+only by this module, so importing the nodes themselves stays cheap and works
+headless.
+"""
+
+import asyncio
+import logging
+import os
+
+from aiohttp import hdrs, web
+
+from .fs_async import run_blocking
+from .helpers import FolderHelper
+from .thumbnails import PREVIEW_CONTENT_TYPE, get_preview, parse_preview_edge, thumbnail_content_type, thumbnail_lookup_cache
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnail_lookup_result(path: str) -> dict:
+    """Resolve a character folder path to the JSON payload of the check endpoints."""
+    if not path:
+        return {"found": False}
+
+    # Sanitize and resolve the path
+    safe_path = FolderHelper.sanitize_full_path(path)
+    if not safe_path:
+        return {"found": False}
+
+    # Look for thumbnail (also covers missing / non-directory paths)
+    thumbnail_path = thumbnail_lookup_cache.lookup(safe_path)
+
+    if thumbnail_path:
+        return {"found": True, "thumbnail_path": thumbnail_path}
+    return {"found": False}
+
+
+# Web API endpoints for thumbnail functionality
+async def check_thumbnail_endpoint(request):
+    """API endpoint to check if thumbnail exists."""
+    try:
+        data = await request.json()
+        return web.json_response(await run_blocking(thumbnail_lookup_result, data.get("path", "")))
+
+    except Exception as e:
+        logger.warning("Error in check_thumbnail_endpoint: %s", e)
+        return web.json_response({"found": False})
+
+
+MAX_BATCH_PATHS = 500
+
+
+async def check_thumbnails_endpoint(request):
+    """API endpoint to check many folders at once.
+
+    Body: ``{"paths": [...]}``. Response: ``{"results": [...]}`` with one entry per
+    requested path, in order, each shaped like the ``/voxta/check_thumbnail``
+    response plus the original ``path``.
+    """
+    try:
+        data = await request.json()
+        paths = data.get("paths") if isinstance(data, dict) else None
+        if not isinstance(paths, list):
+            return web.json_response({"error": "Expected a JSON body with a 'paths' list"}, status=400)
+        if len(paths) > MAX_BATCH_PATHS:
+            return web.json_response({"error": f"At most {MAX_BATCH_PATHS} paths per request"}, status=400)
+
+        unique = list(dict.fromkeys(p for p in paths if isinstance(p, str)))
+        # Lookups overlap on the filesystem pool; a slow or failing path only affects its own entry
+        resolved = await asyncio.gather(*(run_blocking(thumbnail_lookup_result, p) for p in unique), return_exceptions=True)
+        by_path = {p: (r if isinstance(r, dict) else {"found": False}) for p, r in zip(unique, resolved)}
+        results = [{"path": p, **(by_path[p] if isinstance(p, str) else {"found": False})} for p in paths]
+        return web.json_response({"results": results})
+
+    except Exception as e:
+        logger.warning("Error in check_thumbnails_endpoint: %s", e)
+        return web.json_response({"results": []}, status=500)
+
+
+# Thumbnails can be replaced in place, so browsers must revalidate; ETag/Last-Modified make that a cheap 304.
+THUMBNAIL_CACHE_HEADERS = {hdrs.CACHE_CONTROL: "no-cache"}
+
+
+def _is_not_modified(request, etag: str, last_modified: float) -> bool:
+    if request.if_none_match is not None:
+        return any(tag.value in (etag, "*") for tag in request.if_none_match)
+    modified_since = request.if_modified_since
+    return modified_since is not None and int(last_modified) <= modified_since.timestamp()
+
+
+async def serve_thumbnail_endpoint(request):
+    """API endpoint to serve thumbnail images.
+
+    ``?size=N`` serves a WebP preview no larger than N px. Responses carry ETag and
+    Last-Modified validators, and conditional requests are answered with 304.
+    """
+    try:
+        thumbnail_path = request.query.get("path", "")
+
+        if not thumbnail_path or not await run_blocking(os.path.isfile, thumbnail_path):
+            return web.Response(status=404, text="Thumbnail not found")
+
+        # Security check - ensure it's actually a thumbnail file
+        content_type = thumbnail_content_type(thumbnail_path)
+        if content_type is None:
+            return web.Response(status=403, text="Access denied")
+
+        edge = parse_preview_edge(request.query.get("size"))
+        preview = None
+        if edge is not None:
+            try:
+                preview = await run_blocking(get_preview, thumbnail_path, edge)
+            except Exception as e:
+                # Undecodable images are still served as-is; the browser may cope.
+                logger.warning("Could not render preview for %s: %s", thumbnail_path, e)
+
+        if preview is None:
+            # Streams via sendfile, does its own stat/open in an executor and
+            # answers If-None-Match / If-Modified-Since itself
+            return web.FileResponse(thumbnail_path, headers={hdrs.CONTENT_TYPE: content_type, **THUMBNAIL_CACHE_HEADERS})
+
+        if _is_not_modified(request, preview.etag, preview.last_modified):
+            response = web.Response(status=304, headers=THUMBNAIL_CACHE_HEADERS)
+        else:
+            response = web.Response(body=preview.data, content_type=PREVIEW_CONTENT_TYPE, headers=THUMBNAIL_CACHE_HEADERS)
+        response.etag = preview.etag
+        response.last_modified = preview.last_modified
+        return response
+
+    except Exception as e:
+        logger.warning("Error in serve_thumbnail_endpoint: %s", e)
+        return web.Response(status=500, text="Server error")
+
+
+ROUTES = (
+    ("POST", "/voxta/check_thumbnail", check_thumbnail_endpoint),
+    ("POST", "/voxta/check_thumbnails", check_thumbnails_endpoint),
+    ("GET", "/voxta/thumbnail", serve_thumbnail_endpoint),
+)
+
+
+def add_routes(routes) -> None:
+    """Register the endpoints on an aiohttp ``RouteTableDef`` (e.g. ``PromptServer.instance.routes``)."""
+    for method, path, handler in ROUTES:
+        routes.route(method, path)(handler)
+
+
+__all__ = [
+    "ROUTES",
+    "add_routes",
+    "thumbnail_lookup_result",
+    "check_thumbnail_endpoint",
+    "check_thumbnails_endpoint",
+    "serve_thumbnail_endpoint",
+]
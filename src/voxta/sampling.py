@@ -0,0 +1,79 @@
+"""Random subsets of large combination sets for the filter node.
+
+Combinators can produce tens of thousands of combinations, of which a run
+should only generate a handful. These helpers draw a sample in a single pass
+over the candidates, holding only the sample itself in memory:
+
+- ``reservoir_sample`` uses Li's Algorithm L, which skips ahead between
+  replacements, so it draws O(k log(n/k)) random numbers rather than one per
+  candidate;
+- ``stratified_sample`` keeps one reservoir per group (e.g. per expression)
+  so every group is represented.
+
+Pass a ``random.Random`` seeded by the caller for reproducible samples.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+from itertools import islice
+from typing import Callable, Hashable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+def _nonzero_random(rng: random.Random) -> float:
+    """A uniform float in (0, 1), safe to take the log of."""
+    value = rng.random()
+    while value == 0.0:
+        value = rng.random()
+    return value
+
+
+def reservoir_sample(items: Iterable[T], k: int, rng: random.Random) -> list[T]:
+    """Uniformly sample ``k`` items (all of them if there are fewer), in stream order."""
+    if k <= 0:
+        return []
+    it = iter(items)
+    # Remember the stream position of each sampled item so the result keeps the input order
+    reservoir = list(enumerate(islice(it, k)))
+    if len(reservoir) < k:
+        return [item for _, item in reservoir]
+    position = k - 1
+    w = math.exp(math.log(_nonzero_random(rng)) / k)
+    while True:
+        skip = math.floor(math.log(_nonzero_random(rng)) / math.log(1.0 - w))
+        item = next(islice(it, skip, None), _END)
+        if item is _END:
+            break
+        position += skip + 1
+        reservoir[rng.randrange(k)] = (position, item)
+        w *= math.exp(math.log(_nonzero_random(rng)) / k)
+    reservoir.sort(key=lambda entry: entry[0])
+    return [item for _, item in reservoir]
+
+
+def stratified_sample(items: Iterable[T], k: int, key: Callable[[T], Hashable], rng: random.Random) -> list[T]:
+    """Sample up to ``k`` items per ``key`` group in one pass, in stream order."""
+    if k <= 0:
+        return []
+    # group -> (items seen, [(stream position, item), ...])
+    groups: dict[Hashable, tuple[int, list[tuple[int, T]]]] = {}
+    for position, item in enumerate(items):
+        group = key(item)
+        seen, reservoir = groups.get(group, (0, []))
+        if seen < k:
+            reservoir.append((position, item))
+        else:
+            slot = rng.randrange(seen + 1)
+            if slot < k:
+                reservoir[slot] = (position, item)
+        groups[group] = (seen + 1, reservoir)
+    picked = sorted(entry for _, reservoir in groups.values() for entry in reservoir)
+    return [item for _, item in picked]
+
+
+__all__ = ["reservoir_sample", "stratified_sample"]
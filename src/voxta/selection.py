@@ -0,0 +1,94 @@
+"""Compact hand-off of filtered combinations from the filter node to the export node.
+
+The filter node's list outputs hold one entry per kept combination, and
+ComfyUI keeps them for the lifetime of the cached result. A
+``CombinationSelection`` instead holds the filter's input lists once plus a
+typed array of the kept positions (4 bytes per combination). The export node
+reads ids and prompts through lazy views, so nothing is copied in between.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Sequence
+
+from .naming import ExportPlan
+from .prompt_table import PromptTable
+
+
+class SelectionView(Sequence):
+    """Read-only view of ``source`` at ``positions`` (``None`` means every position)."""
+
+    __slots__ = ("_source", "_positions")
+
+    def __init__(self, source: Sequence, positions: Sequence[int] | None):
+        self._source = source
+        self._positions = positions
+
+    def __len__(self) -> int:
+        return len(self._source) if self._positions is None else len(self._positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("selection index out of range")
+        if self._positions is not None:
+            i = self._positions[i]
+        return self._source[i]
+
+    def __iter__(self):
+        if self._positions is None:
+            return iter(self._source)
+        source = self._source
+        return (source[i] for i in self._positions)
+
+    def __repr__(self) -> str:
+        return f"SelectionView({len(self)} items)"
+
+
+class CombinationSelection:
+    """Kept combinations as positions into the filter node's ``combination_ids`` and ``prompts``.
+
+    ``prompts`` may hold a single prompt shared by every combination; either way
+    they are kept as a ``PromptTable``. ``plan``
+    is the export plan of the kept combinations, when the filter made one.
+    """
+
+    def __init__(
+        self,
+        combination_ids: Sequence,
+        prompts: Sequence[str],
+        positions: Iterable[int] | None = None,
+        plan: ExportPlan | None = None,
+    ):
+        if len(prompts) != len(combination_ids) and not (len(prompts) == 1 and len(combination_ids) > 1):
+            raise ValueError("Prompt and combination ID lists must have same length or 1 prompt.")
+        self._positions = None if positions is None else array("I", positions)
+        self._combination_ids = combination_ids
+        self._prompts = PromptTable.from_prompts(prompts, len(combination_ids))
+        self.plan = plan
+
+    def __len__(self) -> int:
+        return len(self._combination_ids) if self._positions is None else len(self._positions)
+
+    @property
+    def positions(self) -> Sequence[int]:
+        """Positions of the kept combinations in the filter node's input lists."""
+        return range(len(self._combination_ids)) if self._positions is None else self._positions
+
+    @property
+    def combination_ids(self) -> SelectionView:
+        return SelectionView(self._combination_ids, self._positions)
+
+    @property
+    def prompts(self) -> SelectionView:
+        return SelectionView(self._prompts, self._positions)
+
+    def __repr__(self) -> str:
+        return f"CombinationSelection({len(self)} of {len(self._combination_ids)} combinations)"
+
+
+__all__ = ["CombinationSelection", "SelectionView"]
@@ -0,0 +1,36 @@
+"""Explicit, idempotent registration of the Voxta web routes with ComfyUI."""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+_registered_servers: set[int] = set()
+
+
+def setup_routes(prompt_server=None) -> bool:
+    """Register the thumbnail endpoints with ``PromptServer`` once.
+
+    Safe to call any number of times and from every entry point. Returns
+    ``False`` when there is no server to register with (headless imports,
+    tests, ComfyUI not started yet).
+    """
+    if prompt_server is None:
+        try:
+            import server  # type: ignore
+        except ImportError:
+            return False
+        prompt_server = getattr(server.PromptServer, "instance", None)
+        if prompt_server is None:
+            return False
+    if id(prompt_server) in _registered_servers:
+        return True
+
+    from .routes import add_routes
+
+    add_routes(prompt_server.routes)
+    _registered_servers.add(id(prompt_server))
+    logger.debug("Registered Voxta routes")
+    return True
+
+
+__all__ = ["setup_routes"]
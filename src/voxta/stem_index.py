@@ -0,0 +1,363 @@
+"""In-memory index of enumerated files (``<stem>_<NN><ext>``) per directory.
+
+Naming, export and filtering all need to know which enumerations already
+exist for a stem. Listing a folder with thousands of avatars for every image
+makes a batch O(images x files), so the listing is parsed once into a
+``stem -> ext -> indices`` map and reused until the directory mtime changes.
+Files written by the nodes themselves are added in memory via ``add``, and
+their writes are bracketed by ``own_write`` so they do not force a rescan.
+The highest index per stem and extension is kept alongside the sets, so
+finding the next free enumeration is O(1) however many variants exist.
+
+While a filesystem watcher feeds changes in through ``apply_change`` (see
+``folder_watch``), an index is "live" and ``refresh`` trusts it without even
+a ``stat`` of the directory.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+
+from .dir_scan import PARTIAL_SUFFIX, scan_directory
+from .existence import ExistenceBitmap
+
+logger = logging.getLogger(__name__)
+
+# stem_NN.ext; the lazy stem keeps the index as the last digit run before the extension.
+ENUMERATED_FILE_RE = re.compile(r"^(?P<stem>.+?)_(?P<idx>\d+)(?P<ext>\.[A-Za-z0-9]+)$")
+
+# Directory mtimes this close to the scan time are not trusted: a file created in
+# the same timestamp tick would not change the mtime we recorded.
+_RACY_WINDOW_NS = 2_000_000_000
+
+MAX_CACHED_DIRECTORIES = 64
+MAX_CACHED_TREES = 16
+# Subfolder levels below the root that recursive lookups descend into
+MAX_TREE_DEPTH = 8
+
+
+def parse_enumerated_filename(filename: str) -> tuple[str, int, str] | None:
+    """Return ``(stem, index, ext)`` for ``stem_NN.ext`` names, else ``None``."""
+    m = ENUMERATED_FILE_RE.match(filename)
+    if not m:
+        return None
+    return m.group("stem"), int(m.group("idx")), m.group("ext")
+
+
+class StemIndex:
+    """Enumerated filenames of a single directory, grouped by stem and extension."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._entries: dict[str, dict[str, set[int]]] = {}
+        self._max: dict[str, dict[str, int]] = {}
+        self._partials: list[str] = []
+        self._subdirs: list[str] = []
+        self._mtime_ns: int | None = None
+        self._racy = True
+        self._scanned = False
+        self._live = False
+        # Bumped on every change to the entries, so derived results (export plans) can be cached
+        self.generation = 0
+        self._bitmap: tuple[int, ExistenceBitmap] | None = None
+        self._lock = threading.RLock()
+
+    def _stat_mtime(self) -> int | None:
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def refresh(self, force: bool = False) -> "StemIndex":
+        """Rebuild the index if the directory changed since the last scan."""
+        with self._lock:
+            if not force and self._live and self._scanned:
+                return self
+            mtime = self._stat_mtime()
+            if not force and not self._racy and mtime == self._mtime_ns:
+                return self
+            self._rebuild(mtime)
+        return self
+
+    @property
+    def live(self) -> bool:
+        return self._live
+
+    @property
+    def exists(self) -> bool:
+        """Whether the directory existed at the last scan or mtime check."""
+        return self._mtime_ns is not None
+
+    def set_live(self, live: bool) -> None:
+        """Switch watcher-fed mode on (after a full rescan) or off (back to mtime checks)."""
+        with self._lock:
+            if live and not self._live:
+                # The watch is already running, so nothing between this scan and later events is lost
+                self._rebuild(self._stat_mtime())
+            self._live = live
+
+    def _rebuild(self, mtime: int | None) -> None:
+        self._entries = {}
+        self._max = {}
+        self.generation += 1
+        listing = scan_directory(self.directory) if mtime is not None else None
+        if listing:
+            for name in listing.files:
+                parsed = parse_enumerated_filename(name)
+                if parsed:
+                    self._record(*parsed)
+            self._partials, self._subdirs = listing.partials, listing.subdirs
+        else:
+            self._partials, self._subdirs = [], []
+        self._mark_scanned(mtime)
+        self._scanned = True
+        logger.debug("StemIndex rebuilt for %s: %d stems", self.directory, len(self._entries))
+
+    def _record(self, stem: str, idx: int, ext: str) -> None:
+        self.generation += 1
+        self._entries.setdefault(stem, {}).setdefault(ext, set()).add(idx)
+        maxima = self._max.setdefault(stem, {})
+        if idx > maxima.get(ext, 0):
+            maxima[ext] = idx
+
+    def _mark_scanned(self, mtime: int | None) -> None:
+        self._mtime_ns = mtime
+        self._racy = mtime is None or time.time_ns() - mtime < _RACY_WINDOW_NS
+
+    def _forget(self, stem: str, idx: int, ext: str) -> None:
+        by_ext = self._entries.get(stem)
+        found = by_ext.get(ext) if by_ext else None
+        if not found or idx not in found:
+            return
+        found.discard(idx)
+        self.generation += 1
+        if not found:
+            del by_ext[ext]
+            del self._max[stem][ext]
+            if not by_ext:
+                del self._entries[stem]
+                del self._max[stem]
+        elif self._max[stem][ext] == idx:
+            # Only deleting the highest variant costs a pass over the remaining ones
+            self._max[stem][ext] = max(found)
+
+    def add(self, filename: str) -> None:
+        """Record a file the caller has just written to the directory."""
+        parsed = parse_enumerated_filename(filename)
+        if parsed:
+            with self._lock:
+                self._record(*parsed)
+
+    @contextmanager
+    def own_write(self) -> Iterator[None]:
+        """Bracket one change of our own to the directory (image, ``.part`` or journal file).
+
+        The directory mtime after the change is adopted only if the mtime right
+        before it still matched the last scan; otherwise someone else changed
+        the folder in between and the index stays stale, so the next
+        ``refresh`` rescans. The racy state is kept as it was. Changes are
+        serialized on the index lock, so concurrent writers cannot hide each
+        other's brackets.
+        """
+        with self._lock:
+            before = None if self._live else self._stat_mtime()
+            yield
+            if before is not None and before == self._mtime_ns:
+                self._mtime_ns = self._stat_mtime()
+
+    def apply_change(self, name: str, present: bool, is_dir: bool = False) -> None:
+        """Apply one created (``present``) or deleted entry reported by a watcher."""
+        with self._lock:
+            if is_dir:
+                if name.startswith("."):
+                    return
+                if present and name not in self._subdirs:
+                    self._subdirs.append(name)
+                elif not present and name in self._subdirs:
+                    self._subdirs.remove(name)
+                return
+            if name.startswith("."):
+                if name.endswith(PARTIAL_SUFFIX):
+                    if present and name not in self._partials:
+                        self._partials.append(name)
+                    elif not present and name in self._partials:
+                        self._partials.remove(name)
+                return
+            parsed = parse_enumerated_filename(name)
+            if parsed:
+                if present:
+                    self._record(*parsed)
+                else:
+                    self._forget(*parsed)
+
+    def partial_files(self) -> list[str]:
+        """Temporary ``.part`` files seen in the last scan, e.g. left behind by a crash."""
+        with self._lock:
+            self.refresh()
+            return list(self._partials)
+
+    def subdirectories(self) -> list[str]:
+        """Names of the (non-hidden) subfolders seen in the last scan."""
+        with self._lock:
+            return list(self._subdirs)
+
+    def indices(self, stem: str, ext: str | None = None) -> set[int]:
+        """Indices present for ``stem``; across all extensions when ``ext`` is None."""
+        with self._lock:
+            by_ext = self._entries.get(stem)
+            if not by_ext:
+                return set()
+            if ext is not None:
+                return set(by_ext.get(ext, ()))
+            return set().union(*by_ext.values())
+
+    def max_index(self, stem: str, ext: str | None = None) -> int:
+        """Highest existing index for ``stem`` (0 if none)."""
+        with self._lock:
+            maxima = self._max.get(stem)
+            if not maxima:
+                return 0
+            if ext is not None:
+                return maxima.get(ext, 0)
+            return max(maxima.values())
+
+    def has_stem(self, stem: str) -> bool:
+        with self._lock:
+            return any(self._entries.get(stem, {}).values())
+
+    def contains(self, filename: str) -> bool:
+        """Whether the enumerated file ``filename`` exists, without touching the disk."""
+        parsed = parse_enumerated_filename(filename)
+        if not parsed:
+            return False
+        stem, idx, ext = parsed
+        with self._lock:
+            return idx in self._entries.get(stem, {}).get(ext, ())
+
+    def has_index(self, stem: str, idx: int) -> bool:
+        with self._lock:
+            return any(idx in s for s in self._entries.get(stem, {}).values())
+
+    def stem_indices(self) -> list[tuple[str, set[int]]]:
+        """``(stem, indices across all extensions)`` for every stem."""
+        with self._lock:
+            return [(stem, set().union(*by_ext.values())) for stem, by_ext in self._entries.items()]
+
+    def existence_bitmap(self) -> ExistenceBitmap:
+        """Bitmap form of ``has_stem``/``has_index``, rebuilt only after the index changed."""
+        with self._lock:
+            if self._bitmap is None or self._bitmap[0] != self.generation:
+                self._bitmap = (self.generation, ExistenceBitmap(self.stem_indices()))
+            return self._bitmap[1]
+
+
+class StemTreeIndex:
+    """Stem lookups across a folder and its subfolders, e.g. ``Avatars/<Pack>`` trees.
+
+    Each folder keeps its own ``StemIndex``; a refresh costs one ``stat`` per
+    folder and rescans only folders whose mtime changed. New or removed
+    subfolders change their parent's mtime, so the walk picks them up.
+    """
+
+    def __init__(self, root: str, max_depth: int = MAX_TREE_DEPTH):
+        self.root = root
+        self.max_depth = max_depth
+        self._nodes: dict[str, StemIndex] = {}
+        self._bitmap: tuple[tuple, ExistenceBitmap] | None = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> "StemTreeIndex":
+        with self._lock:
+            nodes: dict[str, StemIndex] = {}
+            pending = [(self.root, 0)]
+            while pending:
+                directory, depth = pending.pop()
+                index = self._nodes.get(directory)
+                index = index.refresh() if index is not None else get_stem_index(directory)
+                nodes[directory] = index
+                if depth < self.max_depth:
+                    pending.extend((os.path.join(directory, name), depth + 1) for name in index.subdirectories())
+            self._nodes = nodes
+        return self
+
+    def directories(self) -> list[str]:
+        with self._lock:
+            return list(self._nodes)
+
+    def has_stem(self, stem: str) -> bool:
+        with self._lock:
+            return any(index.has_stem(stem) for index in self._nodes.values())
+
+    def has_index(self, stem: str, idx: int) -> bool:
+        with self._lock:
+            return any(index.has_index(stem, idx) for index in self._nodes.values())
+
+    def existence_bitmap(self) -> ExistenceBitmap:
+        """One bitmap over every folder of the tree, rebuilt when any of them changed."""
+        with self._lock:
+            key = tuple((directory, id(index), index.generation) for directory, index in self._nodes.items())
+            if self._bitmap is None or self._bitmap[0] != key:
+                entries = (entry for index in self._nodes.values() for entry in index.stem_indices())
+                self._bitmap = (key, ExistenceBitmap(entries))
+            return self._bitmap[1]
+
+
+_indexes: "OrderedDict[str, StemIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+_trees: "OrderedDict[str, StemTreeIndex]" = OrderedDict()
+
+
+def get_stem_index(directory: str) -> StemIndex:
+    """Return the shared, up-to-date index for ``directory``."""
+    key = os.path.normcase(os.path.abspath(directory))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = StemIndex(directory)
+            _indexes[key] = index
+            while len(_indexes) > MAX_CACHED_DIRECTORIES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+    return index.refresh()
+
+
+def get_stem_tree(directory: str) -> StemTreeIndex:
+    """Return the shared, up-to-date index of ``directory`` and its subfolders."""
+    key = os.path.normcase(os.path.abspath(directory))
+    with _indexes_lock:
+        tree = _trees.get(key)
+        if tree is None:
+            tree = StemTreeIndex(directory)
+            _trees[key] = tree
+            while len(_trees) > MAX_CACHED_TREES:
+                _trees.popitem(last=False)
+        else:
+            _trees.move_to_end(key)
+    return tree.refresh()
+
+
+def clear_stem_indexes() -> None:
+    """Drop every cached index (used by tests and benchmarks for cold runs)."""
+    with _indexes_lock:
+        _indexes.clear()
+        _trees.clear()
+
+
+__all__ = [
+    "StemIndex",
+    "StemTreeIndex",
+    "get_stem_index",
+    "get_stem_tree",
+    "clear_stem_indexes",
+    "parse_enumerated_filename",
+    "ENUMERATED_FILE_RE",
+    "PARTIAL_SUFFIX",
+]
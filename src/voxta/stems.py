@@ -0,0 +1,129 @@
+"""Stem resolution shared by the export and filter nodes.
+
+Both nodes turn every combination's id list into a sanitized filename stem
+and split off a trailing enumeration (``Talking2`` -> ``("Talking", 2)``) on
+every queue run. Combination ids come from a small, repeating space, so the
+patterns are compiled once and the results are memoized per id tuple.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Iterable
+
+# Runs of characters outside [A-Za-z0-9.] (underscores and spaces included) become one underscore.
+_UNSAFE_RUN_RE = re.compile(r"[^A-Za-z0-9.]+")
+_DIGITS = "0123456789"
+
+MIN_INDEX = 1
+MAX_INDEX = 99  # capacity of the default two-digit width
+
+# Enumerations are zero-padded to a fixed width so names keep sorting lexically.
+DEFAULT_INDEX_WIDTH = 2
+MIN_INDEX_WIDTH = 2
+MAX_INDEX_WIDTH = 6
+
+CACHE_SIZE = 16384
+
+
+# The public functions are memoized; they share these uncached helpers so a miss
+# costs one cache insertion rather than one per layer.
+def _sanitize(ids: tuple[str, ...]) -> str:
+    raw = "_".join(i for i in ids if "_no_id_" not in i)
+    return _UNSAFE_RUN_RE.sub("_", raw).strip("_.") or "image"
+
+
+def _split(stem: str) -> tuple[str, int | None]:
+    head = stem.rstrip(_DIGITS)
+    if len(head) == len(stem):
+        return stem, None
+    base = head.rstrip("._")
+    if not base:
+        return stem, None
+    return base, int(stem[len(head) :])
+
+
+_sanitize_cached = lru_cache(maxsize=CACHE_SIZE)(_sanitize)
+
+
+def sanitize_stem(ids: Iterable[str]) -> str:
+    """Join ids (minus ``_no_id_`` placeholders) into a filesystem-safe stem."""
+    return _sanitize_cached(ids if isinstance(ids, tuple) else tuple(ids))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def split_trailing_number(stem: str) -> tuple[str, int | None]:
+    """Split ``Talking2`` style stems into ``("Talking", 2)``.
+
+    Returns ``(stem, None)`` when there is no trailing number or nothing would
+    be left of the stem. The index is returned as written, without range checks.
+    """
+    return _split(stem)
+
+
+def index_width(value) -> int:
+    """Normalize an ``index_width`` node input into the supported range."""
+    if isinstance(value, list):
+        value = value[0] if value else DEFAULT_INDEX_WIDTH
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_INDEX_WIDTH
+    return max(MIN_INDEX_WIDTH, min(MAX_INDEX_WIDTH, width))
+
+
+def max_index_for_width(width: int) -> int:
+    """Highest enumeration that fits ``width`` digits (99 for the default width)."""
+    return 10**width - 1
+
+
+def format_enumerated(stem: str, idx: int, ext: str, width: int = DEFAULT_INDEX_WIDTH) -> str:
+    return f"{stem}_{idx:0{width}d}{ext}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _resolve(ids: tuple[str, ...], clamp: bool, max_index: int) -> tuple[str, int | None]:
+    stem = _sanitize(ids)
+    base, idx = _split(stem)
+    if idx is None:
+        return stem, None
+    if clamp:
+        return base, min(max_index, max(MIN_INDEX, idx))
+    if idx < MIN_INDEX or idx > max_index:
+        return stem, None
+    return base, idx
+
+
+def resolve_stem(ids: Iterable[str], clamp: bool = False, max_index: int = MAX_INDEX) -> tuple[str, int | None]:
+    """Resolve an id list to ``(base_stem, index)``.
+
+    ``index`` is ``None`` when the stem has no trailing number, in which case
+    ``base_stem`` is the whole sanitized stem. Indices outside 1..``max_index``
+    are clamped into range with ``clamp=True`` (export naming) and otherwise
+    treated as part of the stem (existence filtering).
+    """
+    return _resolve(ids if isinstance(ids, tuple) else tuple(ids), clamp, max_index)
+
+
+def clear_stem_caches() -> None:
+    """Drop memoized results (used by benchmarks for cold runs)."""
+    _sanitize_cached.cache_clear()
+    split_trailing_number.cache_clear()
+    _resolve.cache_clear()
+
+
+__all__ = [
+    "sanitize_stem",
+    "split_trailing_number",
+    "resolve_stem",
+    "clear_stem_caches",
+    "index_width",
+    "max_index_for_width",
+    "format_enumerated",
+    "MIN_INDEX",
+    "MAX_INDEX",
+    "DEFAULT_INDEX_WIDTH",
+    "MIN_INDEX_WIDTH",
+    "MAX_INDEX_WIDTH",
+]
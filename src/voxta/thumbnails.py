@@ -0,0 +1,184 @@
+"""Character thumbnail helpers shared by the Output Folder node and its web endpoints.
+
+Lookups are cached per character folder and validated with a single stat of the
+folder, which matters on network-mounted Voxta data directories. The Output
+Folder widget draws the thumbnail at 150px, so the endpoint can also serve a
+downscaled WebP preview instead of the full portrait. Previews are rendered
+once per (file version, edge length) and kept in a small in-memory LRU.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+THUMBNAIL_NAMES = ("thumbnail.png", "thumbnail.webp", "thumbnail.jpg", "thumbnail.jpeg")
+THUMBNAIL_CONTENT_TYPES = {
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+
+# Accepted preview edge lengths; requests outside this range are clamped.
+MIN_PREVIEW_EDGE = 16
+MAX_PREVIEW_EDGE = 1024
+PREVIEW_CONTENT_TYPE = "image/webp"
+MAX_CACHED_PREVIEWS = 64
+
+
+def scan_for_thumbnail(base_path: str) -> str | None:
+    """Return the first existing thumbnail file in ``base_path`` (uncached)."""
+    for name in THUMBNAIL_NAMES:
+        full_path = os.path.join(base_path, name)
+        if os.path.isfile(full_path):
+            return full_path
+    return None
+
+
+@dataclass(frozen=True)
+class _LookupEntry:
+    result: str | None
+    mtime_ns: int
+    stored_at: float
+
+
+class ThumbnailLookupCache:
+    """Bounded LRU of thumbnail lookups keyed by resolved folder path.
+
+    An entry is reused while the folder mtime is unchanged (adding, removing or
+    renaming a thumbnail changes it) and it is younger than ``ttl`` seconds; the
+    TTL covers filesystems with coarse or unreliable directory mtimes. A hit costs
+    one ``os.stat`` instead of an ``isdir`` plus up to four ``isfile`` calls.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _LookupEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, base_path: str) -> str | None:
+        key = os.path.normcase(os.path.abspath(base_path))
+        try:
+            st = os.stat(key)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISDIR(st.st_mode):
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.mtime_ns == st.st_mtime_ns and now - entry.stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                return entry.result
+
+        result = scan_for_thumbnail(base_path)
+        with self._lock:
+            self._entries[key] = _LookupEntry(result, st.st_mtime_ns, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+thumbnail_lookup_cache = ThumbnailLookupCache()
+
+
+def thumbnail_content_type(path: str) -> str | None:
+    """Content type for an allowed ``thumbnail.<ext>`` file, ``None`` for anything else."""
+    filename = os.path.basename(path).lower()
+    if not filename.startswith("thumbnail."):
+        return None
+    return THUMBNAIL_CONTENT_TYPES.get(os.path.splitext(filename)[1])
+
+
+def parse_preview_edge(value: str | None) -> int | None:
+    """Parse the ``size`` query parameter; ``None`` means serve the original file."""
+    if not value:
+        return None
+    try:
+        edge = int(value)
+    except ValueError:
+        return None
+    if edge <= 0:
+        return None
+    return max(MIN_PREVIEW_EDGE, min(MAX_PREVIEW_EDGE, edge))
+
+
+@dataclass(frozen=True)
+class Preview:
+    data: bytes
+    etag: str
+    last_modified: float
+
+
+_previews: "OrderedDict[tuple[str, int, int, int], Preview | None]" = OrderedDict()
+_previews_lock = threading.Lock()
+
+
+def get_preview(path: str, edge: int) -> Preview | None:
+    """Return a WebP preview no larger than ``edge`` px, or ``None`` if the original is already small enough."""
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size, edge)
+    with _previews_lock:
+        if key in _previews:
+            _previews.move_to_end(key)
+            return _previews[key]
+
+    preview = _render_preview(path, edge, st)
+
+    with _previews_lock:
+        _previews[key] = preview
+        while len(_previews) > MAX_CACHED_PREVIEWS:
+            _previews.popitem(last=False)
+    return preview
+
+
+def _render_preview(path: str, edge: int, st: os.stat_result) -> Preview | None:
+    try:
+        from PIL import Image  # deferred: only the preview endpoint needs Pillow
+    except ImportError:  # pragma: no cover
+        return None
+    with Image.open(path) as img:
+        if max(img.size) <= edge:
+            return None
+        img.draft("RGB", (edge, edge))  # JPEG only: decode at reduced scale
+        img.thumbnail((edge, edge))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="WEBP", quality=85, method=4)
+    etag = f"{st.st_mtime_ns:x}-{st.st_size:x}-{edge}"
+    return Preview(buf.getvalue(), etag, st.st_mtime)
+
+
+def clear_preview_cache() -> None:
+    with _previews_lock:
+        _previews.clear()
+
+
+__all__ = [
+    "THUMBNAIL_NAMES",
+    "ThumbnailLookupCache",
+    "thumbnail_lookup_cache",
+    "scan_for_thumbnail",
+    "PREVIEW_CONTENT_TYPE",
+    "Preview",
+    "thumbnail_content_type",
+    "parse_preview_edge",
+    "get_preview",
+    "clear_preview_cache",
+]
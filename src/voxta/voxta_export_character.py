@@ -1,7 +1,14 @@
+import logging
 import os
-import re
-from .naming import determine_filename
-from .helpers import IdFilenameBuilder, ImageExporter, FolderHelper, ComfyHelper
+from .naming import ExportFilenamePlanner, PlannedName, export_ids
+from .selection import CombinationSelection
+from .helpers import ImageExporter, FolderHelper, ComfyHelper, RunLogger, VERBOSITY_OPTIONS
+from .encoding import EncodeJob, EncodeResult, encode_job, iter_encode, release_buffers, resolve_worker_count
+from .export_manifest import ExportManifest, compact_manifest, find_resumable_run
+from .stem_index import get_stem_index
+from .dedup import DEDUP_OPTIONS, get_dedup_index, link_duplicate, pixel_digest
+from .presets import DEFAULT_SECONDS_PER_IMAGE, EFFORT_OPTIONS, choose_effort, cost_model, image_megapixels
+from .stems import DEFAULT_INDEX_WIDTH, MAX_INDEX_WIDTH, MIN_INDEX_WIDTH, index_width as normalize_index_width
 
 try:  # pragma: no cover
     import folder_paths  # type: ignore
@@ -13,6 +20,9 @@ except Exception:  # pragma: no cover
             return os.path.join(os.getcwd(), "output")
 
 
+logger = logging.getLogger(__name__)
+
+
 class VoxtaExportCharacter:
     @classmethod
     def INPUT_TYPES(cls):
@@ -26,18 +36,89 @@ class VoxtaExportCharacter:
                         ".webp lossy 90",
                         ".webp lossless",
                         ".png lossless",
+                        ".webp lossy 80 fast",
+                        ".webp lossy 90 fast",
+                        ".webp lossless fast",
+                        ".png fast",
                     ],
                     {"default": ".webp lossy 90"},
                 ),
                 "images": ("IMAGE",),
-                "prompts": ("STRING", {"default": "", "multiline": True, "forceInput": True}),
-                "combination_ids": ("PROMPTCOMBINATORIDS",),
             },
             "optional": {
+                "prompts": ("STRING", {"default": "", "multiline": True, "forceInput": True}),
+                "combination_ids": ("PROMPTCOMBINATORIDS",),
+                "selection": (
+                    "VOXTA_COMBINATION_SELECTION",
+                    {
+                        "tooltip": "Selection output of Filter Existing Combinations; replaces combination_ids and prompts"
+                        " (and supplies export_plan with on_exists skip/overwrite) without copying them.",
+                    },
+                ),
                 "on_exists": (
                     ["append", "overwrite", "skip"],
                     {"default": "append"},
                 ),
+                "index_width": (
+                    "INT",
+                    {
+                        "default": DEFAULT_INDEX_WIDTH,
+                        "min": MIN_INDEX_WIDTH,
+                        "max": MAX_INDEX_WIDTH,
+                        "tooltip": "Digits in the zero-padded enumeration (2 = up to 99 variants, 3 = 999, ...). Keep it"
+                        " constant per folder so filenames sort in order.",
+                    },
+                ),
+                "encode_workers": ("INT", {"default": 0, "min": 0, "max": 64, "tooltip": "Parallel encoders, 0 = automatic"}),
+                "encoder_effort": (
+                    EFFORT_OPTIONS,
+                    {
+                        "default": "preset",
+                        "tooltip": "preset: use the output format's encoder settings. auto: pick the slowest (smallest"
+                        " output) encoder effort that fits seconds_per_image, given the batch size and encode workers.",
+                    },
+                ),
+                "seconds_per_image": (
+                    "FLOAT",
+                    {
+                        "default": DEFAULT_SECONDS_PER_IMAGE,
+                        "min": 0.01,
+                        "max": 60.0,
+                        "step": 0.05,
+                        "tooltip": "Wall-clock encode budget per image for auto encoder effort",
+                    },
+                ),
+                "verbosity": (VERBOSITY_OPTIONS, {"default": "summary"}),
+                "export_mode": (
+                    ["batch", "incremental"],
+                    {
+                        "default": "batch",
+                        "tooltip": "batch: encode in parallel after planning. incremental: write each image as soon as it is converted.",
+                    },
+                ),
+                "dedup": (
+                    DEDUP_OPTIONS,
+                    {
+                        "default": "off",
+                        "tooltip": "Skip images whose pixels match an image already exported to this folder, or hardlink"
+                        " the new name to the existing file instead of encoding it again.",
+                    },
+                ),
+                "export_plan": (
+                    "VOXTA_EXPORT_PLAN",
+                    {
+                        "tooltip": "Filenames planned by Filter Existing Combinations (export_format set). Used in"
+                        " overwrite/skip mode so both nodes agree on every name.",
+                    },
+                ),
+                "resume": (
+                    "BOOLEAN",
+                    {
+                        "default": False,
+                        "tooltip": "Keep a journal of this export, and continue an interrupted export of the same"
+                        " combinations: images the journal records as saved are kept instead of re-encoded.",
+                    },
+                ),
             },
         }
 
@@ -57,14 +138,25 @@ class VoxtaExportCharacter:
         self,
         output_format: list[str] | str,
         images: list[object],
-        prompts: list[str],
-        combination_ids: list[list[str]],
-        output_path: list[str] | str,
-        subfolder: list[str] | str,
-        on_exists: list[str] | str,
+        prompts: list[str] | None = None,
+        combination_ids: list[list[str]] | None = None,
+        output_path: list[str] | str = "",
+        subfolder: list[str] | str = "Avatars/Default",
+        on_exists: list[str] | str = "append",
+        encode_workers: list[int] | int = 0,
+        verbosity: list[str] | str = "summary",
+        export_mode: list[str] | str = "batch",
+        resume: list[bool] | bool = False,
+        dedup: list[str] | str = "off",
+        index_width: list[int] | int = DEFAULT_INDEX_WIDTH,
+        encoder_effort: list[str] | str = "preset",
+        seconds_per_image: list[float] | float = DEFAULT_SECONDS_PER_IMAGE,
+        export_plan: list[object] | object = None,
+        selection: list[CombinationSelection] | CombinationSelection | None = None,
     ):
+        log = RunLogger(logger, verbosity)
         save_dir = FolderHelper.get_output_directory(output_path, subfolder)
-        print("[Voxta] Filtering existing combinations in:", save_dir)
+        log.item("Exporting character images to %s", save_dir)
 
         output_format = ComfyHelper.comfy_input_to_str(output_format)
         on_exists = ComfyHelper.comfy_input_to_str(on_exists)
@@ -76,117 +168,246 @@ class VoxtaExportCharacter:
         fmt = ImageExporter.determine_format(output_format)
         ext = fmt["ext"]
 
+        selection = selection[0] if isinstance(selection, list) and selection else selection
+        # prompts and the selection's prompts are never read: files are named from combination ids only
+        if selection is not None:
+            # Lazy view over the filter node's inputs
+            combination_ids = selection.combination_ids
+            # Appending always takes new indices, so the filter's plan only applies to skip/overwrite
+            if (not export_plan or export_plan == [None]) and on_exists != "append":
+                export_plan = selection.plan
+        elif combination_ids is None:
+            raise ValueError("Connect either combination_ids or selection")
+
         if len(images) != len(combination_ids):
             # Log all inputs for easier debugging
-            print(f"[VOXTA] Error: images count {len(images)} != combination_ids count {len(combination_ids)}")
+            log.error("images count %d != combination_ids count %d", len(images), len(combination_ids))
             for i, img in enumerate(images):
-                print(f"  Image[{i}]: type={type(img)}")
+                log.error("  Image[%d]: type=%s", i, type(img))
             for i, cid in enumerate(combination_ids):
-                print(f"  CombinationIDs[{i}]: {cid}")
+                log.error("  CombinationIDs[%d]: %s", i, cid)
             raise ValueError("images and combination_ids length mismatch")
 
-        # Broadcast single prompt
-        if len(prompts) == 1 and len(images) > 1:
-            prompts = prompts * len(images)
+        workers = encode_workers[0] if isinstance(encode_workers, list) and encode_workers else encode_workers
+        workers = int(workers or 0)
+        incremental = ComfyHelper.comfy_input_to_str(export_mode, "batch") == "incremental"
+        resume_enabled = bool(resume[0] if isinstance(resume, list) and resume else resume)
+        width = normalize_index_width(index_width)
+        dedup = ComfyHelper.comfy_input_to_str(dedup, "off")
+        if dedup not in DEDUP_OPTIONS:
+            raise ValueError(f"Invalid dedup option: {dedup}")
+        encoder_effort = ComfyHelper.comfy_input_to_str(encoder_effort, "preset")
+        if encoder_effort not in EFFORT_OPTIONS:
+            raise ValueError(f"Invalid encoder_effort option: {encoder_effort}")
 
-        filenames = []
+        fmt_params = fmt["params"]
+        megapixels = image_megapixels(images[0]) if images else 0.0
+        if encoder_effort == "auto" and megapixels:
+            budget = seconds_per_image[0] if isinstance(seconds_per_image, list) and seconds_per_image else seconds_per_image
+            parallel = 1 if incremental else resolve_worker_count(workers, len(images))
+            fmt_params = choose_effort(fmt_params, megapixels, len(images), parallel, float(budget))
+            log.item("Auto encoder effort for %s: %s", output_format, fmt_params)
+
+        jobs: list[tuple[EncodeJob, int, list[str], str | None]] = []
         skipped_count = 0
+        resumed_count = 0
+        dedup_count = 0
+        saved: dict[int, str] = {}  # position in combination_ids -> filename
+        errors: list[str] = []
+        attempted = 0
+
+        stem_index = get_stem_index(save_dir)
+        if not stem_index.exists:
+            # Deleted since FolderHelper created it in this process
+            FolderHelper.forget_directory(save_dir)
+            FolderHelper.ensure_directory(save_dir)
+            stem_index.refresh(force=True)
+        stale_partials = stem_index.partial_files()
+        if stale_partials:
+            with stem_index.own_write():
+                ImageExporter.remove_stale_partials(save_dir, stale_partials)
+        planner = ExportFilenamePlanner(save_dir, ext, on_exists, stem_index, width)
+        plan = export_plan[0] if isinstance(export_plan, list) and export_plan else export_plan
+        if plan is not None:
+            if on_exists == "append":
+                reason = "on_exists=append always takes new indices"
+            elif not plan.matches(save_dir, ext, width):
+                reason = "it was made for another folder, format or index width"
+            elif len(plan.filenames) != len(combination_ids):
+                reason = f"it has {len(plan.filenames)} filenames for {len(combination_ids)} combinations"
+            else:
+                reason = None
+            if reason:
+                log.warning("Ignoring export_plan: %s", reason)
+                plan = None
+        # The journal is only kept while resume or dedup can use it
+        journaling = resume_enabled or dedup != "off"
+        if journaling:
+            with stem_index.own_write():
+                compact_manifest(save_dir)
+        dedup_index = get_dedup_index(save_dir) if dedup != "off" else None
+        # Digests of images queued for encoding in this run, and duplicates waiting on them
+        pending: dict[str, str] = {}
+        deferred: list[tuple[int, list[str], str, str, str]] = []
+
+        # The journal records every completed file; an interrupted run of the same job can be resumed.
+        completed: dict[int, str] = {}
+        run_id = None
+        if resume_enabled:
+            job_key = ExportManifest.job_key(ext, on_exists, combination_ids, width)
+            run_id, completed = find_resumable_run(save_dir, job_key)
+        manifest = ExportManifest(save_dir, run_id, enabled=journaling)
+        if run_id:
+            log.summary("Resuming export run %s: %d images already saved", run_id, len(completed))
+        elif journaling:
+            # Creating the journal bumps the folder mtime; that must not cost the next run a rescan
+            with stem_index.own_write():
+                manifest.start(
+                    job=job_key if resume_enabled else None, total=len(combination_ids), output_format=output_format, on_exists=on_exists
+                )
+        # Only overwrite mode may replace a file; in the other modes a file that appeared since the
+        # index was read is an error rather than something to overwrite
+        replace = on_exists == "overwrite"
 
-        def split_trailing_number(stem: str):
-            m = re.match(r"^(.*?)(\d+)$", stem)
-            if not m:
-                return stem, None
-            base, num = m.group(1), m.group(2)
-            base = base.rstrip("._")
-            if not base:
-                return stem, None
-            try:
-                val = int(num)
-            except ValueError:
-                return stem, None
-            if val < 1:
-                val = 1
-            if val > 99:
-                val = 99
-            return base, val
-
-        # Cache max enumerations per base stem to avoid rescanning directory each time in append mode
-        cached_max: dict[str, int] = {}
+        encode_seconds: list[float] = []
+
+        def record_result(result, pos: int, ids: list[str], digest: str | None = None):
+            name = os.path.basename(result.final_path)
+            if result.ok:
+                saved[pos] = name
+                if result.seconds:
+                    encode_seconds.append(result.seconds)
+                stem_index.add(name)
+                log.item("Saved character image: %s", result.final_path)
+                if digest:
+                    dedup_index.add(digest, name)
+                    manifest.saved(name, ids, pos, hash=digest)
+                else:
+                    manifest.saved(name, ids, pos)
+            else:
+                errors.append(f"{name}: {result.error}")
+                log.error("Failed to save %s: %s", result.final_path, result.error)
+                manifest.failed(name, ids, pos, str(result.error))
+
+        def link_result(pos: int, ids: list[str], filename: str, digest: str, duplicate: str):
+            final_path = os.path.join(save_dir, filename)
+            source = dedup_index.lookup(digest)
+            error = None
+            if source is None:
+                error = RuntimeError(f"duplicate of {duplicate}, which was not saved")
+            elif source != filename:
+                try:
+                    link_duplicate(os.path.join(save_dir, source), final_path, replace, stem_index.own_write)
+                except OSError as e:
+                    error = e
+            record_result(EncodeResult(final_path, error), pos, ids, digest)
 
         for idx, id_list in enumerate(combination_ids):
-            ids = list(id_list) if isinstance(id_list, (list, tuple)) else [str(id_list)]
-            filtered_ids = [s for s in ids if not (s.startswith("input_") and "_no_id_" in s)] or ids
+            filtered_ids = export_ids(id_list)
 
-            # Determine stem and potential base index (only for saving). Do NOT mutate ids.
-            raw_stem = IdFilenameBuilder.sanitize_id_filename(filtered_ids) or "image"
-            base_stem, base_idx = split_trailing_number(raw_stem)
+            # Completed in the interrupted run: keep its file, skip the encode. In overwrite/skip
+            # modes the planner still runs so later names match the original run.
+            if idx in completed:
+                if on_exists != "append" and plan is None:
+                    planner.plan(filtered_ids)
+                saved[idx] = completed[idx]
+                resumed_count += 1
+                continue
 
-            if on_exists == "append":
-                # Enumeration strategy:
-                #   If no trailing digits -> use determine_filename (legacy behavior).
-                #   If trailing digits -> treat them as starting index; enumerate using base stem.
-                if base_idx is None:
-                    final_name = determine_filename(filtered_ids, ext, save_dir)
+            image = images[idx]
+            digest = duplicate = None
+            if dedup_index is not None:
+                try:
+                    image = ImageExporter.batch_to_uint8(image)
+                    digest = pixel_digest(image[0], output_format)
+                except Exception:
+                    image = images[idx]  # unconvertible: let the encoder report the error
                 else:
-                    # Find current max for base stem if not cached
-                    if base_stem not in cached_max:
-                        max_found = 0
-                        pattern = re.compile(rf"^{re.escape(base_stem)}_(\d+){re.escape(ext)}$")
-                        try:
-                            for f in os.listdir(save_dir):
-                                m2 = pattern.match(f)
-                                if m2:
-                                    n = int(m2.group(1))
-                                    if n > max_found:
-                                        max_found = n
-                        except FileNotFoundError:
-                            pass
-                        cached_max[base_stem] = max_found
-                    max_found = cached_max[base_stem]
-                    # Choose next enumeration: if provided base is ahead, jump to it; else continue sequence
-                    if base_idx <= max_found:
-                        next_enum = max_found + 1
-                    else:
-                        next_enum = base_idx
-                    if next_enum > 99:
-                        raise ValueError(f"Exceeded 99 variations for stem '{base_stem}' in {save_dir}")
-                    final_name = f"{base_stem}_{next_enum:02d}{ext}"
-                    cached_max[base_stem] = next_enum
-            else:
-                # overwrite / skip modes: predictable enumeration order within this batch.
-                # Use provided base index if any for first occurrence of a stem; subsequent ones increment.
-                stem_key = base_stem if base_idx is not None else raw_stem
-                if stem_key not in cached_max:
-                    cached_max[stem_key] = (base_idx - 1) if base_idx else 0
-                next_enum = cached_max[stem_key] + 1
-                if base_idx and next_enum < base_idx:
-                    next_enum = base_idx
-                if next_enum > 99:
-                    raise ValueError(f"Exceeded 99 variations for stem '{stem_key}' in batch")
-                final_name = f"{stem_key}_{next_enum:02d}{ext}"
-                cached_max[stem_key] = next_enum
-                final_path = os.path.join(save_dir, final_name)
-                if os.path.exists(final_path):
-                    if on_exists == "skip":
-                        skipped_count += 1
+                    duplicate = dedup_index.lookup(digest) or pending.get(digest)
+                    if duplicate and dedup == "skip":
+                        # Keep later names in overwrite/skip mode where they would be without the duplicate
+                        if on_exists != "append" and plan is None:
+                            planner.plan(filtered_ids)
+                        dedup_count += 1
+                        manifest.skipped(duplicate, filtered_ids, idx, duplicate=True)
+                        log.item("Skipped duplicate of %s", duplicate)
                         continue
-                    # overwrite falls through
 
-            final_path = os.path.join(save_dir, final_name)
-            arr = ImageExporter.to_numpy(images[idx])
-            ImageExporter.save_image(arr, final_path, fmt["params"])
-            filenames.append(final_name)
+            if plan is not None:
+                filename = plan.filenames[idx]
+                planned = PlannedName(filename, stem_index.contains(filename) and os.path.exists(os.path.join(save_dir, filename)))
+            else:
+                planned = planner.plan(filtered_ids)
+            if planned.exists and on_exists == "skip":
+                skipped_count += 1
+                manifest.skipped(planned.filename, filtered_ids, idx)
+                continue
+            # overwrite falls through
 
-            print(f"[VOXTA] Saved character image: {final_path}")
+            if duplicate:
+                dedup_count += 1
+                attempted += 1
+                if incremental or dedup_index.lookup(digest):
+                    link_result(idx, filtered_ids, planned.filename, digest, duplicate)
+                else:
+                    deferred.append((idx, filtered_ids, planned.filename, digest, duplicate))
+                continue
 
-        return {
-            "ui": {
-                "filenames": filenames,
-                "skipped": [skipped_count],
-                "on_exists": [on_exists],
-                "image_count": [len(filenames)],
-            }
+            job = EncodeJob(image, os.path.join(save_dir, planned.filename), replace, stem_index.own_write)
+            attempted += 1
+            if digest:
+                pending[digest] = planned.filename
+            if incremental:
+                # Write now so partial results survive a crash and only one frame is converted at a time
+                record_result(encode_job(job, fmt_params), idx, filtered_ids, digest)
+            else:
+                jobs.append((job, idx, filtered_ids, digest))
+
+        if incremental:
+            release_buffers()
+        else:
+            # Encode concurrently; results come back in planning order so filenames stay deterministic.
+            # Each result is journaled as it completes, so an interrupted batch can be resumed.
+            results = iter_encode([job for job, *_ in jobs], fmt_params, workers)
+            for (_, pos, ids, digest), result in zip(jobs, results):
+                record_result(result, pos, ids, digest)
+        # Duplicates of images encoded in this batch can only be linked once their source exists
+        for pos, ids, filename, digest, duplicate in deferred:
+            link_result(pos, ids, filename, digest, duplicate)
+
+        # Calibrate auto effort predictions against this machine and these images
+        cost_model.observe(fmt_params, megapixels, encode_seconds)
+
+        filenames = [saved[pos] for pos in sorted(saved)]
+        if not errors:
+            # A run without a finish record stays resumable, including after encode failures
+            manifest.finish(filenames=filenames, skipped=skipped_count, image_count=len(filenames))
+        log.summary(
+            "Exported %d of %d character images to %s (%s, on_exists=%s, skipped %d, deduplicated %d, resumed %d, failed %d)",
+            len(filenames),
+            len(combination_ids),
+            save_dir,
+            output_format,
+            on_exists,
+            skipped_count,
+            dedup_count,
+            resumed_count,
+            len(errors),
+        )
+        if errors:
+            raise RuntimeError(f"Failed to save {len(errors)} of {attempted} images:\n  " + "\n  ".join(errors))
+
+        ui = {
+            "filenames": filenames,
+            "skipped": [skipped_count],
+            "on_exists": [on_exists],
+            "image_count": [len(filenames)],
         }
+        if resumed_count:
+            ui["resumed"] = [resumed_count]
+        if dedup != "off":
+            ui["deduplicated"] = [dedup_count]
+        return {"ui": ui}
 
 
 NODE_CLASS_MAPPINGS = {"VoxtaExportCharacter": VoxtaExportCharacter}
@@ -1,8 +1,21 @@
 import os
 import logging
-import re
 import random
-from .helpers import FolderHelper, IdFilenameBuilder
+from .existence import iter_missing_positions, missing_positions
+from .helpers import ComfyHelper, FolderHelper, ImageExporter, RunLogger, VERBOSITY_OPTIONS
+from .naming import ExportPlan, export_ids, plan_export
+from .sampling import reservoir_sample, stratified_sample
+from .prompt_table import PromptTable
+from .selection import CombinationSelection
+from .stem_index import get_stem_index, get_stem_tree
+from .stems import (
+    DEFAULT_INDEX_WIDTH,
+    MAX_INDEX_WIDTH,
+    MIN_INDEX_WIDTH,
+    index_width as normalize_index_width,
+    max_index_for_width,
+    resolve_stem,
+)
 
 try:  # pragma: no cover
     import folder_paths  # type: ignore
@@ -33,16 +46,82 @@ class VoxtaFilterExistingCombinations:
                         "single (first)",
                         "single (last)",
                         "single (random)",
+                        "sample N new",
+                        "stratified by first id",
                     ],
-                    {"default": "all"},
+                    {
+                        "default": "all",
+                        "tooltip": "sample N new: a random subset of sample_count new combinations. stratified by first"
+                        " id: up to sample_count new combinations for every first id (e.g. per expression).",
+                    },
+                ),
+            },
+            "optional": {
+                "verbosity": (VERBOSITY_OPTIONS, {"default": "summary"}),
+                "recursive": (
+                    "BOOLEAN",
+                    {"default": False, "tooltip": "Also count enumerated files in subfolders (e.g. Avatars/<Pack>) as existing."},
+                ),
+                "index_width": (
+                    "INT",
+                    {
+                        "default": DEFAULT_INDEX_WIDTH,
+                        "min": MIN_INDEX_WIDTH,
+                        "max": MAX_INDEX_WIDTH,
+                        "tooltip": "Match the Export Character setting; trailing numbers up to this many digits are"
+                        " treated as enumerations.",
+                    },
+                ),
+                "sample_count": (
+                    "INT",
+                    {
+                        "default": 10,
+                        "min": 1,
+                        "max": 100000,
+                        "tooltip": "Combinations kept by the sampling behaviors (per group when stratified).",
+                    },
+                ),
+                "seed": (
+                    "INT",
+                    {
+                        "default": 0,
+                        "min": 0,
+                        "max": 0xFFFFFFFF,
+                        "tooltip": "Seed for single (random) and the sampling behaviors; the same seed and folder state pick"
+                        " the same combinations. 0 = a different pick every run.",
+                    },
+                ),
+                "export_format": (
+                    ["any"] + list(ImageExporter.FORMAT_MAP),
+                    {
+                        "default": "any",
+                        "tooltip": "any: a combination exists if any file of its stem (and index) exists. A format: plan the"
+                        " filenames Export Character will use with on_exists=skip/overwrite, filter on those, and pass the"
+                        " plan to the export node through export_plan. Only the output folder itself is checked.",
+                    },
+                ),
+                "outputs": (
+                    ["lists", "selection"],
+                    {
+                        "default": "lists",
+                        "tooltip": "lists: the kept combination_ids as a list. selection: the compact selection output instead,"
+                        " for very large combination sets; combination_ids is left empty. prompts is filled either way.",
+                    },
                 ),
             },
         }
 
     INPUT_IS_LIST = True
-    RETURN_TYPES = ("PROMPTCOMBINATORIDS", "STRING")
-    RETURN_NAMES = ("combination_ids", "prompts")
-    OUTPUT_IS_LIST = (True, True)
+    RETURN_TYPES = ("PROMPTCOMBINATORIDS", "STRING", "VOXTA_EXPORT_PLAN", "VOXTA_COMBINATION_SELECTION")
+    RETURN_NAMES = ("combination_ids", "prompts", "export_plan", "selection")
+    OUTPUT_IS_LIST = (True, True, False, False)
+    OUTPUT_TOOLTIPS = (
+        "Kept combination ids (outputs=lists)",
+        "Prompts of the kept combinations, for the sampler",
+        "Export filenames of the kept combinations (with export_format set)",
+        "The kept combinations as positions into this node's inputs, for Export Character's selection input;"
+        " replaces its combination_ids without copying them (outputs=selection)",
+    )
     FUNCTION = "execute"
     CATEGORY = "Voxta"
 
@@ -54,7 +133,15 @@ class VoxtaFilterExistingCombinations:
         output_path: list[str] | str,
         subfolder: list[str] | str,
         behavior: list[str] | str,
+        verbosity: list[str] | str = "summary",
+        index_width: list[int] | int = DEFAULT_INDEX_WIDTH,
+        recursive: list[bool] | bool = False,
+        export_format: list[str] | str = "any",
+        sample_count: list[int] | int = 10,
+        seed: list[int] | int = 0,
+        outputs: list[str] | str = "lists",
     ):
+        log = RunLogger(logger, verbosity)
         # Normalize behavior (ComfyUI often wraps scalars in lists)
         if isinstance(behavior, list):
             behavior_value = behavior[0] if behavior else "all"
@@ -62,95 +149,109 @@ class VoxtaFilterExistingCombinations:
             behavior_value = behavior or "all"
 
         save_dir = FolderHelper.get_output_directory(output_path, subfolder)
-        print("[Voxta] Filtering existing combinations in:", save_dir)
 
-        # Prompt broadcasting
-        if len(prompts) == 1 and len(combination_ids) > 1:
-            prompts = prompts * len(combination_ids)
-        elif len(prompts) != len(combination_ids):
+        # One prompt is broadcast to several combinations, but never to none
+        if len(prompts) != len(combination_ids) and not (len(prompts) == 1 and len(combination_ids) > 1):
             raise ValueError("Prompt and combination ID lists must have same length or 1 prompt.")
 
-        # Scan existing files once; collect enumerated indices per stem
-        stem_indices: dict[str, set[int]] = {}
-        if os.path.exists(save_dir):
-            print("[Voxta] Scanning existing files in:", save_dir)
-            for file in os.listdir(save_dir):
-                m = re.match(r"^(?P<stem>.+?)_(?P<idx>\d{2})\.[A-Za-z0-9]+$", file)
-                if not m:
-                    continue
-                stem = m.group("stem")
-                idx = int(m.group("idx"))
-                stem_indices.setdefault(stem, set()).add(idx)
-
-        def split_trailing_number(stem: str):
-            m = re.match(r"^(.*?)(\d+)$", stem)
-            if not m:
-                return stem, None
-            base, num = m.group(1), m.group(2)
-            base = base.rstrip("._")
-            if not base:
-                return stem, None
-            try:
-                val = int(num)
-            except ValueError:
-                return stem, None
-            if val < 1 or val > 99:
-                return base, None  # out-of-range ignored for filtering purposes
-            return base, val
-
-        exists_flags: list[bool] = []
-        stems: list[str] = []
-        indices: list[int | None] = []
-        for cid in combination_ids:
-            full_stem = IdFilenameBuilder.sanitize_id_filename(cid)
-            base_stem, base_idx = split_trailing_number(full_stem)
-            stems.append(base_stem if base_idx is not None else full_stem)
-            indices.append(base_idx)
-            if base_idx is not None:
-                existing = stem_indices.get(base_stem, set())
-                exists_flags.append(base_idx in existing)
+        width = normalize_index_width(index_width)
+        export_format = ComfyHelper.comfy_input_to_str(export_format, "any")
+        log_items = log.items_enabled
+        plan: ExportPlan | None = None
+        if export_format != "any":
+            # The exact names the export node will write, resolved once for both nodes
+            plan = plan_export(save_dir, ImageExporter.determine_format(export_format)["ext"], combination_ids, width=width)
+            exists_flags = plan.exists
+            if log_items:
+                for cid, filename, exists in zip(combination_ids, plan.filenames, plan.exists):
+                    log.item("Combination %s -> %s exists=%s", cid, filename, exists)
+        else:
+            # Existing enumerated indices per stem, shared with the export node and reused across runs
+            if recursive[0] if isinstance(recursive, list) and recursive else recursive:
+                stem_index = get_stem_tree(save_dir)
             else:
-                exists_flags.append(bool(stem_indices.get(full_stem)))
+                stem_index = get_stem_index(save_dir)
+
+            # Out-of-range trailing numbers stay part of the stem for filtering purposes
+            max_index = max_index_for_width(width)
+            exists_flags = stem_index.existence_bitmap().lookup(resolve_stem(cid, max_index=max_index) for cid in combination_ids)
+            if log_items:
+                for cid, exists in zip(combination_ids, exists_flags):
+                    base_stem, base_idx = resolve_stem(cid, max_index=max_index)
+                    log.item("Combination %s -> stem %s index %s exists=%s", cid, base_stem, base_idx, bool(exists))
 
         total = len(combination_ids)
 
         # Behavior handling
         if behavior_value == "all":
-            kept_cids = combination_ids
-            kept_prompts = prompts
+            kept_positions = None
+            kept_plan = plan
             skipped = 0
             summary = f"Kept all {total} combinations (all)."
         else:
-            # Determine new (non-existing) combos
-            new_indices = [i for i, exists in enumerate(exists_flags) if not exists]
+            seed_value = int(seed[0] if isinstance(seed, list) and seed else seed)
+            # Seed 0 draws from the module-level generator, as single (random) always did
+            rng = random.Random(seed_value) if seed_value else random
             if behavior_value == "new only":
+                new_indices = missing_positions(exists_flags)
                 if not new_indices:
                     raise ValueError("All combinations were filtered out, nothing to generate.")
-                kept_cids = [combination_ids[i] for i in new_indices]
-                kept_prompts = [prompts[i] for i in new_indices]
+                kept_positions = new_indices
+                kept_plan = plan.select(new_indices) if plan else None
                 skipped = total - len(new_indices)
-                summary = f"Kept {len(kept_cids)} of {total} combinations."
+                summary = f"Kept {len(new_indices)} of {total} combinations."
+            elif behavior_value in ("sample N new", "stratified by first id"):
+                count = int(sample_count[0] if isinstance(sample_count, list) and sample_count else sample_count)
+                candidates = iter_missing_positions(exists_flags)
+                if behavior_value == "sample N new":
+                    picked = reservoir_sample(candidates, count, rng)
+                else:
+                    picked = stratified_sample(candidates, count, lambda i: export_ids(combination_ids[i])[0], rng)
+                if not picked:
+                    raise ValueError("All combinations were filtered out, nothing to generate.")
+                kept_positions = picked
+                kept_plan = plan.select(picked) if plan else None
+                skipped = total - len(picked)
+                summary = f"Sampled {len(picked)} of {total} combinations ({behavior_value})."
             elif behavior_value.startswith("single"):
+                new_indices = missing_positions(exists_flags)
                 candidate_indices = new_indices if new_indices else list(range(total))
                 if behavior_value == "single (first)":
                     pick_index = candidate_indices[0]
                 elif behavior_value == "single (last)":
                     pick_index = candidate_indices[-1]
                 elif behavior_value == "single (random)":
-                    pick_index = random.choice(candidate_indices)
+                    pick_index = rng.choice(candidate_indices)
                 else:
                     raise ValueError(f"Unsupported behavior: {behavior_value}")
-                kept_cids = [combination_ids[pick_index]]
-                kept_prompts = [prompts[pick_index]]
+                kept_positions = [pick_index]
+                kept_plan = plan.select([pick_index]) if plan else None
                 skipped = total - 1
                 source = "new" if pick_index in new_indices else "existing"
                 summary = f"Selected 1 combination ({behavior_value}, {source})."
             else:
                 raise ValueError(f"Unsupported behavior: {behavior_value}")
 
+        log.summary("%s Skipped %d. Folder: %s", summary, skipped, save_dir)
+
+        # The sampler needs the kept prompts in either mode; a single prompt is broadcast without copying it
+        prompt_at = prompts if len(prompts) == total else PromptTable.from_prompts(prompts, total)
+        if kept_positions is None:
+            kept_prompts = prompts if len(prompts) == total else list(prompt_at)
+        else:
+            kept_prompts = [prompt_at[i] for i in kept_positions]
+
+        if ComfyHelper.comfy_input_to_str(outputs, "lists") == "selection":
+            # Only positions into the inputs are kept for the export node
+            selection = CombinationSelection(combination_ids, prompts, kept_positions, kept_plan)
+            result = ([], kept_prompts, kept_plan, selection)
+        else:
+            kept_cids = combination_ids if kept_positions is None else [combination_ids[i] for i in kept_positions]
+            result = (kept_cids, kept_prompts, kept_plan, None)
+
         return {
-            "result": (kept_cids, kept_prompts),
-            "ui": {"summary": [summary], "skipped": [skipped], "kept": [len(kept_cids)]},
+            "result": result,
+            "ui": {"summary": [summary], "skipped": [skipped], "kept": [total - skipped]},
         }
 
 
@@ -0,0 +1,75 @@
+import numpy as np
+
+from voxta.dedup import DedupIndex, pixel_digest
+from voxta.export_manifest import ExportManifest
+
+
+def test_pixel_digest_depends_on_pixels_shape_and_format():
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    digest = pixel_digest(frame, ".png lossless")
+    assert digest == pixel_digest(frame.copy(), ".png lossless")
+    assert digest != pixel_digest(frame, ".webp lossless")
+    assert digest != pixel_digest(np.zeros((2, 8, 3), dtype=np.uint8), ".png lossless")
+    changed = frame.copy()
+    changed[0, 0, 0] = 1
+    assert digest != pixel_digest(changed, ".png lossless")
+    # Non-contiguous views hash like their contents
+    assert pixel_digest(np.zeros((4, 8, 3), dtype=np.uint8)[:, ::2], ".png lossless") == digest
+
+
+def test_dedup_index_follows_journal(tmp_path):
+    (tmp_path / "A_01.png").write_bytes(b"a")
+    (tmp_path / "B_01.png").write_bytes(b"b")
+    manifest = ExportManifest(str(tmp_path))
+    manifest.saved("A_01.png", ["A"], 0, hash="h1")
+
+    index = DedupIndex(str(tmp_path)).refresh()
+    assert index.lookup("h1") == "A_01.png"
+
+    # Only newly appended records are read; an overwrite replaces the file's old digest
+    manifest.saved("B_01.png", ["B"], 1, hash="h2")
+    manifest.saved("A_01.png", ["A"], 2, hash="h3")
+    index.refresh()
+    assert index.lookup("h1") is None
+    assert index.lookup("h2") == "B_01.png"
+    assert index.lookup("h3") == "A_01.png"
+
+    # Deleted files are not offered as duplicates
+    (tmp_path / "B_01.png").unlink()
+    assert index.lookup("h2") is None
+
+
+def test_compaction_keeps_what_resume_and_dedup_need(tmp_path):
+    from voxta.export_manifest import compact_manifest, find_resumable_run, read_manifest
+
+    (tmp_path / "A_01.png").write_bytes(b"a")
+    (tmp_path / "B_01.png").write_bytes(b"b")
+    old = ExportManifest(str(tmp_path))
+    old.start(job="j1")
+    old.saved("A_01.png", ["A"], 0, hash="h1")
+    old.saved("Gone_01.png", ["Gone"], 1, hash="h2")
+    old.skipped("C_01.png", ["C"], 2)
+    old.finish()
+    unfinished = ExportManifest(str(tmp_path))
+    unfinished.start(job="j2")
+    unfinished.saved("B_01.png", ["B"], 0)
+
+    index = DedupIndex(str(tmp_path)).refresh()
+    assert not compact_manifest(str(tmp_path))  # still small
+    assert compact_manifest(str(tmp_path), max_bytes=0)
+
+    records = list(read_manifest(str(tmp_path)))
+    assert [(r["run"], r["event"]) for r in records] == [
+        (old.run_id, "saved"),
+        (unfinished.run_id, "start"),
+        (unfinished.run_id, "saved"),
+    ]
+    assert find_resumable_run(str(tmp_path), "j2") == (unfinished.run_id, {0: "B_01.png"})
+    assert find_resumable_run(str(tmp_path), "j1") == (None, {})
+
+    # The dedup index notices the rewrite and keeps following the journal
+    unfinished.saved("B_01.png", ["B"], 1, hash="h3")
+    index.refresh()
+    assert index.lookup("h1") == "A_01.png"
+    assert index.lookup("h3") == "B_01.png"
+    assert not any(p.name.endswith(".part") for p in tmp_path.iterdir())
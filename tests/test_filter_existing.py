@@ -171,6 +171,19 @@ def test_filter_prompts_true_length_mismatch_raises(tmp_path):
         )
 
 
+@pytest.mark.parametrize("behavior", ["all", "single (first)", "single (random)"])
+def test_filter_single_prompt_without_combinations_raises(tmp_path, behavior):
+    (tmp_path / "chars").mkdir()
+    with pytest.raises(ValueError, match="same length or 1 prompt"):
+        VoxtaFilterExistingCombinations().execute(
+            combination_ids=[],
+            prompts=["p"],
+            output_path=[str(tmp_path)],
+            subfolder=["chars"],
+            behavior=[behavior],
+        )
+
+
 def test_filter_handles_list_wrapped_path(tmp_path):
     node = VoxtaFilterExistingCombinations()
     root = tmp_path / "root"
@@ -341,3 +354,110 @@ def test_single_when_no_new_uses_existing(tmp_path):
         behavior=["single (last)"],
     )
     assert res2["result"][0] == [combos[-1]]
+
+
+def test_filter_recognises_wide_indices(tmp_path):
+    node = VoxtaFilterExistingCombinations()
+    save_dir = tmp_path / "root" / "chars"
+    save_dir.mkdir(parents=True)
+    (save_dir / "Talking_150.webp").write_bytes(b"X")
+
+    combos = [make_ids("Talking", "150"), make_ids("Talking", "151")]
+    kwargs = dict(combination_ids=combos, prompts=["p"], output_path=[str(tmp_path / "root")], subfolder=["chars"], behavior=["new only"])
+    # At the default width 150 is not an enumeration, so no stem "Talking_150" exists
+    assert node.execute(**kwargs)["ui"]["kept"] == [2]
+    res = node.execute(index_width=[3], **kwargs)
+    assert res["result"][0] == [combos[1]]
+
+
+def test_filter_recursive_checks_subfolders(tmp_path):
+    node = VoxtaFilterExistingCombinations()
+    pack = tmp_path / "root" / "chars" / "Pack"
+    pack.mkdir(parents=True)
+    (pack / "Neutral_Idle_01.webp").write_bytes(b"X")
+
+    combos = [make_ids("Neutral", "Idle"), make_ids("Happy", "Wave")]
+    kwargs = dict(combination_ids=combos, prompts=["p"], output_path=[str(tmp_path / "root")], subfolder=["chars"], behavior=["new only"])
+    assert node.execute(**kwargs)["ui"]["kept"] == [2]
+    assert node.execute(recursive=[True], **kwargs)["result"][0] == [combos[1]]
+
+
+def test_filter_with_export_format_uses_planned_filenames(tmp_path):
+    node = VoxtaFilterExistingCombinations()
+    save_dir = tmp_path / "chars"
+    save_dir.mkdir()
+    (save_dir / "Neutral_01.webp").write_bytes(b"X")
+    (save_dir / "Happy_01.png").write_bytes(b"X")  # other format: not what the export would write
+
+    combos = [["Neutral"], ["Neutral"], ["Happy"]]
+    res = node.execute(
+        combination_ids=combos,
+        prompts=["p1", "p2", "p3"],
+        output_path=[str(tmp_path)],
+        subfolder=["chars"],
+        behavior=["new only"],
+        export_format=[".webp lossy 90"],
+    )
+    kept_cids, kept_prompts, plan = res["result"][:3]
+    assert kept_cids == [combos[1], combos[2]]
+    assert kept_prompts == ["p2", "p3"]
+    assert plan.filenames == ["Neutral_02.webp", "Happy_01.webp"]
+    assert plan.exists == [False, False]
+    assert VoxtaFilterExistingCombinations.RETURN_NAMES[2] == "export_plan"
+
+
+def _sample(tmp_path, behavior, combos, sample_count, seed):
+    return VoxtaFilterExistingCombinations().execute(
+        combination_ids=combos,
+        prompts=[f"p{i}" for i in range(len(combos))],
+        output_path=[str(tmp_path)],
+        subfolder=["chars"],
+        behavior=[behavior],
+        sample_count=[sample_count],
+        seed=[seed],
+    )
+
+
+def test_sample_n_new_is_seeded_and_skips_existing(tmp_path):
+    (tmp_path / "chars").mkdir()
+    (tmp_path / "chars" / "E0_Pose_01.webp").write_bytes(b"X")
+    combos = [[f"E{i % 5}", "Pose"] if i < 5 else [f"E{i % 5}", f"Pose{i}x"] for i in range(200)]
+
+    res = _sample(tmp_path, "sample N new", combos, 7, 1234)
+    kept = res["result"][0]
+    assert len(kept) == 7
+    assert ["E0", "Pose"] not in kept
+    # Combinator order is preserved and the same seed picks the same combinations
+    assert kept == sorted(kept, key=combos.index)
+    assert _sample(tmp_path, "sample N new", combos, 7, 1234)["result"][0] == kept
+    assert res["result"][1] == [f"p{combos.index(c)}" for c in kept]
+    assert res["ui"]["skipped"] == [193]
+
+
+def test_stratified_sampling_covers_every_first_id(tmp_path):
+    (tmp_path / "chars").mkdir()
+    combos = [[f"E{i % 4}", f"Pose{i}x"] for i in range(100)]
+    kept = _sample(tmp_path, "stratified by first id", combos, 2, 7)["result"][0]
+    assert sorted(c[0] for c in kept) == ["E0", "E0", "E1", "E1", "E2", "E2", "E3", "E3"]
+
+
+def test_filter_selection_output(tmp_path):
+    (tmp_path / "chars").mkdir()
+    (tmp_path / "chars" / "A_01.webp").write_bytes(b"X")
+    kwargs = dict(
+        combination_ids=[["A"], ["B"], ["C"]],
+        prompts=["same", "same", "other"],
+        output_path=[str(tmp_path)],
+        subfolder=["chars"],
+        behavior=["new only"],
+    )
+    lists = VoxtaFilterExistingCombinations().execute(**kwargs)["result"]
+    assert lists[1] == ["same", "other"]
+    assert lists[3] is None
+
+    # The compact outputs leave combination_ids empty; the sampler still gets the kept prompts
+    compact = VoxtaFilterExistingCombinations().execute(outputs=["selection"], **kwargs)["result"]
+    assert compact[0] == []
+    assert compact[1] == ["same", "other"]
+    assert list(compact[3].combination_ids) == [["B"], ["C"]]
+    assert list(compact[3].prompts) == ["same", "other"]
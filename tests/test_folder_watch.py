@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from voxta.folder_watch import FolderWatcher
+from voxta.stem_index import StemIndex
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_live_index_applies_changes_without_rescanning(tmp_path):
+    (tmp_path / "A_01.png").write_bytes(b"A")
+    index = StemIndex(str(tmp_path))
+    index.set_live(True)
+    assert index.max_index("A") == 1
+
+    # Not reported by a watcher, so a live index does not see it
+    (tmp_path / "A_05.png").write_bytes(b"A")
+    assert index.refresh().max_index("A") == 1
+
+    index.apply_change("A_05.png", True)
+    index.apply_change("A_02.png", True)
+    assert index.max_index("A") == 5
+    index.apply_change("A_05.png", False)
+    assert index.max_index("A") == 2
+    index.apply_change("Pack", True, is_dir=True)
+    assert index.subdirectories() == ["Pack"]
+
+    index.set_live(False)
+    assert index.refresh(force=True).max_index("A") == 5
+
+
+def test_polling_fallback_refreshes_in_background(tmp_path):
+    watcher = FolderWatcher(poll_interval=0.05, use_watchdog=False)
+    try:
+        index = watcher.watch(str(tmp_path))
+        assert not index.live
+        (tmp_path / "B_01.webp").write_bytes(b"B")
+        assert _wait_for(lambda: index.has_stem("B"))
+    finally:
+        watcher.stop()
+
+
+def test_watchdog_pushes_updates(tmp_path):
+    pytest.importorskip("watchdog")
+    watcher = FolderWatcher()
+    try:
+        index = watcher.watch(str(tmp_path))
+        assert index.live
+        (tmp_path / "C_03.png").write_bytes(b"C")
+        assert _wait_for(lambda: index.max_index("C") == 3)
+        (tmp_path / "C_03.png").rename(tmp_path / "D_01.png")
+        assert _wait_for(lambda: index.has_stem("D") and not index.has_stem("C"))
+        assert watcher.watched() == [str(tmp_path)]
+    finally:
+        watcher.stop()
+    assert not index.live
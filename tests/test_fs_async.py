@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from voxta import fs_async
+from voxta.fs_async import run_blocking
+
+
+def test_run_blocking_returns_result_off_loop():
+    loop_thread = threading.get_ident()
+
+    async def run():
+        return await run_blocking(threading.get_ident)
+
+    assert asyncio.run(run()) != loop_thread
+
+
+def test_run_blocking_times_out():
+    async def run():
+        await run_blocking(time.sleep, 0.5, timeout=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+
+
+def test_run_blocking_bounds_concurrency(monkeypatch):
+    monkeypatch.setattr(fs_async, "MAX_CONCURRENT_CALLS", 2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.pop()
+
+    async def run():
+        await asyncio.gather(*(run_blocking(work) for _ in range(6)))
+
+    asyncio.run(run())
+    assert max(peak) <= 2
@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+import pytest
+
+from voxta.helpers import ImageExporter
+
+
+def _reference_uint8(arr):
+    """The original per-image conversion from save_image."""
+    if arr.max() <= 1.5:
+        arr = arr * 255.0
+    return arr.clip(0, 255).astype("uint8")
+
+
+def test_batch_to_uint8_matches_reference(monkeypatch):
+    # Small scratch band to exercise conversion across several row chunks
+    monkeypatch.setattr(ImageExporter, "SCRATCH_PIXELS", 40)
+    rng = np.random.default_rng(0)
+    batch = rng.random((3, 17, 11, 4), dtype=np.float32)
+    batch[1] *= 300.0  # already in 0..255 range (and beyond): no scaling
+
+    out = ImageExporter.batch_to_uint8(batch)
+    assert out.dtype == np.uint8
+    assert out.shape == batch.shape
+    for i in range(batch.shape[0]):
+        np.testing.assert_array_equal(out[i], _reference_uint8(batch[i]))
+
+
+def test_batch_to_uint8_reuses_output_buffer():
+    frame = np.full((8, 8, 3), 0.5, dtype=np.float32)
+    out = np.empty((1, 8, 8, 3), dtype=np.uint8)
+    result = ImageExporter.batch_to_uint8(frame, out=out)
+    assert result is out
+    assert int(out[0, 0, 0, 0]) == 127
+
+
+def test_batch_to_uint8_copies_uint8_input():
+    frame = np.full((1, 4, 4, 4), 200, dtype=np.uint8)
+    out = ImageExporter.batch_to_uint8(frame)
+    assert out is not frame
+    np.testing.assert_array_equal(out, frame)
+
+
+def test_batch_to_uint8_rejects_bad_shape():
+    with pytest.raises(ValueError):
+        ImageExporter.batch_to_uint8(np.zeros((4, 4), dtype=np.float32))
+    with pytest.raises(ValueError):
+        ImageExporter.batch_to_uint8(np.zeros((4, 4, 2), dtype=np.float32))
+
+
+def test_save_frame_is_atomic(tmp_path):
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    target = tmp_path / "A_01.png"
+    ImageExporter.save_frame(frame, str(target), {"format": "PNG"})
+    assert target.exists()
+    assert [p.name for p in tmp_path.iterdir()] == ["A_01.png"]
+
+    # A failed encode leaves neither the final file nor a temporary one behind
+    with pytest.raises(Exception):
+        ImageExporter.save_frame(np.zeros((4, 4), dtype=np.float64), str(tmp_path / "B_01.png"), {"format": "PNG"})
+    assert [p.name for p in tmp_path.iterdir()] == ["A_01.png"]
+
+
+def test_save_frame_without_overwrite_keeps_existing_file(tmp_path):
+    target = tmp_path / "A_01.png"
+    target.write_bytes(b"theirs")
+    with pytest.raises(FileExistsError):
+        ImageExporter.save_frame(np.zeros((4, 4, 3), dtype=np.uint8), str(target), {"format": "PNG"}, overwrite=False)
+    assert target.read_bytes() == b"theirs"
+    assert [p.name for p in tmp_path.iterdir()] == ["A_01.png"]
+
+
+def test_remove_stale_partials(tmp_path):
+    old = tmp_path / ".A_01.png.1234abcd.part"
+    new = tmp_path / ".B_01.png.5678abcd.part"
+    old.write_bytes(b"x")
+    new.write_bytes(b"x")
+    os.utime(old, (0, 0))
+    removed = ImageExporter.remove_stale_partials(str(tmp_path), [old.name, new.name, ".gone.part"])
+    assert removed == 1
+    assert not old.exists() and new.exists()
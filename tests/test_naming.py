@@ -1,3 +1,5 @@
+import os
+import pytest
 from pathlib import Path
 from voxta.naming import determine_filename
 
@@ -21,3 +23,31 @@ def test_determine_filename_sanitization(tmp_path):
     # Expect illegal characters replaced with underscores and enumeration
     assert name == "A_B_C_D_01.png"
     assert Path(save_dir, name).exists() is False  # function does not create the file
+
+
+def test_determine_filename_index_width(tmp_path):
+    (tmp_path / "Neutral_Idle_99.png").write_text("dummy")
+    with pytest.raises(ValueError, match="index_width"):
+        determine_filename(["Neutral", "Idle"], ".png", str(tmp_path))
+    assert determine_filename(["Neutral", "Idle"], ".png", str(tmp_path), width=3) == "Neutral_Idle_100.png"
+    assert determine_filename(["Happy"], ".png", str(tmp_path), width=3) == "Happy_001.png"
+
+
+def test_plan_export_is_cached_until_the_folder_changes(tmp_path):
+    from voxta.naming import clear_export_plans, plan_export
+    from voxta.stem_index import get_stem_index
+
+    clear_export_plans()
+    (tmp_path / "A_01.webp").write_bytes(b"X")
+    # An mtime from just now is not trusted and would force a rescan on every call
+    os.utime(tmp_path, (1_000_000_000, 1_000_000_000))
+    combos = [["A"], ["A"], ["input_1_no_id_", "B"]]
+    plan = plan_export(str(tmp_path), ".webp", combos)
+    assert plan.filenames == ["A_01.webp", "A_02.webp", "B_01.webp"]
+    assert plan.exists == [True, False, False]
+    assert plan_export(str(tmp_path), ".webp", combos) is plan
+
+    (tmp_path / "B_01.webp").write_bytes(b"X")
+    get_stem_index(str(tmp_path)).add("B_01.webp")
+    assert plan_export(str(tmp_path), ".webp", combos).exists == [True, False, True]
+    assert plan.select([2, 0]).filenames == ["B_01.webp", "A_01.webp"]
@@ -1,3 +1,5 @@
+import os
+
 from voxta.voxta_output_folder import VoxtaOutputFolder
 from voxta.voxta_filter_existing import VoxtaFilterExistingCombinations
 from voxta.voxta_export_character import VoxtaExportCharacter
@@ -9,26 +11,27 @@ def test_output_folder_creates_directory(tmp_path):
     root = tmp_path / "myroot"
     sub = "My:Sub*Folder"
     res = node.execute(output_path=[str(root)], subfolder=[sub])
-    # Returns tuple of raw values
-    assert res == (str(root), sub)
     # Directory on disk should be sanitized version
     sanitized_sub = "My_Sub_Folder"
     expected_dir = root / sanitized_sub
+    # Returns the raw values plus the resolved directory
+    assert res == (str(root), sub, str(expected_dir))
     assert expected_dir.exists()
 
 
 def test_output_folder_empty_defaults(chdir_tmp):
     node = VoxtaOutputFolder()
-    (root, sub) = node.execute(output_path=[], subfolder=[])  # use comfy default output
+    (root, sub, resolved) = node.execute(output_path=[], subfolder=[])  # use comfy default output
     assert root == ""
     assert sub == ""
+    assert resolved == str(chdir_tmp / "output")
 
 
 def test_integration_with_filter(tmp_path):
     folder_node = VoxtaOutputFolder()
     root = tmp_path / "root"
     sub = "chars"
-    out_root, out_sub = folder_node.execute(output_path=[str(root)], subfolder=[sub])
+    out_root, out_sub, _ = folder_node.execute(output_path=[str(root)], subfolder=[sub])
 
     filter_node = VoxtaFilterExistingCombinations()
     combos = [["A", "B"]]
@@ -48,7 +51,7 @@ def test_integration_with_export(tmp_path):
     folder_node = VoxtaOutputFolder()
     root = tmp_path / "root"
     sub = "chars"
-    out_root, out_sub = folder_node.execute(output_path=[str(root)], subfolder=[sub])
+    out_root, out_sub, _ = folder_node.execute(output_path=[str(root)], subfolder=[sub])
 
     export_node = VoxtaExportCharacter()
     images = [make_rgba()]
@@ -64,3 +67,47 @@ def test_integration_with_export(tmp_path):
         on_exists=["append"],
     )
     assert res["ui"]["filenames"] == ["Neutral_Idle_01.webp"]
+
+
+def test_resolved_path_feeds_consumers_directly(tmp_path):
+    _, _, resolved = VoxtaOutputFolder().execute(output_path=[str(tmp_path)], subfolder=["chars"])
+    res = VoxtaExportCharacter().execute(
+        output_format=[".png lossless"],
+        images=[make_rgba()],
+        prompts=["p"],
+        combination_ids=[["A"]],
+        output_path=[resolved],
+        subfolder=[""],
+        on_exists=["append"],
+    )
+    assert res["ui"]["filenames"] == ["A_01.png"]
+    assert (tmp_path / "chars" / "A_01.png").exists()
+
+
+def test_export_recreates_deleted_folder(tmp_path):
+    import shutil
+
+    _, _, resolved = VoxtaOutputFolder().execute(output_path=[str(tmp_path)], subfolder=["gone"])
+    shutil.rmtree(resolved)
+    VoxtaExportCharacter().execute(
+        output_format=[".png lossless"],
+        images=[make_rgba()],
+        prompts=["p"],
+        combination_ids=[["A"]],
+        output_path=[str(tmp_path)],
+        subfolder=["gone"],
+        on_exists=["append"],
+    )
+    assert (tmp_path / "gone" / "A_01.png").exists()
+
+
+def test_output_directory_created_once(tmp_path, monkeypatch):
+    from voxta import helpers
+
+    calls = []
+    real_makedirs = os.makedirs
+    monkeypatch.setattr(helpers.os, "makedirs", lambda path, exist_ok=False: calls.append(path) or real_makedirs(path, exist_ok=exist_ok))
+    for _ in range(3):
+        path = helpers.FolderHelper.get_output_directory([str(tmp_path)], ["Once"])
+    assert path == str(tmp_path / "Once")
+    assert calls == [path]
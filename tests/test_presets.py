@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from voxta.helpers import ImageExporter
+from voxta.presets import EFFORT_LADDERS, EncodeCostModel, choose_effort, cost_model, effort_level, image_megapixels
+
+
+@pytest.fixture(autouse=True)
+def _reset_cost_model():
+    cost_model.reset()
+    yield
+    cost_model.reset()
+
+
+def test_every_preset_is_on_an_effort_ladder():
+    for option, fmt in ImageExporter.FORMAT_MAP.items():
+        assert effort_level(fmt["params"]) is not None, option
+
+
+def test_choose_effort_scales_with_budget_and_parallelism():
+    params = ImageExporter.determine_format(".webp lossy 90")["params"]
+    # 1 MP at 0.5 s/image on one worker affords method 4 but not method 6
+    assert choose_effort(params, 1.0, 1, 1, 0.5)["method"] == 4
+    # Eight images on four workers can spend four times as long per image
+    assert choose_effort(params, 1.0, 1, 4, 2.0)["method"] == 4
+    assert choose_effort(params, 1.0, 8, 4, 2.0)["method"] == 6
+    # Nothing fits: fall back to the fastest level, keeping the preset's quality
+    fastest = choose_effort(params, 1.0, 1, 1, 0.001)
+    assert fastest["method"] == EFFORT_LADDERS["webp"][0][0]["method"]
+    assert fastest["quality"] == 90
+
+
+def test_cost_model_learns_from_observed_times():
+    model = EncodeCostModel()
+    params = ImageExporter.determine_format(".png lossless")["params"]
+    reference = model.predict("png", 1, 1.0)
+    # This machine encodes at half the reference speed
+    model.observe(params, 1.0, [reference * 2] * 3)
+    assert model.predict("png", 1, 1.0) == pytest.approx(reference * 2)
+    assert model.predict("png", 0, 1.0) == pytest.approx(EFFORT_LADDERS["png"][0][1] * 2)
+
+
+def test_image_megapixels():
+    assert image_megapixels(np.zeros((1, 1000, 500, 4))) == pytest.approx(0.5)
+    assert image_megapixels(np.zeros((1000, 1000, 3))) == pytest.approx(1.0)
+    assert image_megapixels("not an image") == 0.0
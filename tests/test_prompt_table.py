@@ -0,0 +1,29 @@
+import pickle
+
+import pytest
+
+from voxta.prompt_table import PromptTable
+
+
+def test_prompt_table_interns_repeated_prompts():
+    prompts = ["long prompt a", "long prompt b", "long prompt a", "long prompt a"]
+    table = PromptTable.from_prompts(prompts)
+    assert list(table) == prompts
+    assert table.unique == ["long prompt a", "long prompt b"]
+    assert table[-1] == "long prompt a"
+    assert table[1:3] == ["long prompt b", "long prompt a"]
+
+    subset = table.select([3, 1])
+    assert list(subset) == ["long prompt a", "long prompt b"]
+    assert subset.unique is table.unique
+    assert list(pickle.loads(pickle.dumps(table))) == prompts
+
+
+def test_single_prompt_is_broadcast():
+    table = PromptTable.from_prompts(["shared"], 50000)
+    assert len(table) == 50000
+    assert table[49999] == "shared"
+    assert len(table.select(range(10))) == 10
+    with pytest.raises(IndexError):
+        table[50000]
+    assert PromptTable.from_prompts(table, 50000) is table
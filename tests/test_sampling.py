@@ -0,0 +1,30 @@
+import random
+from collections import Counter
+
+from voxta.sampling import reservoir_sample, stratified_sample
+
+
+def test_reservoir_sample_small_inputs():
+    rng = random.Random(1)
+    assert reservoir_sample(range(3), 5, rng) == [0, 1, 2]
+    assert reservoir_sample(range(3), 0, rng) == []
+    assert reservoir_sample(iter(range(10)), 10, rng) == list(range(10))
+
+
+def test_reservoir_sample_is_uniform_and_ordered():
+    rng = random.Random(42)
+    counts = Counter()
+    for _ in range(4000):
+        sample = reservoir_sample(iter(range(20)), 5, rng)
+        assert len(set(sample)) == 5
+        assert sample == sorted(sample)
+        counts.update(sample)
+    # Each item is expected 1000 times
+    assert all(800 < counts[i] < 1200 for i in range(20))
+
+
+def test_stratified_sample_limits_each_group():
+    items = [(group, n) for n in range(50) for group in "abc"]
+    sample = stratified_sample(items, 3, lambda item: item[0], random.Random(3))
+    assert Counter(group for group, _ in sample) == {"a": 3, "b": 3, "c": 3}
+    assert sample == sorted(sample, key=items.index)
@@ -0,0 +1,25 @@
+import pytest
+
+from voxta.selection import CombinationSelection
+
+
+def test_selection_views_index_into_sources():
+    ids = [["A"], ["B"], ["C"], ["D"]]
+    prompts = ["pa", "pb", "pc", "pd"]
+    selection = CombinationSelection(ids, prompts, [1, 3])
+    assert len(selection) == 2
+    assert list(selection.combination_ids) == [["B"], ["D"]]
+    assert selection.prompts[-1] == "pd"
+    assert selection.prompts[0:5] == ["pb", "pd"]
+    assert selection.combination_ids[0] is ids[1]  # no copies
+    with pytest.raises(IndexError):
+        selection.prompts[2]
+
+
+def test_selection_broadcasts_single_prompt_and_keeps_everything_by_default():
+    selection = CombinationSelection([["A"], ["B"], ["C"]], ["shared"])
+    assert list(selection.positions) == [0, 1, 2]
+    assert list(selection.prompts) == ["shared"] * 3
+    assert selection.prompts[2] == "shared"
+    with pytest.raises(ValueError):
+        CombinationSelection([["A"], ["B"], ["C"]], ["p1", "p2"])
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+from aiohttp import web
+
+from voxta.server_setup import setup_routes
+from .conftest import src_dir
+
+
+class _FakePromptServer:
+    def __init__(self):
+        self.routes = web.RouteTableDef()
+
+
+def test_setup_routes_registers_once():
+    server = _FakePromptServer()
+    assert setup_routes(server)
+    assert setup_routes(server)
+    paths = sorted((r.method, r.path) for r in server.routes)
+    assert paths == [("GET", "/voxta/thumbnail"), ("POST", "/voxta/check_thumbnail"), ("POST", "/voxta/check_thumbnails")]
+
+
+def test_setup_routes_without_comfyui_server():
+    # No ComfyUI "server" module (or no running instance): nothing to register, no error
+    code = "import sys; sys.modules['server'] = None; from voxta.server_setup import setup_routes; print(setup_routes())"
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env={**os.environ, "PYTHONPATH": src_dir}, check=True
+    )
+    assert out.stdout.strip() == "False"
+
+
+def test_node_import_defers_heavy_modules():
+    code = (
+        "import sys, voxta.voxta_output_folder, voxta.voxta_export_character, voxta.voxta_filter_existing;"
+        "print(sorted(m for m in ('aiohttp', 'PIL', 'numpy', 'watchdog') if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env={**os.environ, "PYTHONPATH": src_dir}, check=True
+    )
+    assert out.stdout.strip() == "[]"
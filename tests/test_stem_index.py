@@ -0,0 +1,163 @@
+import os
+
+from voxta import dir_scan
+from voxta.stem_index import StemIndex, get_stem_index, get_stem_tree, parse_enumerated_filename
+
+
+def _age_directory(path, seconds_ago=60):
+    """Push the directory mtime out of the racy window so the cache is trusted."""
+    st = os.stat(path)
+    ts = st.st_mtime - seconds_ago
+    os.utime(path, (ts, ts))
+
+
+def test_parse_enumerated_filename():
+    assert parse_enumerated_filename("Neutral_Idle_01.webp") == ("Neutral_Idle", 1, ".webp")
+    assert parse_enumerated_filename("A_01_02.png") == ("A_01", 2, ".png")
+    assert parse_enumerated_filename("thumbnail.png") is None
+    assert parse_enumerated_filename("Neutral_Idle.webp") is None
+
+
+def test_indices_by_extension(tmp_path):
+    (tmp_path / "Neutral_Idle_01.webp").write_bytes(b"A")
+    (tmp_path / "Neutral_Idle_03.png").write_bytes(b"B")
+    index = StemIndex(str(tmp_path)).refresh()
+    assert index.indices("Neutral_Idle") == {1, 3}
+    assert index.max_index("Neutral_Idle", ".webp") == 1
+    assert index.has_index("Neutral_Idle", 3)
+    assert not index.has_index("Neutral_Idle", 2)
+    assert index.has_stem("Neutral_Idle")
+    assert not index.has_stem("Neutral")
+
+
+def test_max_index_tracked_incrementally(tmp_path):
+    (tmp_path / "A_07.png").write_bytes(b"A")
+    (tmp_path / "A_120.webp").write_bytes(b"A")
+    index = StemIndex(str(tmp_path)).refresh()
+    assert index.max_index("A", ".png") == 7
+    assert index.max_index("A") == 120
+    index.add("A_003.png")
+    assert index.max_index("A", ".png") == 7
+    index.add("A_0250.png")
+    assert index.max_index("A", ".png") == 250
+    assert index.max_index("B") == 0
+
+
+def test_listing_reused_until_mtime_changes(tmp_path, monkeypatch):
+    (tmp_path / "A_01.png").write_bytes(b"A")
+    _age_directory(tmp_path, 120)
+
+    calls = []
+    real_scandir = os.scandir
+
+    def counting_scandir(path):
+        calls.append(path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(dir_scan.os, "scandir", counting_scandir)
+
+    assert get_stem_index(str(tmp_path)).max_index("A", ".png") == 1
+    assert get_stem_index(str(tmp_path)).max_index("A", ".png") == 1
+    assert len(calls) == 1
+
+    # External change bumps the directory mtime and triggers a rescan
+    (tmp_path / "A_02.png").write_bytes(b"B")
+    _age_directory(tmp_path, 60)
+    assert get_stem_index(str(tmp_path)).max_index("A", ".png") == 2
+    assert len(calls) == 2
+
+
+def test_add_updates_in_memory(tmp_path):
+    index = StemIndex(str(tmp_path)).refresh()
+    (tmp_path / "B_05.webp").write_bytes(b"X")
+    index.add("B_05.webp")
+    assert index.max_index("B", ".webp") == 5
+
+
+def test_own_writes_do_not_force_rescans(tmp_path, monkeypatch):
+    from voxta import stem_index as stem_index_module
+
+    (tmp_path / "A_01.png").write_bytes(b"A")
+    calls = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(dir_scan.os, "scandir", lambda path: calls.append(path) or real_scandir(path))
+    real_time_ns = stem_index_module.time.time_ns
+    offset = [0]
+    monkeypatch.setattr(stem_index_module.time, "time_ns", lambda: real_time_ns() + offset[0])
+
+    index = get_stem_index(str(tmp_path))
+    # The folder was just written, so the first listing is racy and checked once more later
+    offset[0] = 3_000_000_000
+    index.refresh()
+    assert len(calls) == 2
+
+    offset[0] = 0
+    with index.own_write():
+        (tmp_path / "A_02.png").write_bytes(b"B")
+    index.add("A_02.png")
+    # Several seconds later the index is still trusted
+    offset[0] = 3_000_000_000
+    assert get_stem_index(str(tmp_path)).max_index("A", ".png") == 2
+    assert len(calls) == 2
+
+
+def test_own_write_does_not_hide_outside_changes(tmp_path):
+    (tmp_path / "A_01.png").write_bytes(b"A")
+    _age_directory(tmp_path, 120)
+    index = get_stem_index(str(tmp_path))
+
+    # Another process adds a file, then we write one of our own
+    (tmp_path / "A_02.png").write_bytes(b"B")
+    _age_directory(tmp_path, 60)
+    with index.own_write():
+        (tmp_path / "Other_01.png").write_bytes(b"C")
+    index.add("Other_01.png")
+    assert get_stem_index(str(tmp_path)).max_index("A", ".png") == 2
+
+
+def test_missing_directory_is_empty(tmp_path):
+    index = get_stem_index(str(tmp_path / "missing"))
+    assert index.max_index("A") == 0
+    assert not index.has_stem("A")
+
+
+def test_tree_index_covers_subfolders(tmp_path):
+    (tmp_path / "Pack1").mkdir()
+    (tmp_path / "Pack1" / "Deep").mkdir()
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / "A_01.png").write_bytes(b"A")
+    (tmp_path / "Pack1" / "Deep" / "B_03.webp").write_bytes(b"B")
+    (tmp_path / ".hidden" / "C_01.png").write_bytes(b"C")
+
+    tree = get_stem_tree(str(tmp_path))
+    assert tree.has_index("A", 1)
+    assert tree.has_index("B", 3) and tree.has_stem("B")
+    assert not tree.has_stem("C")
+    assert not get_stem_index(str(tmp_path)).has_stem("B")
+
+    # A new subfolder changes the parent's mtime and is picked up
+    (tmp_path / "Pack2").mkdir()
+    (tmp_path / "Pack2" / "D_01.png").write_bytes(b"D")
+    assert get_stem_tree(str(tmp_path)).has_stem("D")
+
+
+def test_existence_bitmap_matches_set_lookups(tmp_path):
+    for name in ["A_01.webp", "A_99.png", "B_1000.webp", "C_07.webp"]:
+        (tmp_path / name).write_bytes(b"")
+    index = get_stem_index(str(tmp_path))
+    queries = [("A", 1), ("A", 2), ("A", 99), ("A", None), ("B", 1000), ("B", 999), ("C", None), ("D", None), ("D", 1)]
+    flags = index.existence_bitmap().lookup(iter(queries)).tolist()
+    expected = [index.has_stem(s) if i is None else index.has_index(s, i) for s, i in queries]
+    assert flags == expected == [True, False, True, True, True, False, True, False, False]
+
+    bitmap = index.existence_bitmap()
+    assert index.existence_bitmap() is bitmap
+    index.add("D_01.webp")
+    assert index.existence_bitmap().lookup([("D", 1)]).tolist() == [True]
+
+
+def test_tree_existence_bitmap_covers_subfolders(tmp_path):
+    (tmp_path / "Pack").mkdir()
+    (tmp_path / "Pack" / "Happy_02.webp").write_bytes(b"")
+    tree = get_stem_tree(str(tmp_path))
+    assert tree.existence_bitmap().lookup([("Happy", 2), ("Happy", 1)]).tolist() == [True, False]
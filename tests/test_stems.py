@@ -0,0 +1,48 @@
+import random
+import re
+
+import pytest
+
+from voxta.stems import resolve_stem, sanitize_stem, split_trailing_number
+
+
+def _legacy_sanitize(id_list):
+    """The original IdFilenameBuilder.sanitize_id_filename."""
+    id_list = [i for i in id_list if "_no_id_" not in i]
+    raw = "_".join(id_list)
+    raw = raw.replace(" ", "_")
+    raw = re.sub(r"[^A-Za-z0-9_.]", "_", raw)
+    raw = re.sub(r"_+", "_", raw)
+    raw = raw.strip("_.")
+    return raw or "image"
+
+
+def test_sanitize_matches_legacy_implementation():
+    rng = random.Random(0)
+    alphabet = "aZ09_. -*:é/\\"
+    for _ in range(2000):
+        ids = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 6))) for _ in range(rng.randint(0, 4))]
+        if rng.random() < 0.1:
+            ids.append("input_1_no_id_x")
+        assert sanitize_stem(ids) == _legacy_sanitize(ids), ids
+
+
+def test_sanitize_accepts_lists_and_tuples():
+    assert sanitize_stem(["A*B", "C:D"]) == sanitize_stem(("A*B", "C:D")) == "A_B_C_D"
+    assert sanitize_stem([]) == "image"
+
+
+@pytest.mark.parametrize(
+    "stem, expected",
+    [("Talking2", ("Talking", 2)), ("Talking_07", ("Talking", 7)), ("Talking", ("Talking", None)), ("42", ("42", None))],
+)
+def test_split_trailing_number(stem, expected):
+    assert split_trailing_number(stem) == expected
+
+
+def test_resolve_stem_out_of_range_indices():
+    # Filtering keeps out-of-range numbers in the stem; export naming clamps them
+    assert resolve_stem(["Talking", "150"]) == ("Talking_150", None)
+    assert resolve_stem(["Talking", "150"], clamp=True) == ("Talking", 99)
+    assert resolve_stem(["Talking0"], clamp=True) == ("Talking", 1)
+    assert resolve_stem(["Neutral", "Idle"]) == ("Neutral_Idle", None)
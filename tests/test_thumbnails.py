@@ -0,0 +1,189 @@
+import asyncio
+import io
+import json
+import os
+import time
+
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from PIL import Image
+
+from voxta import thumbnails
+from voxta.thumbnails import ThumbnailLookupCache, clear_preview_cache, get_preview, parse_preview_edge, thumbnail_content_type
+from voxta.routes import check_thumbnails_endpoint, serve_thumbnail_endpoint
+
+
+def _write_thumbnail(path, size=(400, 300)):
+    arr = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    arr[..., 0] = 200
+    Image.fromarray(arr).save(path)
+    return path
+
+
+def _request(handler, route, method="GET", **kwargs):
+    async def run():
+        app = web.Application()
+        app.router.add_route(method, route, handler)
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.request(method, route, **kwargs)
+            body = await resp.read()
+            return resp.status, resp.headers, body
+
+    return asyncio.run(run())
+
+
+def test_thumbnail_content_type():
+    assert thumbnail_content_type("/x/thumbnail.webp") == "image/webp"
+    assert thumbnail_content_type("/x/THUMBNAIL.JPG") == "image/jpeg"
+    assert thumbnail_content_type("/x/avatar.png") is None
+    assert thumbnail_content_type("/x/thumbnail.gif") is None
+
+
+def test_parse_preview_edge():
+    assert parse_preview_edge(None) is None
+    assert parse_preview_edge("abc") is None
+    assert parse_preview_edge("0") is None
+    assert parse_preview_edge("4") == 16
+    assert parse_preview_edge("300") == 300
+    assert parse_preview_edge("99999") == 1024
+
+
+def test_preview_downscales_and_is_cached(tmp_path):
+    clear_preview_cache()
+    path = str(_write_thumbnail(tmp_path / "thumbnail.png"))
+    preview = get_preview(path, 150)
+    assert preview is not None
+    with Image.open(io.BytesIO(preview.data)) as img:
+        assert img.format == "WEBP"
+        assert max(img.size) == 150
+    assert get_preview(path, 150) is preview
+    # Originals that already fit are served unchanged
+    assert get_preview(path, 1000) is None
+
+
+def test_serve_full_thumbnail_with_validators(tmp_path):
+    path = str(_write_thumbnail(tmp_path / "thumbnail.png"))
+    status, headers, body = _request(serve_thumbnail_endpoint, "/voxta/thumbnail", params={"path": path})
+    assert status == 200
+    assert headers["Content-Type"] == "image/png"
+    assert body == (tmp_path / "thumbnail.png").read_bytes()
+    assert "ETag" in headers and "Last-Modified" in headers
+    assert headers["Cache-Control"] == "no-cache"
+
+    status, _, body = _request(
+        serve_thumbnail_endpoint, "/voxta/thumbnail", params={"path": path}, headers={"If-None-Match": headers["ETag"]}
+    )
+    assert status == 304
+    assert body == b""
+
+
+def test_serve_preview_conditional(tmp_path):
+    clear_preview_cache()
+    path = str(_write_thumbnail(tmp_path / "thumbnail.jpg"))
+    params = {"path": path, "size": "150"}
+    status, headers, body = _request(serve_thumbnail_endpoint, "/voxta/thumbnail", params=params)
+    assert status == 200
+    assert headers["Content-Type"] == "image/webp"
+    assert len(body) < (tmp_path / "thumbnail.jpg").stat().st_size
+
+    status, _, _ = _request(serve_thumbnail_endpoint, "/voxta/thumbnail", params=params, headers={"If-None-Match": headers["ETag"]})
+    assert status == 304
+    status, _, _ = _request(
+        serve_thumbnail_endpoint, "/voxta/thumbnail", params=params, headers={"If-Modified-Since": headers["Last-Modified"]}
+    )
+    assert status == 304
+
+
+def test_serve_rejects_non_thumbnail(tmp_path):
+    other = tmp_path / "secret.png"
+    _write_thumbnail(other)
+    status, _, _ = _request(serve_thumbnail_endpoint, "/voxta/thumbnail", params={"path": str(other)})
+    assert status == 403
+    status, _, _ = _request(serve_thumbnail_endpoint, "/voxta/thumbnail", params={"path": str(tmp_path / "thumbnail.png")})
+    assert status == 404
+
+
+def _set_mtime(path, offset):
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + offset))
+
+
+def test_lookup_cache_reuses_result_until_directory_changes(tmp_path, monkeypatch):
+    calls = []
+    real_isfile = os.path.isfile
+    monkeypatch.setattr(thumbnails.os.path, "isfile", lambda p: calls.append(p) or real_isfile(p))
+    cache = ThumbnailLookupCache()
+
+    assert cache.lookup(str(tmp_path)) is None
+    scanned = len(calls)
+    assert scanned == len(thumbnails.THUMBNAIL_NAMES)
+    assert cache.lookup(str(tmp_path)) is None
+    assert len(calls) == scanned  # cache hit: no isfile calls
+
+    _write_thumbnail(tmp_path / "thumbnail.webp")
+    _set_mtime(tmp_path, 5)  # make sure the change is visible on coarse clocks
+    assert cache.lookup(str(tmp_path)) == str(tmp_path / "thumbnail.webp")
+
+
+def test_lookup_cache_ttl_and_bounds(tmp_path, monkeypatch):
+    cache = ThumbnailLookupCache(max_entries=2, ttl=10.0)
+    dirs = []
+    for name in ("a", "b", "c"):
+        d = tmp_path / name
+        d.mkdir()
+        dirs.append(str(d))
+        cache.lookup(str(d))
+    assert len(cache._entries) == 2
+
+    now = [1000.0]
+    monkeypatch.setattr(thumbnails.time, "monotonic", lambda: now[0])
+    cache.clear()
+    cache.lookup(dirs[0])
+    _write_thumbnail(tmp_path / "a" / "thumbnail.png")
+    os.utime(dirs[0], ns=(cache._entries[os.path.normcase(dirs[0])].mtime_ns,) * 2)  # hide the change from mtime
+    assert cache.lookup(dirs[0]) is None
+    now[0] += 11.0  # expired by TTL
+    assert cache.lookup(dirs[0]) == os.path.join(dirs[0], "thumbnail.png")
+
+
+def test_lookup_missing_directory(tmp_path):
+    cache = ThumbnailLookupCache()
+    assert cache.lookup(str(tmp_path / "missing")) is None
+    (tmp_path / "file").write_bytes(b"x")
+    assert cache.lookup(str(tmp_path / "file")) is None
+
+
+def test_batch_lookup_endpoint(tmp_path):
+    with_thumb = tmp_path / "CharA"
+    with_thumb.mkdir()
+    _write_thumbnail(with_thumb / "thumbnail.webp")
+    without = tmp_path / "CharB"
+    without.mkdir()
+
+    paths = [str(with_thumb), str(without), str(tmp_path / "missing"), str(with_thumb), ""]
+    status, _, body = _request(check_thumbnails_endpoint, "/voxta/check_thumbnails", method="POST", json={"paths": paths})
+    assert status == 200
+    results = json.loads(body)["results"]
+    assert [r["path"] for r in results] == paths
+    assert results[0] == {"path": str(with_thumb), "found": True, "thumbnail_path": str(with_thumb / "thumbnail.webp")}
+    assert results[3] == results[0]
+    assert [r["found"] for r in results[1:3]] == [False, False]
+    assert results[4] == {"path": "", "found": False}
+
+    status, _, _ = _request(check_thumbnails_endpoint, "/voxta/check_thumbnails", method="POST", json={"path": "x"})
+    assert status == 400
+
+
+def test_check_endpoint_timeout_reports_not_found(tmp_path, monkeypatch):
+    from voxta import fs_async, routes
+
+    monkeypatch.setattr(routes, "thumbnail_lookup_result", lambda path: time.sleep(0.3))
+
+    async def short_timeout(func, *args):
+        return await fs_async.run_blocking(func, *args, timeout=0.05)
+
+    monkeypatch.setattr(routes, "run_blocking", short_timeout)
+    status, _, body = _request(routes.check_thumbnail_endpoint, "/voxta/check_thumbnail", method="POST", json={"path": str(tmp_path)})
+    assert status == 200
+    assert json.loads(body) == {"found": False}
@@ -1,5 +1,10 @@
+import logging
+import os
 from pathlib import Path
 
+import numpy as np
+import pytest
+
 from voxta.voxta_export_character import VoxtaExportCharacter
 from .conftest import make_rgba
 
@@ -158,3 +163,497 @@ def test_append_mode_numbered_id_advances(tmp_path):
     assert (d / "Idle_Talking_01.webp").read_bytes() == b"A"
     assert (d / "Idle_Talking_02.webp").read_bytes() == b"B"
     assert (d / "Idle_Talking_03.webp").exists()
+
+
+def test_parallel_encode_keeps_planning_order(tmp_path):
+    node = VoxtaExportCharacter()
+    images = [make_rgba(a=i / 10) for i in range(6)]
+    combination_ids = [["Neutral", "Idle"], ["Happy", "Wave"]] * 3
+
+    res = node.execute(
+        output_format=[".png lossless"],
+        images=images,
+        prompts=["p"],
+        combination_ids=combination_ids,
+        output_path=[str(tmp_path)],
+        subfolder=["chars"],
+        on_exists=["append"],
+        encode_workers=[4],
+    )
+    assert res["ui"]["filenames"] == [
+        "Neutral_Idle_01.png",
+        "Happy_Wave_01.png",
+        "Neutral_Idle_02.png",
+        "Happy_Wave_02.png",
+        "Neutral_Idle_03.png",
+        "Happy_Wave_03.png",
+    ]
+    assert res["ui"]["image_count"] == [6]
+
+
+def test_encode_errors_reported_per_file(tmp_path):
+    node = VoxtaExportCharacter()
+    bad = np.zeros((4, 4), dtype=np.float32)  # missing channel axis
+    images = [make_rgba(), bad, make_rgba(), bad]
+    combination_ids = [["A"], ["B"], ["C"], ["D"]]
+
+    with pytest.raises(RuntimeError) as exc:
+        node.execute(
+            output_format=[".png lossless"],
+            images=images,
+            prompts=["p"],
+            combination_ids=combination_ids,
+            output_path=[str(tmp_path)],
+            subfolder=["chars"],
+            on_exists=["append"],
+            encode_workers=[2],
+        )
+    message = str(exc.value)
+    assert "2 of 4" in message
+    assert "B_01.png" in message and "D_01.png" in message
+    # Valid images are still written
+    assert (tmp_path / "chars" / "A_01.png").exists()
+    assert (tmp_path / "chars" / "C_01.png").exists()
+
+
+@pytest.mark.parametrize(
+    "verbosity, expected_info",
+    [("quiet", 0), ("summary", 1), ("verbose", 4)],  # verbose: target dir + 2 images + summary
+)
+def test_verbosity_controls_log_output(tmp_path, caplog, verbosity, expected_info):
+    node = VoxtaExportCharacter()
+    with caplog.at_level(logging.INFO, logger="voxta"):
+        node.execute(
+            output_format=[".png lossless"],
+            images=[make_rgba(), make_rgba()],
+            prompts=["p"],
+            combination_ids=[["A"], ["B"]],
+            output_path=[str(tmp_path)],
+            subfolder=["chars"],
+            on_exists=["append"],
+            verbosity=[verbosity],
+        )
+    info = [r for r in caplog.records if r.levelno == logging.INFO]
+    assert len(info) == expected_info
+    if expected_info:
+        assert "Exported 2 of 2" in info[-1].getMessage()
+
+
+def test_incremental_mode_matches_batch_and_writes_manifest(tmp_path):
+    from voxta.export_manifest import read_manifest
+
+    combination_ids = [["Neutral", "Idle"], ["Happy", "Wave2"], ["Neutral", "Idle"], ["Sad"]]
+    results = {}
+    for mode in ("batch", "incremental"):
+        d = tmp_path / mode / "chars"
+        d.mkdir(parents=True)
+        (d / "Sad_01.webp").write_bytes(b"X")
+        results[mode] = VoxtaExportCharacter().execute(
+            output_format=[".webp lossy 80"],
+            images=[make_rgba() for _ in combination_ids],
+            prompts=["p"],
+            combination_ids=combination_ids,
+            output_path=[str(tmp_path / mode)],
+            subfolder=["chars"],
+            on_exists=["skip"],
+            export_mode=[mode],
+            resume=[True],
+        )
+    assert results["incremental"] == results["batch"]
+    assert results["batch"]["ui"]["skipped"] == [1]
+
+    records = list(read_manifest(str(tmp_path / "incremental" / "chars")))
+    assert [r["event"] for r in records] == ["start", "saved", "saved", "saved", "skipped", "finish"]
+    assert len({r["run"] for r in records}) == 1
+    assert records[1]["file"] == "Neutral_Idle_01.webp" and records[1]["ids"] == ["Neutral", "Idle"]
+    assert records[-1]["filenames"] == results["incremental"]["ui"]["filenames"]
+    batch_records = list(read_manifest(str(tmp_path / "batch" / "chars")))
+    assert sorted(r["file"] for r in batch_records if r["event"] == "saved") == sorted(results["batch"]["ui"]["filenames"])
+
+
+def test_no_journal_without_resume_or_dedup(tmp_path):
+    from voxta.export_manifest import MANIFEST_FILENAME
+
+    VoxtaExportCharacter().execute(
+        output_format=[".png lossless"],
+        images=[make_rgba()],
+        prompts=["p"],
+        combination_ids=[["A"]],
+        output_path=[str(tmp_path)],
+        subfolder=["plain"],
+    )
+    assert not (tmp_path / "plain" / MANIFEST_FILENAME).exists()
+
+
+def test_resume_skips_images_saved_by_interrupted_run(tmp_path, monkeypatch):
+    from voxta import encoding
+    from voxta.export_manifest import read_manifest
+
+    combination_ids = [["A"], ["B"], ["C"]]
+    kwargs = dict(
+        output_format=[".png lossless"],
+        prompts=["p"],
+        combination_ids=combination_ids,
+        output_path=[str(tmp_path)],
+        subfolder=["chars"],
+        on_exists=["overwrite"],
+        export_mode=["incremental"],
+        resume=[True],
+    )
+    good = [make_rgba() for _ in combination_ids]
+    bad = np.zeros((4, 4), dtype=np.float32)
+    with pytest.raises(RuntimeError):
+        VoxtaExportCharacter().execute(images=[good[0], bad, good[2]], **kwargs)
+    save_dir = tmp_path / "chars"
+    first_a = (save_dir / "A_01.png").stat().st_mtime_ns
+
+    encoded = []
+    original = encoding.encode_job
+    monkeypatch.setattr(
+        "voxta.voxta_export_character.encode_job", lambda job, params: encoded.append(job.final_path) or original(job, params)
+    )
+    res = VoxtaExportCharacter().execute(images=good, **kwargs)
+
+    assert res["ui"]["filenames"] == ["A_01.png", "B_01.png", "C_01.png"]
+    assert res["ui"]["resumed"] == [2]
+    assert encoded == [str(save_dir / "B_01.png")]
+    assert (save_dir / "A_01.png").stat().st_mtime_ns == first_a
+    records = list(read_manifest(str(save_dir)))
+    assert len({r["run"] for r in records}) == 1
+    assert records[-1]["event"] == "finish"
+    assert not any(name.endswith(".part") for name in os.listdir(save_dir))
+
+
+@pytest.mark.parametrize("export_mode", ["batch", "incremental"])
+def test_dedup_skip_and_hardlink(tmp_path, export_mode):
+    node = VoxtaExportCharacter()
+    kwargs = dict(
+        output_format=[".png lossless"],
+        prompts=["p"],
+        output_path=[str(tmp_path)],
+        subfolder=["chars"],
+        on_exists=["append"],
+        export_mode=[export_mode],
+    )
+    save_dir = tmp_path / "chars"
+    first = node.execute(images=[make_rgba(), make_rgba(a=0.5)], combination_ids=[["A"], ["B"]], dedup=["skip"], **kwargs)
+    assert first["ui"]["filenames"] == ["A_01.png", "B_01.png"]
+    assert first["ui"]["deduplicated"] == [0]
+
+    # Same pixels again: nothing new is written
+    rerun = node.execute(images=[make_rgba(), make_rgba(a=0.5)], combination_ids=[["A"], ["B"]], dedup=["skip"], **kwargs)
+    assert rerun["ui"]["filenames"] == []
+    assert rerun["ui"]["deduplicated"] == [2]
+    assert sorted(p.name for p in save_dir.glob("*.png")) == ["A_01.png", "B_01.png"]
+
+    # Hardlink: new names share the existing file, including duplicates within the batch
+    linked = node.execute(
+        images=[make_rgba(), make_rgba(a=0.25), make_rgba(a=0.25)],
+        combination_ids=[["A"], ["C"], ["D"]],
+        dedup=["hardlink"],
+        **kwargs,
+    )
+    assert linked["ui"]["filenames"] == ["A_02.png", "C_01.png", "D_01.png"]
+    assert linked["ui"]["deduplicated"] == [2]
+    assert os.path.samefile(save_dir / "A_01.png", save_dir / "A_02.png")
+    assert os.path.samefile(save_dir / "C_01.png", save_dir / "D_01.png")
+    assert not any(name.endswith(".part") for name in os.listdir(save_dir))
+
+
+def test_index_width_pads_enumeration(tmp_path):
+    res = VoxtaExportCharacter().execute(
+        output_format=[".png lossless"],
+        images=[make_rgba(), make_rgba()],
+        prompts=["p"],
+        combination_ids=[["A"], ["A"]],
+        output_path=[str(tmp_path)],
+        subfolder=["chars"],
+        on_exists=["append"],
+        index_width=[3],
+    )
+    assert res["ui"]["filenames"] == ["A_001.png", "A_002.png"]
+
+
+def test_auto_encoder_effort_exports_and_calibrates(tmp_path):
+    from voxta.presets import cost_model
+
+    cost_model.reset()
+    node = VoxtaExportCharacter()
+    result = node.execute(
+        output_format=[".png fast"],
+        images=[make_rgba(), make_rgba(a=0.5)],
+        prompts=["p"],
+        combination_ids=[["Neutral"], ["Happy"]],
+        output_path=[str(tmp_path)],
+        subfolder=["auto"],
+        on_exists=["append"],
+        encoder_effort=["auto"],
+        seconds_per_image=[1.0],
+    )
+    assert result["ui"]["filenames"] == ["Neutral_01.png", "Happy_01.png"]
+    assert "png" in cost_model._speed
+    cost_model.reset()
+
+    with pytest.raises(ValueError):
+        node.execute(
+            output_format=[".png fast"],
+            images=[make_rgba()],
+            prompts=["p"],
+            combination_ids=[["Neutral"]],
+            output_path=[str(tmp_path)],
+            subfolder=["auto"],
+            on_exists=["append"],
+            encoder_effort=["fastest"],
+        )
+
+
+def test_export_plan_from_filter_keeps_planned_names(tmp_path):
+    from voxta.voxta_filter_existing import VoxtaFilterExistingCombinations
+
+    save_dir = tmp_path / "plan"
+    save_dir.mkdir()
+    (save_dir / "Neutral_01.webp").write_bytes(b"X")
+    combos = [["Neutral"], ["Neutral"], ["Happy"]]
+    kept_cids, kept_prompts, plan = VoxtaFilterExistingCombinations().execute(
+        combination_ids=combos,
+        prompts=["p"],
+        output_path=[str(tmp_path)],
+        subfolder=["plan"],
+        behavior=["new only"],
+        export_format=[".webp lossy 90"],
+    )["result"][:3]
+
+    node = VoxtaExportCharacter()
+    kwargs = dict(
+        output_format=[".webp lossy 90"],
+        images=[make_rgba(), make_rgba()],
+        prompts=kept_prompts,
+        combination_ids=kept_cids,
+        output_path=[str(tmp_path)],
+        subfolder=["plan"],
+        on_exists=["skip"],
+    )
+    result = node.execute(export_plan=[plan], **kwargs)
+    assert result["ui"]["filenames"] == ["Neutral_02.webp", "Happy_01.webp"]
+    assert result["ui"]["skipped"] == [0]
+
+    # Replanning the kept subset alone would map the first Neutral onto the existing Neutral_01
+    (save_dir / "Neutral_02.webp").unlink()
+    (save_dir / "Happy_01.webp").unlink()
+    result = node.execute(**kwargs)
+    assert result["ui"]["skipped"] == [1]
+
+
+def test_export_from_filter_selection(tmp_path):
+    from voxta.voxta_filter_existing import VoxtaFilterExistingCombinations
+
+    save_dir = tmp_path / "sel"
+    save_dir.mkdir()
+    (save_dir / "Neutral_01.webp").write_bytes(b"X")
+    combos = [["Neutral"], ["Neutral"], ["Happy"]]
+    selection = VoxtaFilterExistingCombinations().execute(
+        combination_ids=combos,
+        prompts=["p"],
+        output_path=[str(tmp_path)],
+        subfolder=["sel"],
+        behavior=["new only"],
+        export_format=[".webp lossy 90"],
+        outputs=["selection"],
+    )["result"][3]
+    assert list(selection.positions) == [1, 2]
+
+    result = VoxtaExportCharacter().execute(
+        output_format=[".webp lossy 90"],
+        images=[make_rgba(), make_rgba()],
+        output_path=[str(tmp_path)],
+        subfolder=["sel"],
+        on_exists=["skip"],
+        selection=[selection],
+    )
+    # The selection carries the filter's export plan
+    assert result["ui"]["filenames"] == ["Neutral_02.webp", "Happy_01.webp"]
+
+    with pytest.raises(ValueError):
+        VoxtaExportCharacter().execute(output_format=[".webp lossy 90"], images=[make_rgba()], output_path=[str(tmp_path)])
+
+
+def test_selection_plan_is_not_used_for_append(tmp_path, caplog):
+    from voxta.voxta_filter_existing import VoxtaFilterExistingCombinations
+
+    (tmp_path / "sel").mkdir()
+    (tmp_path / "sel" / "Neutral_01.webp").write_bytes(b"X")
+    selection = VoxtaFilterExistingCombinations().execute(
+        combination_ids=[["Neutral"], ["Happy"]],
+        prompts=["p"],
+        output_path=[str(tmp_path)],
+        subfolder=["sel"],
+        behavior=["all"],
+        export_format=[".webp lossy 90"],
+        outputs=["selection"],
+    )["result"][3]
+    kwargs = dict(images=[make_rgba(), make_rgba()], output_path=[str(tmp_path)], subfolder=["sel"], selection=[selection])
+
+    with caplog.at_level(logging.WARNING, logger="voxta"):
+        result = VoxtaExportCharacter().execute(output_format=[".webp lossy 90"], on_exists=["append"], **kwargs)
+    assert result["ui"]["filenames"] == ["Neutral_02.webp", "Happy_01.webp"]
+    assert "export_plan" not in caplog.text
+
+    with caplog.at_level(logging.WARNING, logger="voxta"):
+        VoxtaExportCharacter().execute(output_format=[".png lossless"], on_exists=["skip"], **kwargs)
+    assert "Ignoring export_plan: it was made for another folder, format or index width" in caplog.text
+
+
+def test_export_does_not_read_prompts(tmp_path):
+    class Unreadable(list):
+        def __iter__(self):
+            raise AssertionError("prompts were read")
+
+        def __getitem__(self, i):
+            raise AssertionError("prompts were read")
+
+    result = VoxtaExportCharacter().execute(
+        output_format=[".png lossless"],
+        images=[make_rgba(), make_rgba()],
+        combination_ids=[["A"], ["B"]],
+        prompts=Unreadable(["a", "b"]),
+        output_path=[str(tmp_path)],
+        subfolder=["lazy"],
+    )
+    assert result["ui"]["filenames"] == ["A_01.png", "B_01.png"]
+
+
+@pytest.mark.parametrize("export_mode", ["batch", "incremental"])
+def test_export_scans_the_folder_once(tmp_path, monkeypatch, export_mode):
+    from voxta import dir_scan
+    from voxta.stem_index import clear_stem_indexes
+
+    save_dir = tmp_path / "scan"
+    save_dir.mkdir()
+    for i in range(50):
+        (save_dir / f"Old{i}_01.png").write_bytes(b"X")
+    os.utime(save_dir, (1_000_000_000, 1_000_000_000))
+    clear_stem_indexes()
+    calls = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(dir_scan.os, "scandir", lambda path: calls.append(path) or real_scandir(path))
+
+    VoxtaExportCharacter().execute(
+        output_format=[".png fast"],
+        images=[make_rgba() for _ in range(5)],
+        prompts=["p"],
+        combination_ids=[[f"New{chr(65 + i)}"] for i in range(5)],
+        output_path=[str(tmp_path)],
+        subfolder=["scan"],
+        on_exists=["append"],
+        export_mode=[export_mode],
+    )
+    assert len(calls) == 1
+
+
+def test_resume_after_crash_in_batch_mode(tmp_path, monkeypatch):
+    from voxta.export_manifest import read_manifest
+    from voxta.helpers import ImageExporter
+
+    kwargs = dict(
+        output_format=[".png fast"],
+        images=[make_rgba() for _ in range(6)],
+        prompts=["p"],
+        combination_ids=[["C"]] * 6,
+        output_path=[str(tmp_path)],
+        subfolder=["crash"],
+        on_exists=["append"],
+        encode_workers=[1],
+        resume=[True],
+    )
+    original = ImageExporter.save_frame
+    written = []
+
+    def crashing_save_frame(frame, final_path, fmt_params, *args):
+        if len(written) == 3:
+            raise KeyboardInterrupt  # stands in for the process dying mid-batch
+        original(frame, final_path, fmt_params, *args)
+        written.append(final_path)
+
+    monkeypatch.setattr(ImageExporter, "save_frame", staticmethod(crashing_save_frame))
+    with pytest.raises(KeyboardInterrupt):
+        VoxtaExportCharacter().execute(**kwargs)
+    save_dir = tmp_path / "crash"
+    saved = [r["file"] for r in read_manifest(str(save_dir)) if r["event"] == "saved"]
+    assert saved == ["C_01.png", "C_02.png", "C_03.png"]
+
+    monkeypatch.setattr(ImageExporter, "save_frame", staticmethod(original))
+    res = VoxtaExportCharacter().execute(**kwargs)
+    assert res["ui"]["resumed"] == [3]
+    assert res["ui"]["filenames"] == [f"C_{i:02d}.png" for i in range(1, 7)]
+    assert sorted(os.listdir(save_dir)) == [".voxta_export_manifest.jsonl"] + [f"C_{i:02d}.png" for i in range(1, 7)]
+
+
+def test_dedup_skip_keeps_overwrite_slots(tmp_path):
+    from PIL import Image
+
+    kwargs = dict(
+        output_format=[".png lossless"],
+        prompts=["p"],
+        combination_ids=[["X"]] * 3,
+        output_path=[str(tmp_path)],
+        subfolder=["slots"],
+        on_exists=["overwrite"],
+        dedup=["skip"],
+    )
+    node = VoxtaExportCharacter()
+    node.execute(images=[make_rgba(a=0.1), make_rgba(a=0.2), make_rgba(a=0.3)], **kwargs)
+    # The second image is unchanged and skipped; the third must still land in X_03
+    res = node.execute(images=[make_rgba(a=0.6), make_rgba(a=0.2), make_rgba(a=0.9)], **kwargs)
+    assert res["ui"]["filenames"] == ["X_01.png", "X_03.png"]
+    alpha = {name: Image.open(tmp_path / "slots" / name).getpixel((0, 0))[3] for name in ("X_01.png", "X_02.png", "X_03.png")}
+    assert alpha == {"X_01.png": 153, "X_02.png": 51, "X_03.png": 229}
+
+
+def test_outside_write_during_a_run_is_not_overwritten(tmp_path):
+    from voxta.stem_index import get_stem_index
+
+    kwargs = dict(
+        output_format=[".png lossless"],
+        prompts=["p"],
+        combination_ids=[["Neutral", "Idle"]],
+        output_path=[str(tmp_path)],
+        subfolder=["race"],
+        on_exists=["append"],
+    )
+    VoxtaExportCharacter().execute(images=[make_rgba()], **kwargs)
+    save_dir = tmp_path / "race"
+    st = os.stat(save_dir)
+    os.utime(save_dir, ns=(st.st_atime_ns, st.st_mtime_ns - 10_000_000_000))
+    index = get_stem_index(str(save_dir))
+
+    # Voxta or the user adds a file, then the node writes one of its own
+    (save_dir / "Neutral_Idle_02.png").write_bytes(b"theirs")
+    with index.own_write():
+        (save_dir / "Other_01.png").write_bytes(b"ours")
+    index.add("Other_01.png")
+
+    res = VoxtaExportCharacter().execute(images=[make_rgba()], **kwargs)
+    assert res["ui"]["filenames"] == ["Neutral_Idle_03.png"]
+    assert (save_dir / "Neutral_Idle_02.png").read_bytes() == b"theirs"
+
+
+def test_append_never_replaces_a_file_missing_from_the_index(tmp_path, monkeypatch):
+    from voxta.stem_index import StemIndex
+
+    kwargs = dict(
+        output_format=[".png lossless"],
+        prompts=["p"],
+        combination_ids=[["Stale"]],
+        output_path=[str(tmp_path)],
+        subfolder=["stale"],
+        on_exists=["append"],
+    )
+    VoxtaExportCharacter().execute(images=[make_rgba()], **kwargs)
+    save_dir = tmp_path / "stale"
+    (save_dir / "Stale_02.png").write_bytes(b"theirs")
+    # The index misses the new file and plans Stale_02.png again
+    monkeypatch.setattr(StemIndex, "refresh", lambda self, force=False: self)
+
+    with pytest.raises(RuntimeError, match="Stale_02.png"):
+        VoxtaExportCharacter().execute(images=[make_rgba()], **kwargs)
+    assert (save_dir / "Stale_02.png").read_bytes() == b"theirs"